@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmark for the public identification API.
+
+Runs from_file, magic_file, from_string and from_stream over the synthetic
+corpus and reports files/sec, p50/p99 latency, bytes read and peak traced memory,
+overall and per corpus kind. Results are written as JSON so releases can be compared.
+
+    python -m benchmarks.bench_api --output results.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+import puremagic
+from benchmarks.corpus import DEFAULT_SEED, SIZES, generate
+
+
+def _from_string(path: str, data: bytes):
+    return puremagic.from_string(data)
+
+
+def _from_stream(path: str, data: bytes):
+    with open(path, "rb") as stream:
+        return puremagic.from_stream(stream)
+
+
+APIS = {
+    "from_file": lambda path, data: puremagic.from_file(path),
+    "magic_file": lambda path, data: puremagic.magic_file(path),
+    "from_string": _from_string,
+    "from_stream": _from_stream,
+}
+
+
+def percentile(samples: list[float], pct: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+def summarize(latencies: list[float], elapsed: float | None = None) -> dict:
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    return {
+        "files": len(latencies),
+        "files_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+    }
+
+
+def call(api, path: str, data: bytes) -> bool:
+    try:
+        api(path, data)
+    except (puremagic.PureError, ValueError):
+        return False
+    return True
+
+
+def bench_api(name: str, manifest: list[dict], repeat: int) -> dict:
+    api = APIS[name]
+    contents = {item["path"]: Path(item["path"]).read_bytes() for item in manifest} if name == "from_string" else {}
+    latencies = []
+    by_kind = defaultdict(list)
+    unidentified = 0
+
+    puremagic.reset_stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in manifest:
+            data = contents.get(item["path"], b"")
+            call_start = time.perf_counter()
+            if not call(api, item["path"], data):
+                unidentified += 1
+            latency = time.perf_counter() - call_start
+            latencies.append(latency)
+            by_kind[item["kind"] if item["size"] == "signature" else f"{item['kind']}-{item['size']}"].append(latency)
+    elapsed = time.perf_counter() - start
+    counters = puremagic.get_stats()
+
+    # Memory is traced in a separate pass, tracemalloc slows everything down too much to time at once
+    peak = 0
+    tracemalloc.start()
+    for item in manifest:
+        tracemalloc.reset_peak()
+        call(api, item["path"], contents.get(item["path"], b""))
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return {
+        **summarize(latencies, elapsed),
+        "unidentified": unidentified // repeat,
+        "bytes_read": counters["bytes_read"] // repeat,
+        "bytes_read_by": {key: value // repeat for key, value in counters["bytes_read_by"].items()},
+        "peak_memory_bytes": peak,
+        "by_kind": {kind: summarize(samples) for kind, samples in sorted(by_kind.items())},
+    }
+
+
+def run(corpus: Path, apis: list[str], repeat: int, seed: int) -> dict:
+    manifest = generate(corpus, seed=seed, sizes=SIZES)
+    results = {
+        "puremagic": puremagic.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "corpus": {"files": len(manifest), "bytes": sum(item["bytes"] for item in manifest)},
+        "results": {},
+    }
+    for name in apis:
+        results["results"][name] = bench_api(name, manifest, repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="Directory to generate the corpus in (default: temp dir)")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes over the corpus per API")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Corpus generation seed")
+    parser.add_argument("--api", action="append", choices=list(APIS), help="Only run the given API(s)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="puremagic_corpus_") as tmp:
+        results = run(args.corpus or Path(tmp), args.api or list(APIS), args.repeat, args.seed)
+
+    for name, result in results["results"].items():
+        print(
+            f"{name:<12} {result['files_per_sec']:>10.1f} files/s  p50 {result['p50_ms']:>8.3f} ms  "
+            f"p99 {result['p99_ms']:>8.3f} ms  read {result['bytes_read']:>12} B  peak {result['peak_memory_bytes']} B"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Memory profile of each deep scanner and public API on large inputs.
+
+Every scanner is run directly against the corpus sample it is built for, and
+every API against all large samples, reporting the tracemalloc peak and the
+number of blocks still allocated afterwards, with the top allocation sites.
+tracemalloc only tracks live blocks, so transient allocations show up in the
+peak rather than the block count.
+
+BUDGETS holds the agreed peak for each measurement, test_memory fails when
+one is exceeded. Raise a budget deliberately, never to quiet a failure.
+
+    python -m benchmarks.bench_memory --output memory.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from importlib import import_module
+from pathlib import Path
+
+import puremagic
+from benchmarks.corpus import DEFAULT_SEED, SAMPLES, SIZES
+from puremagic.main import file_details
+from puremagic.scanners import json_scanner
+
+MiB = 1024 * 1024
+# python_scanner skips anything over 1 MB, keep its sample just under that
+PYTHON_SAMPLE_LIMIT = 960 * 1024
+
+# Scanner module to the corpus kind it is fed
+SCANNER_INPUTS = {
+    "text_scanner": "text",
+    "json_scanner": "json",
+    "python_scanner": "python",
+    "zip_scanner": "ooxml",
+    "cfbf_scanner": "cfbf",
+    "mpeg_audio_scanner": "mp3",
+}
+
+
+def _from_file(path: str):
+    try:
+        return puremagic.from_file(path)
+    except puremagic.PureError:
+        return None
+
+
+def _from_string(path: str):
+    try:
+        return puremagic.from_string(Path(path).read_bytes())
+    except puremagic.PureError:
+        return None
+
+
+APIS = {
+    "from_file": _from_file,
+    "magic_file": puremagic.magic_file,
+    "from_string": _from_string,
+}
+
+# Peak traced bytes allowed for a large sample, at most about twice the measured peak with a
+# 256 KiB floor. API budgets cover the worst sample, from_string includes the caller's
+# own copy of the file.
+BUDGETS = {
+    "scanner:text_scanner": MiB // 2,
+    "scanner:json_scanner": 2 * MiB,
+    "scanner:python_scanner": MiB // 4,
+    "scanner:zip_scanner": MiB // 4,
+    "scanner:cfbf_scanner": MiB // 4,
+    "scanner:mpeg_audio_scanner": MiB // 4,
+    "api:from_file": 4 * MiB,
+    "api:magic_file": 4 * MiB,
+    "api:from_string": 8 * MiB,
+}
+
+
+def write_samples(directory: Path, size: int, seed: int = DEFAULT_SEED) -> dict[str, Path]:
+    """Write one sample of each corpus kind at the given size, keyed by kind"""
+    rng = random.Random(seed)
+    paths = {}
+    for kind, (extension, builder) in SAMPLES.items():
+        paths[kind] = directory / f"{kind}{extension}"
+        paths[kind].write_bytes(builder(rng, min(size, PYTHON_SAMPLE_LIMIT) if kind == "python" else size))
+    return paths
+
+
+def profile(func, *args, top: int = 3) -> dict:
+    """Peak traced bytes and blocks retained by a single call"""
+    gc.collect()
+    tracemalloc.start(1)
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    changes = after.compare_to(before, "lineno")
+    return {
+        "peak_bytes": peak,
+        "retained_blocks": sum(change.count_diff for change in changes),
+        "top_sites": [
+            f"{change.traceback[0].filename}:{change.traceback[0].lineno} {change.size_diff} B"
+            for change in sorted(changes, key=lambda change: change.size_diff, reverse=True)[:top]
+            if change.size_diff > 0
+        ],
+    }
+
+
+def profile_scanner(name: str, path: Path) -> dict:
+    scanner = import_module(f"puremagic.scanners.{name}")
+    head, foot = file_details(path)
+    return {"input": path.name, "bytes": path.stat().st_size, **profile(scanner.main, path, head, foot)}
+
+
+def profile_api(name: str, paths: dict[str, Path]) -> dict:
+    results = {kind: profile(APIS[name], str(path)) for kind, path in paths.items()}
+    worst = max(results, key=lambda kind: results[kind]["peak_bytes"])
+    return {"peak_bytes": results[worst]["peak_bytes"], "worst_input": worst, "by_kind": results}
+
+
+def run(directory: Path, size: int, seed: int = DEFAULT_SEED) -> dict:
+    paths = write_samples(directory, size, seed)
+    # Import every scanner up front, so one off module, database and regex loading is not counted
+    puremagic.magic_file(str(paths["text"]))
+    for name in SCANNER_INPUTS:
+        import_module(f"puremagic.scanners.{name}")
+    json_scanner.patterns()
+
+    measurements = {}
+    for name, kind in SCANNER_INPUTS.items():
+        measurements[f"scanner:{name}"] = profile_scanner(name, paths[kind])
+    for name in APIS:
+        measurements[f"api:{name}"] = profile_api(name, paths)
+    return measurements
+
+
+def over_budget(measurements: dict) -> dict[str, tuple[int, int]]:
+    """Measurements whose peak exceeds BUDGETS, as (peak, budget)"""
+    return {
+        key: (value["peak_bytes"], BUDGETS[key])
+        for key, value in measurements.items()
+        if key in BUDGETS and value["peak_bytes"] > BUDGETS[key]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=SIZES["large"], help="Sample size in bytes")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Corpus generation seed")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="puremagic_memory_") as tmp:
+        measurements = run(Path(tmp), args.size, args.seed)
+
+    exceeded = over_budget(measurements)
+    for key, value in measurements.items():
+        budget = BUDGETS.get(key)
+        flag = "  OVER BUDGET" if key in exceeded else ""
+        print(
+            f"{key:<28} peak {value['peak_bytes'] / MiB:>8.2f} MiB"
+            f"{f'  budget {budget / MiB:>6.2f} MiB' if budget else ''}{flag}"
+        )
+    if args.output:
+        results = {
+            "puremagic": puremagic.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "size": args.size,
+            "seed": args.seed,
+            "budgets": BUDGETS,
+            "measurements": measurements,
+        }
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
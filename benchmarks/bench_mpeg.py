@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Per file decode cost of the MPEG audio scanner.
+
+Times mpeg_audio_scanner.main on the MP3 test resources and on corpus MP3
+samples at each size, with its result cache cleared before every run, and
+reports the median time per file and the bytes the scanner read itself
+(the head and foot read by puremagic are not included).
+
+    python -m benchmarks.bench_mpeg --output mpeg.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import puremagic
+from benchmarks.corpus import DEFAULT_SEED, SIZES, mp3_sample
+from puremagic.main import file_details
+from puremagic.scanners import mpeg_audio_scanner
+
+AUDIO_DIR = Path(__file__).parent.parent / "test" / "resources" / "audio"
+
+
+def decode(path: Path, head: bytes, foot: bytes):
+    # Results are cached per path, drop that so every run decodes
+    mpeg_audio_scanner.DataCache.set_file_path(None)
+    return mpeg_audio_scanner.main(path, head, foot)
+
+
+def measure(path: Path, repeat: int) -> dict:
+    head, foot = file_details(path)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(path, head, foot)
+        samples.append(time.perf_counter() - start)
+    puremagic.reset_stats()
+    result = decode(path, head, foot)
+    return {
+        "bytes": path.stat().st_size,
+        "median_us": round(statistics.median(samples) * 1_000_000, 1),
+        "bytes_read": puremagic.get_stats()["bytes_read"],
+        "name": result.name if result else None,
+    }
+
+
+def run(directory: Path, repeat: int, seed: int = DEFAULT_SEED) -> dict:
+    paths = sorted(AUDIO_DIR.glob("*.mp3"))
+    rng = random.Random(seed)
+    for label, size in SIZES.items():
+        path = directory / f"corpus_{label}.mp3"
+        path.write_bytes(mp3_sample(rng, size))
+        paths.append(path)
+    return {path.name: measure(path, repeat) for path in paths}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="Runs per file, the median is reported")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Corpus generation seed")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="puremagic_mpeg_") as tmp:
+        results = run(Path(tmp), args.repeat, args.seed)
+
+    for name, result in results.items():
+        print(f"{name:<48} {result['median_us']:>9.1f} us {result['bytes_read']:>9} bytes read")
+    total = sum(result["median_us"] for result in results.values())
+    print(f"{'total':<48} {total:>9.1f} us")
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "puremagic": puremagic.__version__,
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Worst case inputs for the text and CSV scanners.
+
+Times text_scanner.main on adversarial uploads (one huge line, a million tiny
+lines, nothing but carriage returns, quote storms that make csv.Sniffer
+backtrack, every line a different field count) at growing sizes. Time per MiB
+should stay flat as the size grows, a rising ratio means a path is no longer linear.
+
+    python -m benchmarks.bench_pathological --output pathological.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from puremagic.main import file_details
+from puremagic.scanners import text_scanner
+
+MiB = 1024 * 1024
+DEFAULT_SIZES = (128 * 1024, 256 * 1024, 512 * 1024, MiB)
+
+
+def _repeat(unit: bytes, size: int) -> bytes:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def _distinct_field_counts(size: int) -> bytes:
+    out = bytearray()
+    line = 0
+    while len(out) < size:
+        out += b"," * (line % 2000) + b"\n"
+        line += 1
+    return bytes(out[:size])
+
+
+INPUTS = {
+    "long_line": lambda size: _repeat(b"a,b;c|d:e\t", size),
+    "tiny_lines": lambda size: _repeat(b"a\n", size),
+    "all_cr": lambda size: b"\r" * size,
+    "mixed_line_endings": lambda size: _repeat(b"line\r\nline\nline\r", size),
+    "quote_storm": lambda size: _repeat(b',"', size),
+    "distinct_field_counts": _distinct_field_counts,
+    "wide_csv": lambda size: _repeat(b",".join(b"field%d" % i for i in range(500)) + b"\n", size),
+}
+
+
+def time_input(path: Path, repeat: int) -> float:
+    head, foot = file_details(path)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text_scanner.main(path, head, foot)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run(directory: Path, sizes: tuple[int, ...], repeat: int) -> dict:
+    results = {}
+    for name, builder in INPUTS.items():
+        timings = {}
+        for size in sizes:
+            path = directory / f"{name}_{size}.txt"
+            path.write_bytes(builder(size))
+            timings[size] = time_input(path, repeat)
+        per_mib = [timings[size] / (size / MiB) for size in sizes]
+        results[name] = {
+            "ms": {str(size): round(value * 1000, 3) for size, value in timings.items()},
+            "ms_per_mib": [round(value * 1000, 3) for value in per_mib],
+            # How much more a MiB costs at the largest size than at the smallest
+            "growth": round(per_mib[-1] / per_mib[0], 2) if per_mib[0] else 0.0,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, action="append", help="Input size in bytes, may be repeated")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per input, the median is reported")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+    sizes = tuple(sorted(args.size)) if args.size else DEFAULT_SIZES
+
+    with tempfile.TemporaryDirectory(prefix="puremagic_pathological_") as tmp:
+        results = run(Path(tmp), sizes, args.repeat)
+
+    for name, result in results.items():
+        timings = "  ".join(f"{value:>9.2f}" for value in result["ms"].values())
+        print(f"{name:<22} {timings} ms  growth {result['growth']:>6.2f}x")
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "sizes": sizes,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Import time and cold start benchmark for the puremagic CLI.
+
+Every measurement runs in a fresh interpreter, as happens when the console script
+is called once per file from ``find -exec``. Reports the median and best wall time of:
+
+    * a bare interpreter, for reference
+    * ``import puremagic``
+    * a single file CLI run through ``command_line_entry``
+
+plus a breakdown measured inside fresh interpreters: database load, each deep
+scanner import and argparse setup. Byte code is written and warmed up first
+(PYTHONDONTWRITEBYTECODE is ignored), matching an installed package.
+
+    python -m benchmarks.bench_startup --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_FILE = ROOT / "test" / "resources" / "images" / "test.png"
+
+# Every scanner module, so new ones are measured without being listed here
+SCANNERS = tuple(sorted(path.stem for path in (ROOT / "puremagic" / "scanners").glob("*_scanner.py")))
+
+BREAKDOWN_PROBE = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+import puremagic.main as main
+timings = {"import": time.perf_counter() - start}
+
+start = time.perf_counter()
+main.magic_data()
+timings["database_load"] = time.perf_counter() - start
+
+scanners = {}
+for name in %(scanners)r:
+    start = time.perf_counter()
+    __import__(f"puremagic.scanners.{name}")
+    scanners[name] = time.perf_counter() - start
+timings["scanner_imports"] = scanners
+
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):
+    main.command_line_entry("--version")
+timings["argparse_setup"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def environment() -> dict:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (str(ROOT), env.get("PYTHONPATH"))))
+    return env
+
+
+def wall_time(command: list[str], runs: int, env: dict) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(samples) * 1000, 3), "best_ms": round(min(samples) * 1000, 3)}
+
+
+def breakdown(runs: int, env: dict) -> dict:
+    samples = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", BREAKDOWN_PROBE % {"scanners": SCANNERS}],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+
+    def median_ms(values):
+        return round(statistics.median(values) * 1000, 3)
+
+    return {
+        "import_ms": median_ms([s["import"] for s in samples]),
+        "database_load_ms": median_ms([s["database_load"] for s in samples]),
+        "scanner_imports_ms": {name: median_ms([s["scanner_imports"][name] for s in samples]) for name in SCANNERS},
+        "argparse_setup_ms": median_ms([s["argparse_setup"] for s in samples]),
+    }
+
+
+def run(file: Path, runs: int) -> dict:
+    env = environment()
+    cli = [sys.executable, "-c", f"from puremagic.main import command_line_entry; command_line_entry({str(file)!r})"]
+    # Warm up, writes byte code and fills the OS file cache
+    subprocess.run(cli, env=env, check=True, stdout=subprocess.DEVNULL)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "runs": runs,
+        "file": str(file),
+        "interpreter": wall_time([sys.executable, "-c", "pass"], runs, env),
+        "import": wall_time([sys.executable, "-c", "import puremagic"], runs, env),
+        "cli_single_file": wall_time(cli, runs, env),
+        "breakdown": breakdown(runs, env),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file", type=Path, default=DEFAULT_FILE, help="File identified by the CLI run")
+    parser.add_argument("--runs", type=int, default=20, help="Fresh interpreters started per measurement")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.file, args.runs)
+    for name in ("interpreter", "import", "cli_single_file"):
+        print(f"{name:<16} median {results[name]['median_ms']:>8.2f} ms  best {results[name]['best_ms']:>8.2f} ms")
+    parts = results["breakdown"]
+    print(f"{'import':<16} {parts['import_ms']:>8.2f} ms (in process)")
+    print(f"{'database load':<16} {parts['database_load_ms']:>8.2f} ms")
+    print(f"{'scanner imports':<16} {sum(parts['scanner_imports_ms'].values()):>8.2f} ms")
+    for name, value in parts["scanner_imports_ms"].items():
+        print(f"    {name:<20} {value:>8.2f} ms")
+    print(f"{'argparse setup':<16} {parts['argparse_setup_ms']:>8.2f} ms")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
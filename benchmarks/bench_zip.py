@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+ZIP scanner cost on archives with huge member counts.
+
+Builds OOXML shaped archives with growing numbers of members (the largest
+past 65535, so they carry Zip64 end records) and times zip_scanner.main
+against opening the same archive with zipfile.ZipFile, which is what the
+scanner used to do. Peak traced memory is reported for both.
+
+    python -m benchmarks.bench_zip --output zip.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+from puremagic.main import file_details
+from puremagic.scanners import zip_scanner
+
+DEFAULT_MEMBERS = (1_000, 10_000, 100_000)
+
+APP_XML = b"<Properties><Application>Microsoft Excel</Application></Properties>"
+
+
+def build_archive(path: Path, members: int) -> None:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", b"<Types/>")
+        archive.writestr("docProps/app.xml", APP_XML)
+        for index in range(members):
+            archive.writestr(f"xl/worksheets/sheet{index}.xml", b"")
+
+
+def _zipfile_names(path: Path, *_):
+    with zipfile.ZipFile(path) as archive:
+        return archive.namelist()
+
+
+def measure(func, path: Path, head: bytes, foot: bytes, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path, head, foot)
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func(path, head, foot)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"median_ms": round(statistics.median(samples) * 1000, 3), "peak_bytes": peak}
+
+
+def run(directory: Path, members: tuple[int, ...], repeat: int) -> dict:
+    results = {}
+    for count in members:
+        path = directory / f"members_{count}.xlsx"
+        build_archive(path, count)
+        head, foot = file_details(path)
+        results[str(count)] = {
+            "bytes": path.stat().st_size,
+            "zip_scanner": measure(zip_scanner.main, path, head, foot, repeat),
+            "zipfile": measure(_zipfile_names, path, head, foot, repeat),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, action="append", help="Archive member count, may be repeated")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per archive, the median is reported")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+    members = tuple(sorted(args.members)) if args.members else DEFAULT_MEMBERS
+
+    with tempfile.TemporaryDirectory(prefix="puremagic_zip_") as tmp:
+        results = run(Path(tmp), members, args.repeat)
+
+    for count, result in results.items():
+        scanner, reference = result["zip_scanner"], result["zipfile"]
+        print(
+            f"{count:>8} members  zip_scanner {scanner['median_ms']:>9.2f} ms {scanner['peak_bytes'] / 1024:>9.0f} KiB"
+            f"  zipfile {reference['median_ms']:>9.2f} ms {reference['peak_bytes'] / 1024:>9.0f} KiB"
+        )
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
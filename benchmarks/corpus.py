@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic corpus for the puremagic benchmarks.
+
+Generates one file per signature row in magic_data.json (headers, footers and
+multi-part rows) plus realistic text, CSV, JSON, Python, ZIP, OOXML, CFBF and
+MP3 samples at several sizes. The same seed always produces byte identical files,
+so results from different releases can be compared directly.
+
+    python -m benchmarks.corpus /tmp/puremagic_corpus
+"""
+
+import io
+import json
+import math
+import random
+import re
+import struct
+import sys
+import zipfile
+from binascii import unhexlify
+from pathlib import Path
+
+MAGIC_DATA = Path(__file__).resolve().parent.parent / "puremagic" / "magic_data.json"
+
+DEFAULT_SEED = 20130101
+SIZES = {"small": 4 * 1024, "medium": 256 * 1024, "large": 4 * 1024 * 1024}
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore "
+    "magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+
+def _safe_ext(extension: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9.]", "_", extension or ".bin")
+
+
+def signature_files(rng: random.Random) -> list[tuple[str, str, bytes]]:
+    """One (kind, filename, data) per signature row, the signature placed at its offset inside random filler"""
+    with open(MAGIC_DATA, encoding="utf-8") as f:
+        data = json.load(f)
+
+    files = []
+    for index, (hex_bytes, offset, ext, _, _) in enumerate(data["headers"]):
+        match = unhexlify(hex_bytes)
+        content = bytearray(rng.randbytes(max(4096, offset + len(match) + 512)))
+        content[offset : offset + len(match)] = match
+        files.append(("signature", f"header_{index:04d}{_safe_ext(ext)}", bytes(content)))
+
+    for index, (hex_bytes, offset, ext, _, _) in enumerate(data["footers"]):
+        match = unhexlify(hex_bytes)
+        content = bytearray(rng.randbytes(4096))
+        start = len(content) + offset
+        content[start : start + len(match)] = match
+        files.append(("signature", f"footer_{index:04d}{_safe_ext(ext)}", bytes(content)))
+
+    headers_by_match = {unhexlify(row[0]): row[1] for row in data["headers"]}
+    index = 0
+    for key, options in data["multi-part"].items():
+        key_bytes = unhexlify(key)
+        key_offset = headers_by_match.get(key_bytes, 0)
+        for hex_bytes, offset, ext, _, _ in options:
+            match = unhexlify(hex_bytes)
+            size = max(4096, key_offset + len(key_bytes) + offset + len(match) + 512)
+            content = bytearray(rng.randbytes(size))
+            content[key_offset : key_offset + len(key_bytes)] = key_bytes
+            start = size + offset if offset < 0 else offset
+            content[start : start + len(match)] = match
+            files.append(("signature", f"multi_{index:04d}{_safe_ext(ext)}", bytes(content)))
+            index += 1
+    return files
+
+
+def text_sample(rng: random.Random, size: int) -> bytes:
+    out = io.StringIO()
+    while out.tell() < size:
+        out.write(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 16))).capitalize() + ".\n")
+    return out.getvalue()[:size].encode("ascii")
+
+
+def csv_sample(rng: random.Random, size: int) -> bytes:
+    out = io.StringIO()
+    out.write("id,name,quantity,price,updated\n")
+    row = 0
+    while out.tell() < size:
+        row += 1
+        out.write(
+            f"{row},{rng.choice(_WORDS)},{rng.randint(0, 999)},{rng.random() * 100:.2f},2024-01-{row % 28 + 1:02d}\n"
+        )
+    return out.getvalue().encode("ascii")
+
+
+def json_sample(rng: random.Random, size: int) -> bytes:
+    records = []
+    length = 2
+    while length < size:
+        record = {"id": len(records), "name": rng.choice(_WORDS), "tags": rng.sample(_WORDS, 3), "score": rng.random()}
+        records.append(record)
+        length += len(json.dumps(record)) + 2
+    return json.dumps(records, indent=1).encode("ascii")
+
+
+def python_sample(rng: random.Random, size: int) -> bytes:
+    out = io.StringIO()
+    out.write("#!/usr/bin/env python\nimport os\nimport sys\n\n")
+    index = 0
+    while out.tell() < size:
+        word = rng.choice(_WORDS)
+        out.write(
+            f"\n\ndef {word}_{index}(value, scale={rng.randint(1, 9)}):\n"
+            f'    """Scale {word} values"""\n'
+            f"    if value is None:\n"
+            f"        raise ValueError('{word} missing')\n"
+            f"    for item in range(scale):\n"
+            f"        value += item * {rng.random():.4f}\n"
+            f"    return value\n"
+        )
+        index += 1
+    return out.getvalue().encode("ascii")
+
+
+def zip_sample(rng: random.Random, size: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        members = max(1, size // 8192)
+        for index in range(members):
+            archive.writestr(f"data/file_{index:05d}.txt", text_sample(rng, 8192))
+    return buffer.getvalue()
+
+
+def ooxml_sample(rng: random.Random, size: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.'
+            'wordprocessingml.document.main+xml"/></Types>',
+        )
+        archive.writestr("_rels/.rels", '<?xml version="1.0"?><Relationships/>')
+        archive.writestr(
+            "docProps/app.xml",
+            '<?xml version="1.0"?><Properties><Application>Microsoft Office Word</Application></Properties>',
+        )
+        archive.writestr("word/document.xml", b"<w:document><w:body>" + text_sample(rng, size) + b"</w:body>")
+    return buffer.getvalue()
+
+
+def cfbf_sample(rng: random.Random, size: int, stream_name: str = "WordDocument") -> bytes:
+    """Minimal version 3 compound file with a root entry and a single stream"""
+    sector_size = 512
+    stream_size = max(4096, size)
+    data_sectors = math.ceil(stream_size / sector_size)
+    fat_sectors = 1
+    while fat_sectors * (sector_size // 4) < fat_sectors + 1 + data_sectors:
+        fat_sectors += 1
+    dir_sector = fat_sectors
+    first_data = fat_sectors + 1
+    total_sectors = first_data + data_sectors
+
+    fat = [0xFFFFFFFD] * fat_sectors + [0xFFFFFFFE]
+    fat += [first_data + i + 1 for i in range(data_sectors - 1)] + [0xFFFFFFFE]
+    fat += [0xFFFFFFFF] * (fat_sectors * (sector_size // 4) - total_sectors)
+
+    difat = list(range(fat_sectors)) + [0xFFFFFFFF] * (109 - fat_sectors)
+    header = struct.pack(
+        "<8s16sHHHHH6sIIIIIIIII109I",
+        b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",
+        b"\x00" * 16,
+        0x3E,
+        3,
+        0xFFFE,
+        9,
+        6,
+        b"\x00" * 6,
+        0,
+        fat_sectors,
+        dir_sector,
+        0,
+        4096,
+        0xFFFFFFFE,
+        0,
+        0xFFFFFFFE,
+        0,
+        *difat,
+    )
+
+    def entry(name: str, obj_type: int, child: int, start: int, length: int) -> bytes:
+        encoded = (name + "\x00").encode("utf-16-le") if name else b""
+        return struct.pack(
+            "<64sHBBIII16sI8s8sIQ",
+            encoded,
+            len(encoded),
+            obj_type,
+            1,
+            0xFFFFFFFF,
+            0xFFFFFFFF,
+            child,
+            b"\x00" * 16,
+            0,
+            b"\x00" * 8,
+            b"\x00" * 8,
+            start,
+            length,
+        )
+
+    directory = (
+        entry("Root Entry", 5, 1, 0xFFFFFFFE, 0)
+        + entry(stream_name, 2, 0xFFFFFFFF, first_data, stream_size)
+        + entry("", 0, 0xFFFFFFFF, 0, 0) * 2
+    )
+    stream = rng.randbytes(data_sectors * sector_size)
+    return header + struct.pack(f"<{len(fat)}I", *fat) + directory + stream
+
+
+def mp3_sample(rng: random.Random, size: int) -> bytes:
+    """MPEG-1 Layer III, 128k 44.1Khz stereo CBR frames followed by an ID3v1 tag"""
+    frame_header = b"\xff\xfb\x90\x00"
+    frame_size = 417  # 144 * 128000 / 44100
+    frames = max(4, (size - 128) // frame_size)
+    body = b"".join(frame_header + rng.randbytes(frame_size - 4) for _ in range(frames))
+    id3v1 = b"TAG" + b"Benchmark".ljust(30, b"\x00") + b"puremagic".ljust(60, b"\x00") + b"2024" + b"\x00" * 31
+    return body + id3v1
+
+
+SAMPLES = {
+    "text": (".txt", text_sample),
+    "csv": (".csv", csv_sample),
+    "json": (".json", json_sample),
+    "python": (".py", python_sample),
+    "zip": (".zip", zip_sample),
+    "ooxml": (".docx", ooxml_sample),
+    "cfbf": (".doc", cfbf_sample),
+    "mp3": (".mp3", mp3_sample),
+}
+
+
+def generate(directory: Path | str, seed: int = DEFAULT_SEED, sizes: dict[str, int] | None = None) -> list[dict]:
+    """Write the corpus into directory, returning a manifest of kind, size label, path and byte size"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+
+    for kind, name, data in signature_files(rng):
+        path = directory / "signatures" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+        manifest.append({"kind": kind, "size": "signature", "path": str(path), "bytes": len(data)})
+
+    for label, size in (sizes or SIZES).items():
+        for kind, (extension, builder) in SAMPLES.items():
+            data = builder(rng, size)
+            path = directory / label / f"{kind}{extension}"
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(data)
+            manifest.append({"kind": kind, "size": label, "path": str(path), "bytes": len(data)})
+
+    return manifest
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m benchmarks.corpus OUTPUT_DIR")
+    files = generate(sys.argv[1])
+    print(f"Wrote {len(files)} files ({sum(item['bytes'] for item in files)} bytes) to {sys.argv[1]}")
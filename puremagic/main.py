@@ -14,25 +14,17 @@ Gary C. Kessler
 
 import json
 import os
-from binascii import unhexlify
 from collections import namedtuple
 from itertools import chain
-from pathlib import Path
+from typing import TYPE_CHECKING
 
 import puremagic
+from puremagic.stats import Trace, active_trace, record_read, stats, trace_decision, tracing
 
-if os.getenv("PUREMAGIC_DEEPSCAN") != "0":
-    from puremagic.scanners import (
-        zip_scanner,
-        pdf_scanner,
-        text_scanner,
-        json_scanner,
-        python_scanner,
-        sndhdr_scanner,
-        mpeg_audio_scanner,
-        hdf5_scanner,
-        cfbf_scanner,
-    )
+# Deep scanners, pathlib and argparse are imported where they are first needed,
+# keeping them out of the start up cost of `import puremagic` and of each CLI run.
+if TYPE_CHECKING:
+    from typing import Literal, overload
 
 __author__ = "Chris Griffith"
 __version__ = "2.1.1"
@@ -41,11 +33,15 @@ __all__ = [
     "magic_string",
     "magic_stream",
     "magic_extension",
+    "magic_archive_members",
     "from_file",
     "from_string",
     "from_stream",
     "from_extension",
     "ext_from_filename",
+    "is_text",
+    "get_stats",
+    "reset_stats",
     "PureError",
     "PureMagic",
     "PureMagicWithConfidence",
@@ -95,18 +91,13 @@ def magic_data(
     extensions = [create_puremagic(x) for x in data["extension_only"]]
     multi_part_extensions = {}
     for file_match, option_list in data["multi-part"].items():
-        multi_part_extensions[unhexlify(file_match.encode("ascii"))] = [create_puremagic(x) for x in option_list]
+        multi_part_extensions[bytes.fromhex(file_match)] = [create_puremagic(x) for x in option_list]
     return headers, footers, extensions, multi_part_extensions
 
 
 def create_puremagic(x: list) -> PureMagic:
-    return PureMagic(
-        byte_match=unhexlify(x[0].encode("ascii")),
-        offset=x[1],
-        extension=x[2],
-        mime_type=x[3],
-        name=x[4],
-    )
+    # Positional arguments and bytes.fromhex keep the database load cheap, it runs on every import
+    return PureMagic(bytes.fromhex(x[0]), x[1], x[2], x[3], x[4])
 
 
 magic_header_array, magic_footer_array, extension_only_array, multi_part_dict = magic_data()
@@ -128,6 +119,7 @@ def get_max_lengths() -> tuple[int, int]:
 
 
 max_head, max_foot = get_max_lengths()
+signature_extensions = frozenset(x.extension for x in chain(magic_header_array, magic_footer_array))
 
 
 def determine_confidence(matches, ext=None) -> list[PureMagicWithConfidence]:
@@ -152,6 +144,8 @@ def determine_confidence(matches, ext=None) -> list[PureMagicWithConfidence]:
 def identify_all(header: bytes, footer: bytes, ext=None) -> list[PureMagicWithConfidence]:
     """Attempt to identify 'data' by its magic numbers"""
 
+    stats.identifications += 1
+
     # Capture the length of the data
     # That way we do not try to identify bytes that don't exist
     matches = []
@@ -162,6 +156,7 @@ def identify_all(header: bytes, footer: bytes, ext=None) -> list[PureMagicWithCo
             continue
         if header[start:end] == magic_row.byte_match:
             matches.append(magic_row)
+    header_hits = len(matches)
 
     for magic_row in magic_footer_array:
         start = magic_row.offset
@@ -169,6 +164,7 @@ def identify_all(header: bytes, footer: bytes, ext=None) -> list[PureMagicWithCo
         match_area = footer[start:end] if end != 0 else footer[start:]
         if match_area == magic_row.byte_match:
             matches.append(magic_row)
+    footer_hits = len(matches) - header_hits
 
     new_matches = set()
     for matched in matches:
@@ -202,10 +198,28 @@ def identify_all(header: bytes, footer: bytes, ext=None) -> list[PureMagicWithCo
                             )
                         )
 
+    if (trace := active_trace.get()) is not None:
+        trace_signatures(trace, header, matches, header_hits, footer_hits, new_matches)
     matches.extend(list(new_matches))
+    stats.signature_hits.update(matches)
     return determine_confidence(matches, ext)
 
 
+def trace_signatures(trace, header: bytes, matches: list, header_hits: int, footer_hits: int, multi_part_hits: set):
+    """Record every signature row identify_all compared against the data, and which of them matched"""
+    for magic_row in magic_header_array:
+        if magic_row.offset + len(magic_row.byte_match) <= len(header):
+            trace.tested.append(("header", magic_row))
+    trace.tested.extend(("footer", magic_row) for magic_row in magic_footer_array)
+    for matched in matches:
+        for magic_row in multi_part_dict.get(matched.byte_match, ()):
+            if magic_row.offset < 0 or magic_row.offset + len(magic_row.byte_match) <= len(header):
+                trace.tested.append(("multi-part", magic_row))
+    trace.matched.extend(("header", magic_row) for magic_row in matches[:header_hits])
+    trace.matched.extend(("footer", magic_row) for magic_row in matches[header_hits : header_hits + footer_hits])
+    trace.matched.extend(("multi-part", magic_row) for magic_row in multi_part_hits)
+
+
 def perform_magic(header: bytes, footer: bytes, mime: bool, ext=None, filename=None) -> str:
     """Discover what type of file it is based on the incoming string"""
     if not header:
@@ -232,11 +246,14 @@ def file_details(filename: os.PathLike | str) -> tuple[bytes, bytes]:
         raise PureError("Not a regular file")
     with open(filename, "rb") as fin:
         head = fin.read(max_head)
+        record_read("header", 0, len(head))
         try:
             fin.seek(-max_foot, os.SEEK_END)
         except OSError:
             fin.seek(0)
+        foot_offset = fin.tell()
         foot = fin.read()
+        record_read("footer", foot_offset, len(foot))
     return head, foot
 
 
@@ -248,12 +265,15 @@ def string_details(string):
 def stream_details(stream):
     """Grab the start and end of the stream"""
     head = stream.read(max_head)
+    record_read("header", 0, len(head))
     try:
         stream.seek(-max_foot, os.SEEK_END)
     except (OSError, ValueError):  # fsspec throws ValueError
         # File is smaller than the max_foot size, jump to beginning
         stream.seek(0)
+    foot_offset = stream.tell()
     foot = stream.read()
+    record_read("footer", foot_offset, len(foot))
     stream.seek(0)
     return head, foot
 
@@ -269,12 +289,11 @@ def ext_from_filename(filename: os.PathLike | str) -> str:
     except ValueError:
         return ""
     ext = f".{ext}"
-    all_exts = [x.extension for x in chain(magic_header_array, magic_footer_array)]
 
     if base[-4:].startswith("."):
         # For double extensions like .tar.gz
         long_ext = base[-4:] + ext
-        if long_ext in all_exts:
+        if long_ext in signature_extensions:
             return long_ext
     return ext
 
@@ -327,14 +346,32 @@ def from_stream(stream, mime: bool = False, filename: os.PathLike | str | None =
     return perform_magic(head, foot, mime, ext, filename=filename)
 
 
-def magic_file(filename: os.PathLike | str) -> list[PureMagicWithConfidence]:
+if TYPE_CHECKING:
+
+    @overload
+    def magic_file(filename: os.PathLike | str, trace: Literal[False] = False) -> list[PureMagicWithConfidence]: ...
+
+    @overload
+    def magic_file(
+        filename: os.PathLike | str, trace: Literal[True]
+    ) -> tuple[list[PureMagicWithConfidence], Trace]: ...
+
+
+def magic_file(filename: os.PathLike | str, trace: bool = False):
     """
     Returns list of (num_of_matches, array_of_matches)
     arranged by highest confidence match first.
+    If trace is True a tuple of (matches, Trace) is returned instead, the Trace
+    lists every signature row tested and matched, every byte range read and
+    why deep scan kept or replaced the magic result.
 
     :param filename: path to file
+    :param trace: also return a Trace of the identification
     :return: list of possible matches, highest confidence first
     """
+    if trace:
+        with tracing() as file_trace:
+            return magic_file(filename), file_trace
     head, foot = file_details(filename)
     if not head:
         raise PureValueError("Input was empty")
@@ -392,6 +429,34 @@ def magic_stream(
     return info
 
 
+def magic_archive_members(
+    filename: os.PathLike | str,
+    max_depth: int = 2,
+    max_members: int = 10_000,
+    max_bytes: int = 64 * 1024 * 1024,
+):
+    """
+    Lazily identify every member of a ZIP archive, without extracting it.
+
+    Yields a ZipMember (name, size, depth, matches) per member, matches being
+    the identify_all results for the start of the member or None when it was
+    not read. Members of nested archives are named "inner.zip/member".
+
+    :param filename: path to the ZIP archive
+    :param max_depth: how many levels of nested ZIP archives to descend into
+    :param max_members: stop after this many members, nested ones included
+    :param max_bytes: total decompressed bytes to spend, members after that are listed unidentified
+    """
+    from puremagic.scanners import zip_scanner  # noqa: PLC0415
+
+    with open(filename, "rb") as file:
+        try:
+            directory = zip_scanner.CentralDirectory(file)
+        except ValueError as err:
+            raise PureError(f"Could not read ZIP archive: {err}") from None
+        yield from zip_scanner.walk_members(directory, "", 0, max_depth, [max_members, max_bytes])
+
+
 def from_extension(extension: str, mime: bool = True) -> str:
     """Look up a file type by its extension and return the MIME type or name.
 
@@ -437,6 +502,19 @@ def magic_extension(extension: str) -> list[PureMagicWithConfidence]:
     return sorted(matches, key=lambda x: (x.confidence, len(x.byte_match)), reverse=True)
 
 
+def scan_with(scanner, filename: os.PathLike | str, head: bytes, foot: bytes):
+    """Run a single deep scanner module, keeping count of how often it is used and how often it matches"""
+    name = scanner.__name__.rsplit(".", 1)[-1]
+    stats.scanner_invocations[name] += 1
+    result = scanner.main(filename, head, foot)
+    if result:
+        stats.scanner_successes[name] += 1
+        trace_decision(f"{name} matched {result.name!r} ({result.extension}) at confidence {result.confidence}")
+    else:
+        trace_decision(f"{name} found no match")
+    return result
+
+
 def single_deep_scan(
     bytes_match: bytes | bytearray | None,
     filename: os.PathLike | str,
@@ -448,36 +526,85 @@ def single_deep_scan(
         return None
     if head is None or foot is None:
         return None
+    from pathlib import Path  # noqa: PLC0415
+
+    from puremagic.scanners import (  # noqa: PLC0415
+        cfbf_scanner,
+        compressed_scanner,
+        hdf5_scanner,
+        json_scanner,
+        mpeg_audio_scanner,
+        pdf_scanner,
+        python_scanner,
+        sndhdr_scanner,
+        text_scanner,
+        xml_scanner,
+        zip_scanner,
+    )
+
     if not isinstance(filename, os.PathLike):
         filename = Path(filename)
     match bytes_match:
         case zip_scanner.match_bytes:
-            return zip_scanner.main(filename, head, foot)
+            return scan_with(zip_scanner, filename, head, foot)
         case pdf_scanner.match_bytes:
-            return pdf_scanner.main(filename, head, foot)
+            return scan_with(pdf_scanner, filename, head, foot)
         case sndhdr_scanner.hcom_match_bytes | sndhdr_scanner.fssd_match_bytes | sndhdr_scanner.sndr_match_bytes:
             # sndr is a loose confidence and other results may be better
-            result = sndhdr_scanner.main(filename, head, foot)
+            result = scan_with(sndhdr_scanner, filename, head, foot)
             if result and result.confidence > confidence:
                 return result
         case mpeg_bytes if mpeg_bytes in mpeg_audio_scanner.mpeg_audio_signatures:
-            result = mpeg_audio_scanner.main(filename, head, foot)
+            result = scan_with(mpeg_audio_scanner, filename, head, foot)
             if result and result.confidence > confidence:
                 return result
         case cfbf_scanner.match_bytes | cfbf_scanner.match_bytes_short:
-            return cfbf_scanner.main(filename, head, foot)
-
+            return scan_with(cfbf_scanner, filename, head, foot)
+        case (
+            compressed_scanner.gzip_match_bytes
+            | compressed_scanner.bzip2_match_bytes
+            | compressed_scanner.xz_match_bytes
+        ):
+            return scan_with(compressed_scanner, filename, head, foot)
+
+    stats.scanner_invocations["eml"] += 1
     if eml_result := text_scanner.eml_check(head):
+        stats.scanner_successes["eml"] += 1
         return eml_result
 
     # The first match wins
-    for scanner in (pdf_scanner, python_scanner, json_scanner, hdf5_scanner):
-        result = scanner.main(filename, head, foot)
+    for scanner in (pdf_scanner, xml_scanner, python_scanner, json_scanner, hdf5_scanner):
+        result = scan_with(scanner, filename, head, foot)
         if result:
             return result
     return None
 
 
+def head_deep_scan(
+    filename: os.PathLike | str,
+    head: bytes | None = None,
+    foot: bytes | None = None,
+):
+    """Deep scanners keyed on the head rather than a signature, one scanner covers every brand or form"""
+    if os.getenv("PUREMAGIC_DEEPSCAN") == "0":
+        return None
+    if head is None or foot is None:
+        return None
+    from pathlib import Path  # noqa: PLC0415
+
+    from puremagic.scanners import executable_scanner, isobmff_scanner, riff_scanner  # noqa: PLC0415
+
+    if not isinstance(filename, os.PathLike):
+        filename = Path(filename)
+    if head[4:8] in isobmff_scanner.box_types:
+        return scan_with(isobmff_scanner, filename, head, foot)
+    if head[:4] in riff_scanner.form_ids:
+        return scan_with(riff_scanner, filename, head, foot)
+    if head[:2] == executable_scanner.mz_match_bytes or head[:4] in executable_scanner.match_bytes:
+        return scan_with(executable_scanner, filename, head, foot)
+    return None
+
+
 def catch_all_deep_scan(
     filename: os.PathLike | str,
     head: bytes | None = None,
@@ -487,9 +614,13 @@ def catch_all_deep_scan(
         return None
     if head is None or foot is None:
         return None
+    from pathlib import Path  # noqa: PLC0415
+
+    from puremagic.scanners import text_scanner  # noqa: PLC0415
+
     if not isinstance(filename, os.PathLike):
         filename = Path(filename)
-    return text_scanner.main(filename, head, foot)
+    return scan_with(text_scanner, filename, head, foot)
 
 
 def run_deep_scan(
@@ -499,13 +630,37 @@ def run_deep_scan(
     foot: bytes | None = None,
     raise_on_none: bool = True,
 ):
+    # Run once whatever matched, falling through to the other scanners when it finds nothing
+    try:
+        result = head_deep_scan(filename, head, foot)
+    except Exception as err:
+        stats.swallowed_exceptions[type(err).__name__] += 1
+        trace_decision(f"Head deep scan raised {type(err).__name__}: {err}, ignoring it")
+    else:
+        if result:
+            best = matches[0] if matches and matches[0].byte_match != b"" else None
+            trace_decision(f"Using deep scan result {result.name!r} keyed on the head")
+            return [
+                PureMagicWithConfidence(
+                    confidence=result.confidence,
+                    byte_match=best.byte_match if best else None,
+                    offset=best.offset if best else None,
+                    extension=result.extension,
+                    mime_type=result.mime_type,
+                    name=result.name,
+                )
+            ]
+
     if not matches or matches[0].byte_match == b"":
+        trace_decision("No signature matched, running deep scanners without a magic hint")
         try:
             result = single_deep_scan(None, filename, head, foot)
-        except Exception:
-            pass
+        except Exception as err:
+            stats.swallowed_exceptions[type(err).__name__] += 1
+            trace_decision(f"Deep scan raised {type(err).__name__}: {err}, ignoring it")
         else:
             if result:
+                trace_decision(f"Using deep scan result {result.name!r} as there was no signature match")
                 return [
                     PureMagicWithConfidence(
                         confidence=result.confidence,
@@ -522,6 +677,7 @@ def run_deep_scan(
             raise
         else:
             if result:
+                trace_decision(f"Using catch-all text scanner result {result.name!r} as there was no signature match")
                 return [
                     PureMagicWithConfidence(
                         confidence=result.confidence,
@@ -539,9 +695,17 @@ def run_deep_scan(
         # noinspection PyBroadException
         try:
             result = single_deep_scan(pure_magic_match.byte_match, filename, head, foot, pure_magic_match.confidence)
-        except Exception:
+        except Exception as err:
+            stats.swallowed_exceptions[type(err).__name__] += 1
+            trace_decision(
+                f"Deep scan for {pure_magic_match.name!r} raised {type(err).__name__}: {err}, trying next match"
+            )
             continue
         if result:
+            trace_decision(
+                f"Deep scan result {result.name!r} ({result.extension}) overrides magic match "
+                f"{pure_magic_match.name!r} ({pure_magic_match.extension})"
+            )
             return [
                 PureMagicWithConfidence(
                     confidence=result.confidence,
@@ -563,10 +727,15 @@ def run_deep_scan(
     if matches[0].confidence < 0.5 and is_generic:
         try:
             result = catch_all_deep_scan(filename, head, foot)
-        except Exception:
-            pass
+        except Exception as err:
+            stats.swallowed_exceptions[type(err).__name__] += 1
+            trace_decision(f"Catch-all text scanner raised {type(err).__name__}: {err}, ignoring it")
         else:
             if result and result.extension and result.confidence > matches[0].confidence:
+                trace_decision(
+                    f"Generic text override: text scanner result {result.name!r} ({result.confidence}) "
+                    f"replaces low confidence generic match {matches[0].name!r} ({matches[0].confidence})"
+                )
                 return [
                     PureMagicWithConfidence(
                         confidence=result.confidence,
@@ -577,12 +746,53 @@ def run_deep_scan(
                         name=result.name,
                     )
                 ]
+            trace_decision(f"Keeping magic match {matches[0].name!r}, text scanner result was not more confident")
+    elif not is_generic:
+        trace_decision(f"Keeping magic match {matches[0].name!r}, it is a specific non-text type ({best_mime})")
+    else:
+        trace_decision(
+            f"Keeping magic match {matches[0].name!r}, confidence {matches[0].confidence} is too high to override"
+        )
     return matches
 
 
+def is_text(data: str | bytes | bytearray) -> bool:
+    """Quick check whether data looks like text rather than binary.
+
+    Builds a byte class histogram over the first 64 KiB, anything holding NUL bytes
+    or more than 1% control characters (outside of UTF-16 with a byte order mark)
+    is binary. It does not check the data decodes.
+
+    :param data: bytes to check, str is always text
+    :return: False if the data is binary
+    """
+    if isinstance(data, str):
+        return True
+    from puremagic.scanners.text_scanner import is_text as text_check  # noqa: PLC0415
+
+    return text_check(data)
+
+
+def get_stats() -> dict:
+    """Snapshot of the aggregate counters collected since import or the last reset.
+
+    Includes identifications performed, hits per signature row, deep scanner
+    invocations and successes, exceptions swallowed during deep scan and bytes read.
+
+    :return: dictionary of counters
+    """
+    return stats.as_dict()
+
+
+def reset_stats() -> None:
+    """Zero all counters returned by get_stats"""
+    stats.reset()
+
+
 def command_line_entry(*args):
     import sys  # noqa: PLC0415
     from argparse import ArgumentParser  # noqa: PLC0415
+    from pathlib import Path  # noqa: PLC0415
 
     parser = ArgumentParser(
         description=(
@@ -604,6 +814,18 @@ def command_line_entry(*args):
         dest="extension",
         help="Look up MIME type for a file extension (e.g. pdf or .pdf)",
     )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        dest="stats",
+        help="Print identification counters after all files are processed",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        dest="trace",
+        help="Print every signature tested, byte range read and deep scan decision",
+    )
     parser.add_argument("files", nargs="*", type=Path)
     parser.add_argument("--version", action="version", version=puremagic.__version__)
     args = parser.parse_args(args if args else sys.argv[1:])
@@ -639,6 +861,7 @@ def command_line_entry(*args):
         if not fn.exists():
             print(f"File '{fn}' does not exist!")
             continue
+        file_trace = None
         if fn.is_dir():
             for file in fn.iterdir():
                 if not file.is_file():
@@ -650,7 +873,13 @@ def command_line_entry(*args):
                     continue
         else:
             try:
-                print(f"'{fn}' : {from_file(fn, args.mime)}")
+                if args.trace:
+                    # The printed result and the trace come from the same identification
+                    with tracing() as file_trace:
+                        result = from_file(fn, args.mime)
+                else:
+                    result = from_file(fn, args.mime)
+                print(f"'{fn}' : {result}")
             except (PureError, PureValueError):
                 print(f"'{fn}' : could not be Identified")
                 continue
@@ -668,6 +897,36 @@ def command_line_entry(*args):
                 print(f"\tMime Type: {result.mime_type}")
                 print(f"\tByte Match: {result.byte_match}")
                 print(f"\tOffset: {result.offset}\n")
+        if file_trace is not None:
+            tested = file_trace.as_dict()["tested"]
+            print("Trace")
+            print(f"\tSignatures Tested: {', '.join(f'{table} {count}' for table, count in tested.items())}")
+            print("\tSignatures Matched:")
+            for table, row in file_trace.matched:
+                print(f"\t\t{table:<10} {row.byte_match!r}@{row.offset} {row.extension} {row.name}")
+            print("\tReads:")
+            for reader, offset, length in file_trace.reads:
+                print(f"\t\t{reader:<18} offset {offset:<10} length {length}")
+            print("\tDecisions:")
+            for decision in file_trace.decisions:
+                print(f"\t\t{decision}")
+            print()
+
+    if args.stats:
+        snapshot = get_stats()
+        print("Statistics")
+        print(f"\tIdentifications: {snapshot['identifications']}")
+        print(f"\tBytes Read: {snapshot['bytes_read']}")
+        for title, key in (
+            ("Signature Hits", "signature_hits"),
+            ("Scanner Invocations", "scanner_invocations"),
+            ("Scanner Successes", "scanner_successes"),
+            ("Swallowed Exceptions", "swallowed_exceptions"),
+            ("Bytes Read By", "bytes_read_by"),
+        ):
+            print(f"\t{title}:")
+            for name, count in snapshot[key].items():
+                print(f"\t\t{count:>6}  {name}")
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -2,6 +2,7 @@ import os
 import struct
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
 match_bytes = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
 match_bytes_short = b"\xd0\xcf\x11\xe0"
@@ -24,6 +25,54 @@ _PREFIX_MATCHES = [
     ("__substg1.0_", ".msg", "Outlook Message", "application/vnd.ms-outlook"),
 ]
 
+# Directory sectors followed at most, 128 sectors of 512 bytes hold 512 entries
+MAX_DIRECTORY_SECTORS = 128
+# Sector ids from here up are markers (free, end of chain, FAT, DIFAT) rather than sectors
+_MAX_REGULAR_SECTOR = 0xFFFFFFFA
+# DIFAT entries held in the header itself, at offset 76
+_HEADER_DIFAT_ENTRIES = 109
+
+
+class _SectorReader:
+    """Reads sectors through one file handle, serving them from the head where it reaches,
+    and looks up FAT entries, loading only the FAT and DIFAT sectors actually needed."""
+
+    __slots__ = ("file", "head", "sector_size", "difat", "next_difat", "fat")
+
+    def __init__(self, file, head: bytes, sector_size: int):
+        self.file = file
+        self.head = head
+        self.sector_size = sector_size
+        self.difat = list(struct.unpack_from(f"<{_HEADER_DIFAT_ENTRIES}I", head, 76))
+        self.next_difat = struct.unpack_from("<I", head, 68)[0]
+        self.fat: dict[int, bytes] = {}
+
+    def read(self, sector_id: int) -> bytes:
+        offset = (sector_id + 1) * self.sector_size
+        if offset + self.sector_size <= len(self.head):
+            return self.head[offset : offset + self.sector_size]
+        self.file.seek(offset)
+        data = self.file.read(self.sector_size)
+        record_read("cfbf_scanner", offset, len(data))
+        if len(data) < self.sector_size:
+            raise ValueError(f"CFBF sector {sector_id} is past the end of the file")
+        return data
+
+    def next_sector(self, sector_id: int) -> int:
+        """The FAT entry of a sector, the next sector in its chain"""
+        per_sector = self.sector_size // 4
+        index = sector_id // per_sector
+        # Past the header's 109 entries the DIFAT continues in its own chain of sectors
+        while index >= len(self.difat) and self.next_difat < _MAX_REGULAR_SECTOR:
+            entries = struct.unpack(f"<{per_sector}I", self.read(self.next_difat))
+            self.difat.extend(entries[:-1])
+            self.next_difat = entries[-1]
+        if index >= len(self.difat) or self.difat[index] >= _MAX_REGULAR_SECTOR:
+            raise ValueError(f"CFBF sector {sector_id} is not in the FAT")
+        if index not in self.fat:
+            self.fat[index] = self.read(self.difat[index])
+        return struct.unpack_from("<I", self.fat[index], (sector_id % per_sector) * 4)[0]
+
 
 def _extract_stream_names(dir_data: bytes) -> set[str]:
     """Parse CFBF directory entries and return the set of stream/storage names."""
@@ -80,18 +129,20 @@ def main(file_path: os.PathLike, head: bytes, foot: bytes) -> Match | None:
     if first_dir_secid < 0:
         return None
 
-    # Directory sector offset: header occupies first sector_size bytes
-    dir_offset = (first_dir_secid + 1) * sector_size
-
+    # The directory is a chain of sectors, each holding sector_size / 128 entries.
+    # Follow it until the names identify the format, the chain ends or the cap is reached.
+    stream_names: set[str] = set()
     try:
         with open(file_path, "rb") as f:
-            f.seek(dir_offset)
-            dir_data = f.read(sector_size)
-    except (OSError, ValueError):
-        return None
-
-    if not dir_data:
-        return None
-
-    stream_names = _extract_stream_names(dir_data)
-    return _identify_format(stream_names)
+            sectors = _SectorReader(f, head, sector_size)
+            sector_id, seen = first_dir_secid, set()
+            while sector_id < _MAX_REGULAR_SECTOR and sector_id not in seen and len(seen) < MAX_DIRECTORY_SECTORS:
+                seen.add(sector_id)
+                stream_names |= _extract_stream_names(sectors.read(sector_id))
+                if result := _identify_format(stream_names):
+                    return result
+                sector_id = sectors.next_sector(sector_id)
+    except (OSError, ValueError, struct.error):
+        # Truncated or corrupt, whatever was read so far did not identify it
+        pass
+    return None
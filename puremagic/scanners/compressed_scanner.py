@@ -0,0 +1,119 @@
+import os
+import zlib
+
+from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
+
+gzip_match_bytes = b"\x1f\x8b\x08"
+bzip2_match_bytes = b"BZh"
+xz_match_bytes = b"\xfd7zXZ\x00"
+
+# Decompressed bytes handed to the signature tables, enough for every header signature (ISO 9660 sits at 32 KiB)
+MAX_DECOMPRESSED = 40 * 1024
+# Compressed bytes read at most to get there, poorly compressing payloads just get a shorter peek
+MAX_COMPRESSED = 256 * 1024
+CHUNK_SIZE = 16 * 1024
+
+# match bytes: (extension, name, mime type) of the compressor
+COMPRESSORS = {
+    gzip_match_bytes: (".gz", "gzip", "application/x-gzip"),
+    bzip2_match_bytes: (".bz2", "bzip2", "application/x-bzip2"),
+    xz_match_bytes: (".xz", "xz", "application/x-xz"),
+}
+
+
+def decompressor(match_bytes: bytes):
+    if match_bytes == gzip_match_bytes:
+        # Same decoder the gzip module uses, with the gzip header handled by zlib
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Only imported for the streams that need them, keeping them out of every deep scan
+    if match_bytes == bzip2_match_bytes:
+        import bz2  # noqa: PLC0415
+
+        return bz2.BZ2Decompressor()
+    import lzma  # noqa: PLC0415
+
+    return lzma.LZMADecompressor(lzma.FORMAT_XZ)
+
+
+def peek(file_path: os.PathLike | str, head: bytes, match_bytes: bytes) -> tuple[bytes, bool]:
+    """Decompress the start of the stream, never more than MAX_DECOMPRESSED bytes out or MAX_COMPRESSED in.
+
+    The head already read is used first, the file is only opened when it was not enough.
+
+    :return: (decompressed bytes, whole stream decompressed)
+    """
+    decoder = decompressor(match_bytes)
+    # zlib takes the output cap as max_length too, all three stop there and keep the rest of their input
+    out = decoder.decompress(head, MAX_DECOMPRESSED)
+    if len(out) >= MAX_DECOMPRESSED or decoder.eof:
+        # Concatenated streams (multi member gzip) carry on past the first end of stream
+        return out, decoder.eof and not decoder.unused_data and os.path.getsize(file_path) <= len(head)
+    consumed = len(head)
+    with open(file_path, "rb") as file:
+        file.seek(consumed)
+        while consumed < MAX_COMPRESSED and len(out) < MAX_DECOMPRESSED and not decoder.eof:
+            chunk = file.read(min(CHUNK_SIZE, MAX_COMPRESSED - consumed))
+            if not chunk:
+                break
+            record_read("compressed_scanner", consumed, len(chunk))
+            consumed += len(chunk)
+            out += decoder.decompress(chunk, MAX_DECOMPRESSED - len(out))
+    return out, decoder.eof and not decoder.unused_data and consumed >= os.path.getsize(file_path)
+
+
+def text_payload(inner_path: str, data: bytes, complete: bool) -> Match | None:
+    """JSON, CSV or plain text, for payloads without a signature"""
+    from puremagic.scanners import json_scanner, text_scanner  # noqa: PLC0415
+
+    if not text_scanner.is_text(data):
+        return None
+    if not complete:
+        # Drop a character possibly cut in half by the end of the peek
+        data = data[: data.rfind(b"\n") + 1] or data
+    try:
+        text, encoding = text_scanner.decode_any(data)
+    except TypeError:
+        return None
+    if text.lstrip()[:1] in ("{", "["):
+        validator = json_scanner.JSONValidator()
+        if validator.feed(text, final=complete):
+            return Match(".json", "JSON File", "application/json", confidence=1.0 if complete else 0.8)
+    if csv_match := text_scanner.csv_check(inner_path, text):
+        return csv_match
+    return Match(".txt", f"{encoding} text", "text/plain", confidence=0.8)
+
+
+def main(file_path: os.PathLike | str, head: bytes, _) -> Match | None:
+    from puremagic.main import identify_all  # noqa: PLC0415
+
+    match_bytes = next((match_bytes for match_bytes in COMPRESSORS if head.startswith(match_bytes)), None)
+    if match_bytes is None:
+        return None
+    extension, compressor, mime_type = COMPRESSORS[match_bytes]
+    try:
+        data, complete = peek(file_path, head, match_bytes)
+    except Exception:
+        # Corrupt or not really compressed, bz2 raises OSError, zlib and lzma their own errors
+        return None
+    if not data:
+        return None
+
+    # Name the payload would have once decompressed, "data.csv.gz" -> "data.csv"
+    inner_path = str(file_path)
+    if inner_path.lower().endswith(extension):
+        inner_path = inner_path[: -len(extension)]
+    ext = os.path.splitext(inner_path)[1].lower() or None
+    matches = identify_all(data, data[-512:] if complete else b"", ext)
+    if matches:
+        inner = Match(matches[0].extension, matches[0].name, matches[0].mime_type, matches[0].confidence)
+    elif not (inner := text_payload(inner_path, data, complete)):
+        return None
+
+    inner_extension = "." + inner.extension.lstrip(".") if inner.extension else ""
+    return Match(
+        extension=f"{inner_extension}{extension}",
+        name=f"{inner.name}, {compressor} compressed",
+        mime_type=mime_type,
+        confidence=inner.confidence,
+    )
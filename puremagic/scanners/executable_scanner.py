@@ -0,0 +1,278 @@
+"""
+Parses ELF, PE/COFF and Mach-O (including universal) executable headers.
+
+Reports the kind of binary (executable, shared library, object file, driver, ...),
+its architecture and bitness. Everything comes from the head already read,
+except for a PE header past the head (``e_lfanew``) or the ELF program headers
+and dynamic section past it, which take one small read. An ELF dynamic section
+out of reach of that read is not looked at.
+"""
+
+import os
+import struct
+
+from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
+
+elf_match_bytes = b"\x7fELF"
+mz_match_bytes = b"MZ"
+fat_match_bytes = b"\xca\xfe\xba\xbe"
+fat64_match_bytes = b"\xca\xfe\xba\xbf"
+# Mach-O magic: (byte order, bitness)
+MACHO_MAGICS = {
+    b"\xfe\xed\xfa\xce": (">", 32),
+    b"\xfe\xed\xfa\xcf": (">", 64),
+    b"\xce\xfa\xed\xfe": ("<", 32),
+    b"\xcf\xfa\xed\xfe": ("<", 64),
+}
+match_bytes = frozenset((elf_match_bytes, fat_match_bytes, fat64_match_bytes, *MACHO_MAGICS))
+
+# Bytes read at most in the one read past the head, PE headers with their data directories fit easily
+MAX_READ_BYTES = 4096
+# Java class files share the fat Mach-O magic, their version makes the architecture count 45 or more
+MAX_FAT_ARCHITECTURES = 30
+
+ELF_MACHINES = {
+    0x02: "SPARC",
+    0x03: "x86",
+    0x08: "MIPS",
+    0x14: "PowerPC",
+    0x15: "PowerPC64",
+    0x16: "S/390",
+    0x28: "ARM",
+    0x2B: "SPARC V9",
+    0x32: "IA-64",
+    0x3E: "x86-64",
+    0xB7: "AArch64",
+    0xF3: "RISC-V",
+    0xF7: "BPF",
+    0x102: "LoongArch",
+}
+# e_type: (extension, name, mime type)
+ELF_TYPES = {
+    1: (".o", "ELF relocatable object", "application/x-object"),
+    2: ("", "ELF executable", "application/x-executable"),
+    3: (".so", "ELF shared object", "application/x-sharedlib"),
+    4: ("", "ELF core dump", "application/x-coredump"),
+}
+ELF_PIE = ("", "ELF position independent executable", "application/x-pie-executable")
+PT_DYNAMIC = 2
+DT_FLAGS_1 = 0x6FFFFFFB
+DF_1_PIE = 0x08000000
+
+PE_MACHINES = {
+    0x014C: "x86",
+    0x0200: "IA-64",
+    0x01C0: "ARM",
+    0x01C4: "ARMv7",
+    0x0EBC: "EFI byte code",
+    0x5032: "RISC-V",
+    0x5064: "RISC-V",
+    0x8664: "x86-64",
+    0xAA64: "AArch64",
+}
+PE_SUBSYSTEMS = {
+    1: "native",
+    2: "GUI",
+    3: "console",
+    9: "Windows CE",
+    10: "EFI application",
+    11: "EFI boot service driver",
+    12: "EFI runtime driver",
+    13: "EFI ROM",
+}
+PE_MIME_TYPE = "application/vnd.microsoft.portable-executable"
+IMAGE_FILE_DLL = 0x2000
+# Index of the CLR runtime header in the data directories, set for .NET assemblies
+CLR_DIRECTORY = 14
+
+MACHO_CPUS = {
+    7: "x86",
+    0x01000007: "x86-64",
+    12: "ARM",
+    0x0100000C: "ARM64",
+    0x0200000C: "ARM64_32",
+    18: "PowerPC",
+    0x01000012: "PowerPC64",
+}
+# filetype: (extension, name)
+MACHO_TYPES = {
+    1: (".o", "Mach-O object file"),
+    2: ("", "Mach-O executable"),
+    6: (".dylib", "Mach-O dynamic library"),
+    7: ("", "Mach-O dynamic linker"),
+    8: (".bundle", "Mach-O bundle"),
+    9: (".dylib", "Mach-O dynamic library stub"),
+    10: ("", "Mach-O debug symbols"),
+    11: ("", "Mach-O kernel extension"),
+}
+MACHO_MIME_TYPE = "application/x-mach-binary"
+
+# Extensions used for the same kind of PE image, the file's own extension is kept within a family
+EXTENSION_FAMILIES = (
+    frozenset((".exe", ".scr", ".com", ".pif")),
+    frozenset((".dll", ".ocx", ".cpl", ".ax", ".acm", ".drv")),
+    frozenset((".sys", ".drv")),
+)
+
+
+def read_at(file_path: os.PathLike | str, head: bytes, offset: int, length: int) -> bytes:
+    """Bytes from offset, served from the head when it holds them and otherwise by the one read allowed"""
+    if offset + length <= len(head):
+        return head[offset : offset + length]
+    length = min(length, MAX_READ_BYTES)
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        data = file.read(length)
+    record_read("executable_scanner", offset, len(data))
+    return data
+
+
+def elf_flags_1(file_path: os.PathLike | str, head: bytes, bits: int, order: str) -> int:
+    """The DT_FLAGS_1 entry of the dynamic section, 0 when there is none or it is out of reach.
+
+    The program headers and the dynamic section come from the head and one read past it, either
+    of the dynamic section or of MAX_READ_BYTES from the program headers on.
+    """
+    if bits == 32:
+        ph_offset, ph_size, ph_count = struct.unpack(f"{order}I10xHH", head[28:46])
+        segment_format, entry_format = f"{order}II8xI", f"{order}iI"
+    else:
+        ph_offset, ph_size, ph_count = struct.unpack(f"{order}Q14xHH", head[32:58])
+        segment_format, entry_format = f"{order}I4xQ16xQ", f"{order}qQ"
+    segment_size, entry_size = struct.calcsize(segment_format), struct.calcsize(entry_format)
+    if ph_size < segment_size or not ph_count:
+        return 0
+    table_size = ph_size * ph_count
+    # The one read, when the program headers need it the dynamic section has to be in it as well
+    window_offset, window = 0, b""
+    if ph_offset + table_size <= len(head):
+        table = head[ph_offset : ph_offset + table_size]
+    else:
+        window_offset, window = ph_offset, read_at(file_path, head, ph_offset, MAX_READ_BYTES)
+        table = window[:table_size]
+    for offset in range(0, len(table) - segment_size + 1, ph_size):
+        segment_type, dynamic_offset, dynamic_size = struct.unpack(
+            segment_format, table[offset : offset + segment_size]
+        )
+        if segment_type == PT_DYNAMIC:
+            break
+    else:
+        return 0
+    if dynamic_offset + dynamic_size <= len(head) or not window:
+        dynamic = read_at(file_path, head, dynamic_offset, dynamic_size)
+    elif window_offset <= dynamic_offset < window_offset + len(window):
+        dynamic = window[dynamic_offset - window_offset : dynamic_offset - window_offset + dynamic_size]
+    else:
+        return 0
+    for offset in range(0, len(dynamic) - entry_size + 1, entry_size):
+        tag, value = struct.unpack(entry_format, dynamic[offset : offset + entry_size])
+        if tag == DT_FLAGS_1:
+            return value
+        if tag == 0:
+            break
+    return 0
+
+
+def elf(file_path: os.PathLike | str, head: bytes) -> Match | None:
+    if len(head) < 64 or head[4] not in (1, 2) or head[5] not in (1, 2):
+        return None
+    bits = 32 if head[4] == 1 else 64
+    order = "<" if head[5] == 1 else ">"
+    elf_type, machine = struct.unpack(f"{order}HH", head[16:20])
+    if elf_type not in ELF_TYPES:
+        return None
+    extension, name, mime_type = ELF_TYPES[elf_type]
+
+    # Shared objects the linker flagged as PIE are executables, as file(1) has it. An interpreter is
+    # no sign of one, libc asks for an interpreter too
+    if elf_type == 3 and elf_flags_1(file_path, head, bits, order) & DF_1_PIE:
+        extension, name, mime_type = ELF_PIE
+
+    architecture = ELF_MACHINES.get(machine, f"machine 0x{machine:X}")
+    byte_order = "LSB" if order == "<" else "MSB"
+    return Match(extension, f"{name} [{architecture} {bits}-bit {byte_order}]", mime_type)
+
+
+def pe(file_path: os.PathLike | str, head: bytes) -> Match | None:
+    if len(head) < 64:
+        return None
+    pe_offset = struct.unpack("<I", head[60:64])[0]
+    # Signature, COFF header and an optional header with all 16 data directories
+    header = read_at(file_path, head, pe_offset, 4 + 20 + 240)
+    if header[:2] in (b"NE", b"LE", b"LX"):
+        kind = "16-bit New Executable" if header[:2] == b"NE" else "Linear Executable"
+        return Match(".exe", f"Windows {kind}", "application/x-dosexec", confidence=0.9)
+    if len(header) < 26 or header[:4] != b"PE\x00\x00":
+        return Match(".exe", "MS-DOS executable", "application/x-dosexec", confidence=0.8)
+
+    machine, _, _, _, _, optional_size, characteristics = struct.unpack("<HHIIIHH", header[4:24])
+    optional = header[24 : 24 + optional_size]
+    magic = struct.unpack("<H", optional[:2])[0] if len(optional) >= 2 else 0
+    if magic not in (0x10B, 0x20B):
+        return None
+    bits = 64 if magic == 0x20B else 32
+    details = [PE_MACHINES.get(machine, f"machine 0x{machine:04X}"), f"{bits}-bit"]
+
+    subsystem = struct.unpack("<H", optional[68:70])[0] if len(optional) >= 70 else 0
+    directories = 112 if bits == 64 else 96
+    clr = optional[directories + CLR_DIRECTORY * 8 : directories + CLR_DIRECTORY * 8 + 8]
+    dotnet = len(clr) == 8 and any(clr)
+
+    if characteristics & IMAGE_FILE_DLL:
+        extension, name = ".dll", "Windows DLL"
+    elif subsystem == 1:
+        extension, name = ".sys", "Windows driver"
+    elif 10 <= subsystem <= 13:
+        extension, name = ".efi", "EFI image"
+        details.append(PE_SUBSYSTEMS[subsystem])
+    else:
+        extension, name = ".exe", "Windows executable"
+        if subsystem in PE_SUBSYSTEMS:
+            details.append(PE_SUBSYSTEMS[subsystem])
+    if dotnet:
+        details.append(".NET")
+
+    own_extension = os.path.splitext(str(file_path))[1].lower()
+    if any(extension in family and own_extension in family for family in EXTENSION_FAMILIES):
+        extension = own_extension
+    return Match(extension, f"{name} [{' '.join(details)}]", PE_MIME_TYPE)
+
+
+def macho(head: bytes) -> Match | None:
+    if len(head) < 16:
+        return None
+    order, bits = MACHO_MAGICS[head[:4]]
+    cpu, _, file_type = struct.unpack(f"{order}III", head[4:16])
+    if file_type not in MACHO_TYPES:
+        return None
+    extension, name = MACHO_TYPES[file_type]
+    architecture = MACHO_CPUS.get(cpu, f"cpu 0x{cpu:X}")
+    return Match(extension, f"{name} [{architecture} {bits}-bit]", MACHO_MIME_TYPE)
+
+
+def fat(head: bytes) -> Match | None:
+    if len(head) < 8:
+        return None
+    count = struct.unpack(">I", head[4:8])[0]
+    if not 0 < count < MAX_FAT_ARCHITECTURES:
+        return None
+    # fat_arch entries are 20 bytes, fat_arch_64 entries 32, both start with the CPU type
+    entry_size = 32 if head[:4] == fat64_match_bytes else 20
+    architectures = []
+    for offset in range(8, min(8 + count * entry_size, len(head) - 3), entry_size):
+        cpu = struct.unpack(">I", head[offset : offset + 4])[0]
+        architectures.append(MACHO_CPUS.get(cpu, f"cpu 0x{cpu:X}"))
+    return Match("", f"Mach-O universal binary [{' '.join(architectures)}]", MACHO_MIME_TYPE)
+
+
+def main(file_path: os.PathLike | str, head: bytes, _) -> Match | None:
+    if head.startswith(elf_match_bytes):
+        return elf(file_path, head)
+    if head.startswith(mz_match_bytes):
+        return pe(file_path, head)
+    if head[:4] in MACHO_MAGICS:
+        return macho(head)
+    if head[:4] in (fat_match_bytes, fat64_match_bytes):
+        return fat(head)
+    return None
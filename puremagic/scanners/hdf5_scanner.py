@@ -1,11 +1,14 @@
 import os
+import struct
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
 HDF5_MAGIC = b"\x89HDF\r\n\x1a\n"
 
 # HDF5 subtype signatures: (mandatory, optional, min_optional, ext, name, mime)
 # All mandatory strings must be present, plus at least min_optional of the optional strings.
+# They are looked for in the root group's link names (as "/name"), attribute names and inline attribute values.
 _SUBTYPES = [
     # AnnData - single-cell genomics (h5ad)
     ([], [b"/obs", b"/var", b"/X"], 2, ".h5ad", "AnnData", "application/x-anndata"),
@@ -37,19 +40,289 @@ _SUBTYPES = [
     ([], [b"model_type", b"h5mlm"], 1, ".h5mlm", "HDF5 ML model", "application/x-h5mlm"),
 ]
 
+# Bytes searched for the subtype strings when the file structure can not be followed
+FALLBACK_READ_BYTES = 65536
+# Bytes read at most while walking the root group, the names found up to there are used
+MAX_READ_BYTES = 1024 * 1024
+# Root group entries collected at most
+MAX_LINKS = 10_000
+# B-tree, symbol table and object header continuation blocks visited at most
+MAX_BLOCKS = 4096
 
-def main(file_path: os.PathLike | str, head: bytes, foot: bytes) -> Match | None:
-    if not head or not head.startswith(HDF5_MAGIC):
-        return None
+# Object header message types
+_LINK_INFO, _LINK, _ATTRIBUTE, _CONTINUATION, _SYMBOL_TABLE = 0x02, 0x06, 0x0C, 0x10, 0x11
+
+
+class _Reader:
+    """Reads through one file handle, serving ranges from the head where it reaches,
+    and decodes the variable size offsets and lengths of the superblock."""
+
+    __slots__ = ("file", "head", "base", "size_offsets", "size_lengths", "undefined", "budget")
+
+    def __init__(self, file, head: bytes, size_offsets: int, size_lengths: int):
+        if size_offsets not in (2, 4, 8) or size_lengths not in (2, 4, 8):
+            raise ValueError("Unsupported HDF5 offset or length size")
+        self.file = file
+        self.head = head
+        self.base = 0
+        self.size_offsets = size_offsets
+        self.size_lengths = size_lengths
+        self.undefined = (1 << (8 * size_offsets)) - 1
+        self.budget = MAX_READ_BYTES
+
+    def read(self, address: int, length: int) -> bytes:
+        offset = self.base + address
+        if offset + length <= len(self.head):
+            return self.head[offset : offset + length]
+        if address == self.undefined or length > self.budget:
+            raise ValueError(f"HDF5 read of {length} bytes at {address} is out of bounds")
+        self.budget -= length
+        self.file.seek(offset)
+        data = self.file.read(length)
+        record_read("hdf5_scanner", offset, len(data))
+        if len(data) < length:
+            raise ValueError(f"HDF5 structure at {address} is past the end of the file")
+        return data
+
+    def offset(self, data: bytes, position: int) -> int:
+        return int.from_bytes(data[position : position + self.size_offsets], "little")
+
+    def length(self, data: bytes, position: int) -> int:
+        return int.from_bytes(data[position : position + self.size_lengths], "little")
+
+
+def _messages(reader: _Reader, address: int):
+    """Yield (type, data) for each message of an object header, version 1 or 2, following continuations"""
+    prefix = reader.read(address, 16)
+    if prefix[:4] == b"OHDR":
+        if prefix[4] != 2:
+            raise ValueError("Unsupported HDF5 object header version")
+        flags = prefix[5]
+        position = 6 + (16 if flags & 0x20 else 0) + (4 if flags & 0x10 else 0)
+        width = 1 << (flags & 0x03)
+        header = reader.read(address, position + width)
+        # Messages start after the chunk size and the chunk ends with a checksum
+        blocks = [(address + position + width, int.from_bytes(header[position:], "little"))]
+        entry_size = 6 if flags & 0x04 else 4
+    elif prefix[0] == 1:
+        # Version 1 headers are padded to 16 bytes, their messages aligned to 8
+        blocks = [(address + 16, struct.unpack_from("<I", prefix, 8)[0])]
+        flags, entry_size = None, 8
+    else:
+        raise ValueError("Unsupported HDF5 object header version")
+
+    visited = 0
+    while blocks and visited < MAX_BLOCKS:
+        start, size = blocks.pop(0)
+        visited += 1
+        data = reader.read(start, size)
+        position = 0
+        if flags is not None and start != address + len(header):
+            if data[:4] != b"OCHK":
+                raise ValueError("Bad HDF5 object header continuation block")
+            position, size = 4, size - 4
+        while position + entry_size <= size:
+            if flags is None:
+                kind, length = struct.unpack_from("<HH", data, position)
+            else:
+                kind, length = data[position], struct.unpack_from("<H", data, position + 1)[0]
+            body = data[position + entry_size : position + entry_size + length]
+            position += entry_size + length
+            if kind == _CONTINUATION:
+                blocks.append((reader.offset(body, 0), reader.length(body, reader.size_offsets)))
+            else:
+                yield kind, body
+
+
+def _dense_names(reader: _Reader, heap_address: int) -> list[bytes]:
+    """Link names held in a fractal heap (groups with many links in newer files).
+
+    Only the direct blocks of the root, and of a root indirect block, are read.
+    """
+    so, sl = reader.size_offsets, reader.size_lengths
+    # Up to the current row count of the root indirect block, the filter details after it are not needed
+    header = reader.read(heap_address, 22 + 12 * sl + 3 * so)
+    if header[:4] != b"FRHP":
+        raise ValueError("Bad HDF5 fractal heap header")
+    filtered_size, flags = struct.unpack_from("<HB", header, 7)
+    if filtered_size:
+        # Compressed heap blocks are not worth decompressing here
+        return []
+    position = 14 + sl + so + sl + so + 8 * sl
+    width = struct.unpack_from("<H", header, position)[0]
+    start_size = reader.length(header, position + 2)
+    max_direct = reader.length(header, position + 2 + sl)
+    max_heap_bits = struct.unpack_from("<H", header, position + 2 + 2 * sl)[0]
+    root = reader.offset(header, position + 2 + 2 * sl + 4)
+    rows = struct.unpack_from("<H", header, position + 2 + 2 * sl + 4 + so)[0]
+    # Each block starts with its signature, version, heap address, offset in the heap and optionally a checksum
+    block_prefix = 5 + so + (max_heap_bits + 7) // 8 + (4 if flags & 0x02 else 0)
+
+    blocks = []
+    if rows == 0:
+        blocks.append((root, start_size))
+    else:
+        indirect = reader.read(root, 5 + so + (max_heap_bits + 7) // 8 + rows * width * so)
+        if indirect[:4] != b"FHIB":
+            raise ValueError("Bad HDF5 fractal heap indirect block")
+        position = 5 + so + (max_heap_bits + 7) // 8
+        block_size = start_size
+        for row in range(rows):
+            if row > 1:
+                block_size *= 2
+            if block_size > max_direct:
+                # Rows of nested indirect blocks are not followed
+                break
+            for _ in range(width):
+                address = reader.offset(indirect, position)
+                position += so
+                if address != reader.undefined:
+                    blocks.append((address, block_size))
+
+    names = []
+    for address, size in blocks[:MAX_BLOCKS]:
+        data = reader.read(address, size)
+        if data[:4] != b"FHDB":
+            raise ValueError("Bad HDF5 fractal heap direct block")
+        position = block_prefix
+        # Managed objects are packed from the start of the block, free space after them is not a link
+        while position < size and data[position] == 1 and len(names) < MAX_LINKS:
+            try:
+                name, position = _link_message(data, position, so)
+            except (ValueError, IndexError, struct.error):
+                break
+            names.append(name)
+    return names
+
+
+def _link_message(data: bytes, position: int, size_offsets: int) -> tuple[bytes, int]:
+    """Name of an encoded link message and the position just past it"""
+    if data[position] != 1:
+        raise ValueError("Unsupported HDF5 link message version")
+    flags = data[position + 1]
+    position += 2
+    link_type = 0
+    if flags & 0x08:
+        link_type = data[position]
+        position += 1
+    position += (8 if flags & 0x04 else 0) + (1 if flags & 0x10 else 0)
+    width = 1 << (flags & 0x03)
+    name_length = int.from_bytes(data[position : position + width], "little")
+    position += width
+    name = data[position : position + name_length]
+    if not name_length or len(name) < name_length:
+        raise ValueError("Truncated HDF5 link message")
+    position += name_length
+    if link_type == 0:
+        # Hard link, the object header address
+        return name, position + size_offsets
+    # Soft, external and user defined links carry a length prefixed value
+    return name, position + 2 + struct.unpack_from("<H", data, position)[0]
 
-    # Read a larger chunk to find group/dataset names
-    with open(file_path, "rb") as f:
-        data = f.read(65536)
 
+def _symbol_table_names(reader: _Reader, btree_address: int, heap_address: int) -> list[bytes]:
+    """Link names of an old style group, from its B-tree of symbol table nodes and its local heap"""
+    so, sl = reader.size_offsets, reader.size_lengths
+    heap = reader.read(heap_address, 8 + 2 * sl + so)
+    if heap[:4] != b"HEAP":
+        raise ValueError("Bad HDF5 local heap")
+    heap_data = reader.read(reader.offset(heap, 8 + 2 * sl), min(reader.length(heap, 8), MAX_READ_BYTES // 4))
+
+    name_offsets = []
+    nodes, visited = [btree_address], 0
+    while nodes and visited < MAX_BLOCKS and len(name_offsets) < MAX_LINKS:
+        address = nodes.pop()
+        visited += 1
+        node = reader.read(address, 8)
+        if node[:4] == b"SNOD":
+            count = struct.unpack_from("<H", node, 6)[0]
+            entry_size = 2 * so + 24
+            entries = reader.read(address + 8, count * entry_size)
+            name_offsets.extend(reader.offset(entries, index * entry_size) for index in range(count))
+            continue
+        if node[:4] != b"TREE" or node[4] != 0:
+            raise ValueError("Bad HDF5 group B-tree node")
+        count = struct.unpack_from("<H", node, 6)[0]
+        # Keys (heap offsets, sized as lengths) and child addresses alternate, starting and ending with a key
+        body = reader.read(address + 8 + 2 * so, count * (sl + so) + sl)
+        children = [reader.offset(body, sl + index * (sl + so)) for index in range(count)]
+        # Reversed so the names come out in the order they are stored
+        nodes.extend(reversed(children))
+
+    names = []
+    for offset in name_offsets[:MAX_LINKS]:
+        end = heap_data.find(b"\x00", offset)
+        if end > offset:
+            names.append(heap_data[offset:end])
+    return names
+
+
+def _attribute(data: bytes) -> tuple[bytes, bytes]:
+    """Name and inline value of an attribute message, variable length values are only a global heap reference"""
+    version = data[0]
+    name_size, datatype_size, dataspace_size = struct.unpack_from("<3H", data, 2)
+    if version == 1:
+        # Name, datatype and dataspace are each padded to a multiple of 8
+        def pad(size):
+            return -(-size // 8) * 8
+
+        value = 8 + pad(name_size) + pad(datatype_size) + pad(dataspace_size)
+        return data[8 : 8 + name_size].rstrip(b"\x00"), data[value:]
+    start = 9 if version == 3 else 8
+    value = start + name_size + datatype_size + dataspace_size
+    return data[start : start + name_size].rstrip(b"\x00"), data[value:]
+
+
+def root_entries(file, head: bytes) -> list[bytes]:
+    """Root group link names as b"/name", followed by root attribute names and inline values.
+
+    Raises ValueError (struct.error, IndexError or OSError on garbage) when the structure can not be followed.
+    """
+    version = head[8]
+    if version in (0, 1):
+        reader = _Reader(file, head, head[13], head[14])
+        so = reader.size_offsets
+        # Version 1 adds the indexed storage B-tree K and two reserved bytes
+        position = 24 if version == 0 else 28
+        reader.base = reader.offset(head, position)
+        # Base, free space, end of file and driver addresses, then the root group's symbol table entry
+        entry = head[position + 4 * so : position + 6 * so + 24]
+        root = reader.offset(entry, so)
+        cache_type = struct.unpack_from("<I", entry, 2 * so)[0]
+        cached = (reader.offset(entry, 2 * so + 8), reader.offset(entry, 3 * so + 8)) if cache_type == 1 else None
+    elif version in (2, 3):
+        reader = _Reader(file, head, head[9], head[10])
+        reader.base = reader.offset(head, 12)
+        root = reader.offset(head, 12 + 3 * reader.size_offsets)
+        cached = None
+    else:
+        raise ValueError(f"Unsupported HDF5 superblock version {version}")
+
+    links, attributes = [], []
+    symbol_table, heap_address = cached, None
+    for kind, data in _messages(reader, root):
+        if kind == _LINK:
+            links.append(_link_message(data, 0, reader.size_offsets)[0])
+        elif kind == _ATTRIBUTE:
+            attributes.extend(_attribute(data))
+        elif kind == _SYMBOL_TABLE and symbol_table is None:
+            symbol_table = (reader.offset(data, 0), reader.offset(data, reader.size_offsets))
+        elif kind == _LINK_INFO:
+            # A maximum creation index comes first when creation order is tracked
+            address = reader.offset(data, 10 if data[1] & 0x01 else 2)
+            heap_address = None if address == reader.undefined else address
+    if symbol_table:
+        links.extend(_symbol_table_names(reader, *symbol_table))
+    if heap_address is not None:
+        links.extend(_dense_names(reader, heap_address))
+    return [b"/" + name for name in links[:MAX_LINKS]] + attributes
+
+
+def _identify_subtype(entries: list[bytes] | bytes) -> Match | None:
     for mandatory, optional, min_optional, ext, name, mime in _SUBTYPES:
-        if not all(s in data for s in mandatory):
+        if not all(any(s in entry for entry in entries) for s in mandatory):
             continue
-        opt_matches = sum(1 for s in optional if s in data)
+        opt_matches = sum(1 for s in optional if any(s in entry for entry in entries))
         if opt_matches >= min_optional:
             return Match(
                 extension=ext,
@@ -57,5 +330,20 @@ def main(file_path: os.PathLike | str, head: bytes, foot: bytes) -> Match | None
                 mime_type=mime,
                 confidence=0.9,
             )
-
     return None
+
+
+def main(file_path: os.PathLike | str, head: bytes, foot: bytes) -> Match | None:
+    if not head or not head.startswith(HDF5_MAGIC):
+        return None
+
+    with open(file_path, "rb") as f:
+        try:
+            entries = root_entries(f, head)
+        except (OSError, ValueError, IndexError, struct.error):
+            # Not a layout followed here, look for the names in the start of the file instead
+            f.seek(0)
+            data = f.read(FALLBACK_READ_BYTES)
+            record_read("hdf5_scanner", 0, len(data))
+            entries = [data]
+    return _identify_subtype(entries)
@@ -1,9 +1,30 @@
-from dataclasses import dataclass
+class Match:
+    """Deep scan result.
 
+    A plain slotted class rather than a dataclass, as importing dataclasses
+    (and with it inspect) was a noticeable part of CLI start up time.
+    """
 
-@dataclass
-class Match:
-    extension: str
-    name: str
-    mime_type: str
-    confidence: float = 1
+    __slots__ = ("extension", "name", "mime_type", "confidence")
+
+    def __init__(self, extension: str, name: str, mime_type: str, confidence: float = 1):
+        self.extension = extension
+        self.name = name
+        self.mime_type = mime_type
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return (
+            f"Match(extension={self.extension!r}, name={self.name!r}, "
+            f"mime_type={self.mime_type!r}, confidence={self.confidence!r})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.extension, self.name, self.mime_type, self.confidence) == (
+            other.extension,
+            other.name,
+            other.mime_type,
+            other.confidence,
+        )
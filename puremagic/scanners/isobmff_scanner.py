@@ -0,0 +1,197 @@
+"""
+Identifies ISO base media files (MP4, QuickTime, 3GPP, HEIF, AVIF, ...) from their boxes.
+
+Parses the ``ftyp`` box (or the ``styp`` box of a media segment) for its major
+and compatible brands and walks the top level box headers after it, all from
+the head already read. The brands are looked up in one table instead of
+matching each brand as its own signature.
+"""
+
+import os
+import struct
+
+from puremagic.scanners.helpers import Match
+
+match_bytes = b"ftyp"
+segment_match_bytes = b"styp"
+box_types = (match_bytes, segment_match_bytes)
+
+# Top level boxes walked after the ftyp box, at most
+MAX_BOXES = 16
+# Boxes only found in fragmented files, movie fragments and the segment index
+FRAGMENT_BOXES = frozenset((b"moof", b"sidx", b"mfra"))
+
+_MP4 = (".mp4", "MPEG-4 video", "video/mp4")
+_M4V = (".m4v", "MPEG-4 video", "video/x-m4v")
+_3GP = (".3gp", "3GPP multimedia file", "video/3gpp")
+_3G2 = (".3g2", "3GPP2 multimedia file", "video/3gpp2")
+_HEIC = (".heic", "HEIC Image format", "image/heic")
+_HEIC_SEQUENCE = (".heic", "HEIC Animated Image format", "image/heic-sequence")
+
+# brand: (extension, name, mime type)
+BRANDS = {
+    b"isom": _MP4,
+    b"iso2": _MP4,
+    b"iso3": _MP4,
+    b"iso4": _MP4,
+    b"iso5": _MP4,
+    b"iso6": _MP4,
+    b"iso7": _MP4,
+    b"iso8": _MP4,
+    b"iso9": _MP4,
+    b"mp41": _MP4,
+    b"mp42": _MP4,
+    b"mp71": _MP4,
+    b"avc1": _MP4,
+    b"dash": _MP4,
+    b"msdh": _MP4,
+    b"msix": _MP4,
+    b"mmp4": _MP4,
+    b"MSNV": _MP4,
+    b"M4V ": _M4V,
+    b"M4VH": _M4V,
+    b"M4VP": _M4V,
+    b"M4A ": (".m4a", "MPEG-4 audio", "audio/mp4"),
+    b"M4B ": (".m4b", "MPEG-4 audio book", "audio/mp4"),
+    b"M4P ": (".m4p", "MPEG-4 protected audio", "audio/mp4"),
+    b"F4V ": (".f4v", "Flash MPEG-4 video", "video/mp4"),
+    b"F4P ": (".f4p", "Flash protected MPEG-4 video", "video/mp4"),
+    b"F4A ": (".f4a", "Flash MPEG-4 audio", "audio/mp4"),
+    b"F4B ": (".f4b", "Flash MPEG-4 audio book", "audio/mp4"),
+    b"qt  ": (".mov", "QuickTime movie", "video/quicktime"),
+    b"3gp4": _3GP,
+    b"3gp5": _3GP,
+    b"3gp6": _3GP,
+    b"3gp7": _3GP,
+    b"3gp8": _3GP,
+    b"3gp9": _3GP,
+    b"3ge6": _3GP,
+    b"3ge7": _3GP,
+    b"3ge9": _3GP,
+    b"3gg6": _3GP,
+    b"3gr6": _3GP,
+    b"3gs6": _3GP,
+    b"3gs7": _3GP,
+    b"3g2a": _3G2,
+    b"3g2b": _3G2,
+    b"3g2c": _3G2,
+    b"mif1": (".heif", "HEIF Image format", "image/heif"),
+    b"msf1": (".heif", "HEIF Image sequence", "image/heif-sequence"),
+    b"heic": _HEIC,
+    b"heix": _HEIC,
+    b"heim": _HEIC,
+    b"heis": _HEIC,
+    b"hevc": _HEIC_SEQUENCE,
+    b"hevx": _HEIC_SEQUENCE,
+    b"hevm": _HEIC_SEQUENCE,
+    b"hevs": _HEIC_SEQUENCE,
+    b"avif": (".avif", "AV1 Image format", "image/avif"),
+    b"avis": (".avif", "AV1 Image format sequence", "image/avif"),
+    b"crx ": (".cr3", "Canon Raw 3 image", "image/x-canon-cr3"),
+}
+
+# Brands any MP4 or HEIF file may carry, a more specific brand among the compatible ones wins over these
+GENERIC_BRANDS = frozenset(
+    (
+        b"isom",
+        b"iso2",
+        b"iso3",
+        b"iso4",
+        b"iso5",
+        b"iso6",
+        b"iso7",
+        b"iso8",
+        b"iso9",
+        b"mp41",
+        b"mp42",
+        b"mp71",
+        b"avc1",
+        b"dash",
+        b"msdh",
+        b"msix",
+        b"mif1",
+        b"msf1",
+    )
+)
+
+# Extensions used interchangeably for the same brands, the file's own extension is kept within a family
+EXTENSION_FAMILIES = (
+    frozenset((".3gp", ".3gpp", ".3g2", ".3gpp2")),
+    frozenset((".mp4", ".m4v")),
+)
+# Reversed so the first brand listed for an extension is the one kept
+_BY_EXTENSION = {entry[0]: entry for entry in reversed(BRANDS.values())}
+_BY_EXTENSION[".3gpp"] = (".3gpp", *_3GP[1:])
+_BY_EXTENSION[".3gpp2"] = (".3gpp2", *_3G2[1:])
+
+
+def brands(head: bytes) -> tuple[bytes, list[bytes]] | None:
+    """Major and compatible brands of the ftyp (or styp) box at the start of head, None if it is malformed"""
+    if len(head) < 16 or head[4:8] not in box_types:
+        return None
+    size = struct.unpack(">I", head[:4])[0]
+    # Brands are four bytes each, after the major brand and minor version
+    if size < 16 or (size - 16) % 4 or size > len(head):
+        return None
+    return head[8:12], [head[offset : offset + 4] for offset in range(16, size, 4)]
+
+
+def top_level_boxes(head: bytes) -> tuple[list[bytes], bool]:
+    """Types of the top level boxes after the first one, as far as head reaches.
+
+    :return: (box types, every box header seen was valid)
+    """
+    types = []
+    offset = struct.unpack(">I", head[:4])[0]
+    while len(types) < MAX_BOXES and offset + 8 <= len(head):
+        size, box_type = struct.unpack(">I4s", head[offset : offset + 8])
+        if not box_type.isascii() or not box_type.strip(b" ").isalnum():
+            return types, False
+        types.append(box_type)
+        if size == 0:
+            # Runs to the end of the file
+            break
+        if size == 1:
+            if offset + 16 > len(head):
+                break
+            size = struct.unpack(">Q", head[offset + 8 : offset + 16])[0]
+            if size < 16:
+                return types, False
+        elif size < 8:
+            return types, False
+        offset += size
+    return types, True
+
+
+def file_type(major: bytes, compatible: list[bytes]) -> tuple[str, str, str] | None:
+    """The most specific type the brands name, the major brand first"""
+    known = [brand for brand in (major, *compatible) if brand in BRANDS]
+    if not known:
+        return None
+    specific = next((brand for brand in known if brand not in GENERIC_BRANDS), known[0])
+    return BRANDS[specific]
+
+
+def main(file_path: os.PathLike | str, head: bytes, _) -> Match | None:
+    parsed = brands(head)
+    if parsed is None:
+        return None
+    major, compatible = parsed
+    found = file_type(major, compatible)
+    if found is None:
+        return None
+    extension, name, mime_type = found
+    boxes, valid = top_level_boxes(head)
+
+    if head[4:8] == segment_match_bytes:
+        extension, name, mime_type = ".m4s", "MPEG-4 media segment", "video/iso.segment"
+    else:
+        own_extension = os.path.splitext(str(file_path))[1].lower()
+        if own_extension != extension and any(
+            extension in family and own_extension in family for family in EXTENSION_FAMILIES
+        ):
+            # A 3GPP2 file may list only 3GPP brands, and M4V is MP4 with another name
+            extension, name, mime_type = _BY_EXTENSION[own_extension]
+        if mime_type.startswith("video/") and FRAGMENT_BOXES.intersection(boxes):
+            name = f"{name}, fragmented"
+    return Match(extension, name, mime_type, confidence=1.0 if valid else 0.8)
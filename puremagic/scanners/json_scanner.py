@@ -1,24 +1,264 @@
-import os
+import codecs
 import json
+import os
+import re
+from functools import cache
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
 match_bytes = b"{"
 
+# Validation stops after this many bytes, files that are still well formed at that point
+# are reported with PARTIAL_CONFIDENCE. Set to None to always validate the whole file.
+MAX_VALIDATE_BYTES: int | None = 1024 * 1024
+PARTIAL_CONFIDENCE = 0.8
+# Files up to this size are parsed by json.loads, several times faster than the validator
+# and with a peak of about ten times the file size
+JSON_LOADS_SIZE = 256 * 1024
+CHUNK_SIZE = 16 * 1024
+# Longest unfinished token carried between chunks, beyond it the content is malformed
+MAX_PARTIAL_TOKEN = 8192
+# Deepest nesting accepted, about what json.loads manages before running out of recursion
+MAX_DEPTH = 512
+
+_ws = r"[ \t\n\r]*"
+_string = r'"(?:[^"\\\x00-\x1f]|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))*"'
+_scalar = _string + r"|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null|NaN|-?Infinity"
+
+
+def _container(value: str) -> str:
+    member = rf"{_string}{_ws}:{_ws}(?:{value})"
+    return (
+        rf"\[{_ws}(?:(?:{value}){_ws}(?:,{_ws}(?:{value}){_ws})*)?\]"
+        rf"|\{{{_ws}(?:{member}{_ws}(?:,{_ws}{member}{_ws})*)?\}}"
+    )
+
+
+# A scalar, or a complete container up to two levels deep, matched in one go rather than token by token.
+# NaN and Infinity are accepted as json.load does.
+_value = rf"{_scalar}|{_container(rf'{_scalar}|{_container(_scalar)}')}"
+
+
+@cache
+def patterns() -> tuple[re.Pattern, re.Pattern, re.Pattern, re.Pattern]:
+    """The validator's patterns, compiled on first use as they take tens of milliseconds.
+
+    :return: (one value or punctuation token with the whitespace before it,
+        a run of object members ending in a comma, a run of array values ending in a comma,
+        the start of a string that continues past the buffer)
+    """
+    # The trailing comma of a run means nothing was cut off by the end of the buffer
+    return (
+        re.compile(rf"{_ws}({_value}|[{{}}\[\]:,])"),
+        re.compile(rf"(?:{_ws}{_string}{_ws}:{_ws}(?:{_value}){_ws},)+"),
+        re.compile(rf"(?:{_ws}(?:{_value}){_ws},)+"),
+        re.compile(_string[:-1]),
+    )
+
+
+# JSON Lines are judged on this many complete lines from each of the head and foot
+JSONL_SAMPLE_LINES = 10
+
+# What the validator expects next
+VALUE, VALUE_OR_CLOSE, KEY_OR_CLOSE, KEY, COLON, COMMA_OR_CLOSE, DONE = range(7)
+
+
+class JSONValidator:
+    """Structural JSON check fed text in pieces, tracking only nesting and the expected token.
+
+    No Python objects are built, so memory stays flat whatever the document size.
+    """
+
+    __slots__ = ("stack", "state", "buffer", "valid")
+
+    def __init__(self):
+        self.stack: list[str] = []
+        self.state = VALUE
+        self.buffer = ""
+        self.valid = True
+
+    def feed(self, text: str, final: bool = False) -> bool:
+        """Validate the next piece of the document, returns False as soon as it is malformed"""
+        if not self.valid:
+            return False
+        buffer = self.buffer + text if self.buffer else text
+        pos, end = 0, len(buffer)
+        # Tokens ending this close to the end of a piece may continue in the next one ("1." then "5")
+        safe_end = end if final else end - 16
+        stack, state = self.stack, self.state
+        token_pattern, object_run_pattern, array_run_pattern, string_start_pattern = patterns()
+        match = token_pattern.match
+        while pos < end:
+            if state == KEY or state == KEY_OR_CLOSE:
+                if run := object_run_pattern.match(buffer, pos):
+                    pos, state = run.end(), KEY
+            elif (state == VALUE or state == VALUE_OR_CLOSE) and stack and stack[-1] == "[":
+                if run := array_run_pattern.match(buffer, pos):
+                    pos, state = run.end(), VALUE
+            found = match(buffer, pos)
+            if found is None or found.end() > safe_end:
+                # Possibly cut by the end of the piece, keep it for the next one
+                rest = buffer[pos:].lstrip(" \t\n\r")
+                if final:
+                    self.valid = not rest and state == DONE
+                    return self.valid
+                if found is None and rest:
+                    if rest[0] == '"':
+                        # Only keep where an unfinished string got to, at most a partial escape is left over
+                        start = string_start_pattern.match(rest)
+                        rest = '"' + rest[start.end() :]
+                    if len(rest) > MAX_PARTIAL_TOKEN:
+                        self.valid = False
+                        return False
+                self.buffer = rest
+                break
+            token = found.group(1)
+            pos = found.end()
+            # Complete containers, numbers and literals count as a single value, only strings can be keys
+            char = token[0] if len(token) == 1 else '"' if token[0] == '"' else "v"
+
+            if state == COMMA_OR_CLOSE:
+                if char == ",":
+                    state = KEY if stack[-1] == "{" else VALUE
+                    continue
+                if (char == "}" and stack[-1] == "{") or (char == "]" and stack[-1] == "["):
+                    stack.pop()
+                    state = COMMA_OR_CLOSE if stack else DONE
+                    continue
+            elif state <= VALUE_OR_CLOSE:
+                if char == "{" or char == "[":
+                    if len(stack) >= MAX_DEPTH:
+                        self.valid = False
+                        return False
+                    stack.append(char)
+                    state = KEY_OR_CLOSE if char == "{" else VALUE_OR_CLOSE
+                    continue
+                if char not in "}],:":
+                    state = COMMA_OR_CLOSE if stack else DONE
+                    continue
+                if char == "]" and state == VALUE_OR_CLOSE:
+                    stack.pop()
+                    state = COMMA_OR_CLOSE if stack else DONE
+                    continue
+            elif state <= KEY:
+                if char == '"':
+                    state = COLON
+                    continue
+                if char == "}" and state == KEY_OR_CLOSE:
+                    stack.pop()
+                    state = COMMA_OR_CLOSE if stack else DONE
+                    continue
+            elif state == COLON and char == ":":
+                state = VALUE
+                continue
+            self.valid = False
+            return False
+        else:
+            self.buffer = ""
+            if final:
+                self.valid = state == DONE
+        self.state = state
+        return self.valid
+
+
+def validate(file, limit: int | None = MAX_VALIDATE_BYTES) -> tuple[bool, bool, int]:
+    """Stream a binary file through JSONValidator.
+
+    :return: (well formed so far, whole file checked, bytes read)
+    """
+    first = file.read(max(CHUNK_SIZE, 4))  # Enough to detect UTF-16 and UTF-32
+    try:
+        decoder = codecs.getincrementaldecoder(json.detect_encoding(first))()
+    except LookupError:
+        return False, True, len(first)
+    validator = JSONValidator()
+    chunk, total = first, len(first)
+    try:
+        while chunk:
+            if not validator.feed(decoder.decode(chunk)):
+                return False, True, total
+            if limit is not None and total >= limit and file.read(1):
+                return True, False, total
+            chunk = file.read(CHUNK_SIZE)
+            total += len(chunk)
+        return validator.feed(decoder.decode(b"", final=True), final=True), True, total
+    except UnicodeDecodeError:
+        return False, True, total
+
+
+def parse(file) -> tuple[bool, bool, int]:
+    """Parse a small binary file whole with json.loads, same result as validate"""
+    data = file.read()
+    try:
+        json.loads(data)
+    except (ValueError, RecursionError):
+        return False, True, len(data)
+    return True, True, len(data)
+
+
+def jsonl_check(file_path: os.PathLike | str, head: bytes, foot: bytes) -> Match | None:
+    """Check for JSON Lines / NDJSON using only the head and foot already read.
+
+    The first and last JSONL_SAMPLE_LINES complete lines must each be a JSON object or
+    array. Files held entirely in the head are checked line by line for full confidence.
+    """
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        return None
+    whole = size <= len(head)
+    lines = head.split(b"\n")
+    if not whole:
+        lines.pop()  # Cut by the end of the head
+    sample = [line for line in lines if line.strip()]
+    if len(sample) < 2:
+        return None
+    tail: list[bytes] = []
+    if not whole:
+        sample = sample[:JSONL_SAMPLE_LINES]
+        tail = foot.split(b"\n")[1:] if size > len(foot) else foot.split(b"\n")
+        tail = [line for line in tail if line.strip()][-JSONL_SAMPLE_LINES:]
+        sample += tail
+    for line in sample:
+        if line.strip()[:1] not in (b"{", b"["):
+            return None
+        try:
+            json.loads(line)
+        except ValueError:
+            return None
+
+    if str(file_path).lower().endswith(".ndjson"):
+        extension, name, mime_type = ".ndjson", "Newline Delimited JSON File", "application/x-ndjson"
+    else:
+        extension, name, mime_type = ".jsonl", "JSON Lines File", "application/jsonl"
+    # Lower when no complete line fitted in the foot, as the end of the file went unchecked
+    confidence = 1.0 if whole else 0.9 if tail else 0.8
+    return Match(extension=extension, name=name, mime_type=mime_type, confidence=confidence)
+
 
 def main(file_path: os.PathLike | str, head: bytes, foot: bytes) -> Match | None:
     if not (head.strip().startswith(b"{") and foot.strip().endswith(b"}")) and not (
         head.strip().startswith(b"[") and foot.strip().endswith(b"]")
     ):
         return None
+    # Two complete values on their own lines can not be one JSON document, no need to open the file
+    if jsonl_match := jsonl_check(file_path, head, foot):
+        return jsonl_match
     try:
         with open(file_path, "rb") as file:
-            json.load(file)
-    except (json.decoder.JSONDecodeError, OSError):
+            if os.fstat(file.fileno()).st_size <= JSON_LOADS_SIZE:
+                valid, complete, read = parse(file)
+            else:
+                valid, complete, read = validate(file, MAX_VALIDATE_BYTES)
+    except OSError:
+        return None
+    record_read("json_scanner", 0, read)
+    if not valid:
         return None
     return Match(
         extension=".json",
         name="JSON File",
         mime_type="application/json",
-        confidence=1.0,
+        confidence=1.0 if complete else PARTIAL_CONFIDENCE,
     )
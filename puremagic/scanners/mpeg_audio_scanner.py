@@ -14,7 +14,8 @@ The scanner quickly pulls out all the crucial stream details:
     * Sample Rate, Bit Rate,  Stereo/Mono
     * Detects and checks LAME Xing/Info and Fraunhofer VBRI frames
     * Detects CBR vs. VBR encoding through frame analysis (does not rely on above tags)
-    * Frame analysis also confirms validity of MP3 stream
+    * Frame analysis also confirms validity of MP3 stream, walking FRAMES_TO_CHECK frames from a single read,
+      the share found where expected is the match confidence
     * Detects and checks ID3v2, ID3v1, APE v1/v2, Lyrics3 v1/v2, ID3v1.2 EXT, ID3v1 TAG+ and 3DI tags
 
 Note on Tags:
@@ -29,9 +30,10 @@ Note on Tags:
 
 import os
 import struct
-from typing import IO, Any, Dict, List, Optional
+from io import BufferedIOBase
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
 mpeg_audio_signatures = [
     # These are all the valid signatures for raw MPEG Audio streams (Layers I, II, III),
@@ -108,6 +110,275 @@ mpeg_audio_signatures = [
 ]
 
 
+# --- LOOKUP TABLES ---
+# Indexed by the header fields: MPEG version index (3 = MPEG 1, 2 = MPEG 2, 0 = MPEG 2.5, 1 = Reserved),
+# layer index (3 = Layer I, 2 = Layer II, 1 = Layer III, 0 = Reserved), then bit or sample rate index.
+MPEG_VERSIONS = ("MPEG 2.5", "Reserved", "MPEG 2", "MPEG 1")
+LAYERS = ("Reserved", "Layer III (MP3)", "Layer II (MP2)", "Layer I (MP1)")
+CHANNEL_MODES = ("Stereo", "Joint-Stereo", "Dual-Channel", "Mono")
+SAMPLE_RATES = (
+    (11025, 12000, 8000, 0),  # MPEG 2.5
+    (0, 0, 0, 0),  # Reserved
+    (22050, 24000, 16000, 0),  # MPEG 2
+    (44100, 48000, 32000, 0),  # MPEG 1
+)
+_MPEG2_BIT_RATES = (
+    (0,) * 16,  # Reserved
+    (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0),  # Layer III
+    (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0),  # Layer II
+    (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256, 0),  # Layer I
+)
+BIT_RATES = (
+    _MPEG2_BIT_RATES,  # MPEG 2.5
+    ((0,) * 16,) * 4,  # Reserved
+    _MPEG2_BIT_RATES,  # MPEG 2
+    (  # MPEG 1
+        (0,) * 16,  # Reserved
+        (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0),  # Layer III
+        (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 0),  # Layer II
+        (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448, 0),  # Layer I
+    ),
+)
+# Xing/Info tag offset from byte 0 of the frame, (Stereo/Joint Stereo/Dual, Mono) by MPEG version index
+VBR_OFFSETS = ((21, 13), None, (21, 13), (36, 21))
+VBRI_OFFSET = 36  # Constant for VBRI tag offset
+# Frames after the first one walked to validate the stream. More frames give fewer false positives
+# and a finer consistency score, each costs at most one frame more in the single window read.
+FRAMES_TO_CHECK = 4
+# Header bits every frame of a stream shares: sync word, version, layer, sample rate and whether the
+# channel mode is one of the two stereo modes. LAME writes its Xing/Info frame as Stereo ahead of
+# Joint-Stereo audio frames, so the low channel mode bit may change from frame to frame.
+STREAM_HEADER_MASK = 0xFFFE0C80
+
+
+def _frame_size(header_bits: int) -> int:
+    """Frame size in bytes for header bits 9 to 20 (version down to padding), 0 if not a valid frame"""
+    version, layer = header_bits >> 10, (header_bits >> 8) & 0b11
+    bit_rate_kbps = BIT_RATES[version][layer][(header_bits >> 3) & 0b1111]
+    sample_rate_hz = SAMPLE_RATES[version][(header_bits >> 1) & 0b11]
+    if bit_rate_kbps == 0 or sample_rate_hz == 0:
+        return 0
+    # Layer I slots are 4 bytes, Layer II and MPEG 1 Layer III frames carry 1152 samples, MPEG 2/2.5 Layer III 576
+    slot_size = 12 if layer == 3 else 72 if layer == 1 and version != 3 else 144
+    frame_size = int((slot_size * bit_rate_kbps * 1000) / sample_rate_hz + (header_bits & 0b1))
+    if layer == 3:  # Layer I requires multiplication by 4
+        frame_size *= 4
+    return frame_size if 4 <= frame_size <= 5000 else 0
+
+
+# Frame size for every combination of the 12 header bits from the version to the padding bit,
+# look up with (header_int >> 9) & 0xFFF (the protection bit in there makes no difference)
+FRAME_SIZES = tuple(_frame_size(header_bits) for header_bits in range(4096))
+# Largest frame a stream can have, by the same bits with the bit rate and padding bits cleared (& 0xF86)
+MAX_FRAME_SIZES = {
+    bits: max(FRAME_SIZES[bits | (bit_rate_index << 3) | 1] for bit_rate_index in range(16))
+    for bits in range(4096)
+    if not bits & ~0xF86
+}
+
+# Frame ids that may open an ID3v2.2 tag
+ID3V22_FRAMES = frozenset(
+    (
+        b"AEN",
+        b"BUF",
+        b"CNT",
+        b"COM",
+        b"CRA",
+        b"CRM",
+        b"ETC",
+        b"EQU",
+        b"GEO",
+        b"LNK",
+        b"MCI",
+        b"MLL",
+        b"PIC",
+        b"POP",
+        b"REV",
+        b"RVA",
+        b"SLT",
+        b"STC",
+        b"TAL",
+        b"TBP",
+        b"TCM",
+        b"TCO",
+        b"TCR",
+        b"TDA",
+        b"TDY",
+        b"TEN",
+        b"TFT",
+        b"TIM",
+        b"TKE",
+        b"TLA",
+        b"TLE",
+        b"TMT",
+        b"TOA",
+        b"TOF",
+        b"TOL",
+        b"TOR",
+        b"TOT",
+        b"TP1",
+        b"TP2",
+        b"TP3",
+        b"TP4",
+        b"TPA",
+        b"TPB",
+        b"TRC",
+        b"TRD",
+        b"TRK",
+        b"TSS",
+        b"TT1",
+        b"TT2",
+        b"TT3",
+        b"TXT",
+        b"TXX",
+        b"TYE",
+        b"UFI",
+        b"ULT",
+        b"WAF",
+        b"WAR",
+        b"WAS",
+        b"WCM",
+        b"WCP",
+        b"WPB",
+        b"WXX",
+        b"WIR",
+        b"UIN",
+    )
+)
+# Frame ids for ID3v2.3 and 2.4, there are some uniques to both, but not enough
+# to make separate sets beneficial to speed or validity.
+ID3V23_FRAMES = frozenset(
+    (
+        b"AENC",
+        b"APIC",
+        b"ASPI",
+        b"COMM",
+        b"COMR",
+        b"ENCR",
+        b"EQU2",
+        b"ETCO",
+        b"GEOB",
+        b"GRID",
+        b"LINK",
+        b"MCDI",
+        b"MLLT",
+        b"OWNE",
+        b"PRIV",
+        b"PCNT",
+        b"POPM",
+        b"POSS",
+        b"RBUF",
+        b"RVA2",
+        b"RVRB",
+        b"SEEK",
+        b"SIGN",
+        b"SYLT",
+        b"SYTC",
+        b"UFID",
+        b"USER",
+        b"USLT",
+        b"WCOM",
+        b"WCOP",
+        b"WOAF",
+        b"WOAR",
+        b"WOAS",
+        b"WORS",
+        b"WPAY",
+        b"WPUB",
+        b"WXXX",
+        b"TYER",
+        b"TDAT",
+        b"TIME",
+        b"TORY",
+        b"TALB",
+        b"TBPM",
+        b"TCOM",
+        b"TCON",
+        b"TCOP",
+        b"TDEN",
+        b"TDLY",
+        b"TDOR",
+        b"TDRC",
+        b"TDRL",
+        b"TDTG",
+        b"TENC",
+        b"TEXT",
+        b"TFLT",
+        b"TIPL",
+        b"TIT1",
+        b"TIT2",
+        b"TIT3",
+        b"TKEY",
+        b"TLAN",
+        b"TLEN",
+        b"TMCL",
+        b"TMED",
+        b"TMOO",
+        b"TOAL",
+        b"TOFN",
+        b"TOLY",
+        b"TOPE",
+        b"TOWN",
+        b"TPE1",
+        b"TPE2",
+        b"TPE3",
+        b"TPE4",
+        b"TPOS",
+        b"TPRO",
+        b"TPUB",
+        b"TRCK",
+        b"TRSN",
+        b"TRSO",
+        b"TSOA",
+        b"TSOC",
+        b"TSOP",
+        b"TSOT",
+        b"TSRC",
+        b"TSSE",
+        b"TSST",
+        b"TXXX",
+    )
+)
+# Super niche 3 letter frame ids used in ID3v2.3 only
+ID3V23_3LETTER_FRAMES = frozenset((b"WAF", b"WIR", b"WYY"))
+
+# Keys an APE tag is expected to start with, title cased
+COMMON_APE_KEYS = (
+    b"Title",
+    b"Artist",
+    b"Album",
+    b"Track",
+    b"Year",
+    b"Genre",
+    b"Comment",
+    b"Album Artist",
+    b"Composer",
+    b"Copyright",
+    b"Disc",
+    b"Grouping",
+    b"Lyrics",
+    b"Publisher",
+    b"Subtitle",
+    b"Performer",
+    b"Conductor",
+    b"Rating",
+    b"File",
+    b"URL",
+    b"Cover Art (Front)",  # front Titled to match search
+    b"Cover Art (Back)",  # back Titled to match search
+    b"Media",
+    b"Language",
+    b"ReplayGain Track Gain",
+    b"ReplayGain Track Peak",
+    b"ReplayGain Album Gain",
+    b"ReplayGain Album Peak",
+    b"ISRC",
+    b"MCN",
+)
+# Lyrics3 v2 field headers walked at most before giving up on the tag
+MAX_LYRICS3_FIELDS = 64
+
+
 class DataCache:
     """
     We use a data cache as puremagic calls the script more than once.
@@ -160,8 +431,23 @@ class EndOfFileTags:
     def __init__(self, file_size: int):
         self.tags = []
         self.file_size = file_size
+        self.file = None
         self.foot_string = None
-        self.foot_size = 1572864  # 1.5MB in bytes, changes if file is smaller
+        # ID3v1 with TAG+, EXT or 3DI in front of it, and the Lyrics3 and APE footers before ID3v1 all fit.
+        # Changes if file is smaller, tag bodies further back are read on their own.
+        self.foot_size = 512
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        """Read length bytes from offset, from the foot already read when it covers them"""
+        foot_offset = self.file_size - self.foot_size
+        if offset >= foot_offset:
+            return self.foot_string[offset - foot_offset : offset - foot_offset + length]
+        if offset < 0:
+            raise ValueError("Tag starts before the file does")
+        self.file.seek(offset)
+        data = self.file.read(length)
+        record_read("mpeg_audio_scanner", offset, len(data))
+        return data
 
     def _id3v1(self) -> bool | None:
         """
@@ -336,72 +622,70 @@ class EndOfFileTags:
         """
         Checks for the Lyrics3 v1 and v2.
 
-        These are large tags (upto 1MB) and should be located at either:
-        a) Upto 1024 bytes from end of file if no ID3v1
-        b) Upto 1152 bytes from end of file if ID3v1 present
+        These are large tags (upto 1MB) that end with a marker either:
+        a) Immediately before end of file if no ID3v1
+        b) Immediately before the ID3v1 tag if present
         There is a chance another tag (like APE or EXT) can push it around,
         which means the data could be there, but in the wrong place.
 
         Validation relies on:
-        a) For v1: LYRICSBEGIN and LYRICSEND
+        a) For v1: LYRICSEND and a LYRICSBEGIN within the 5100 bytes of lyrics v1 allows
         AND a scan for metatag to see if any are present
         Unable to validate further as tag has no fixed content.
-        b) For v2: LYRICSBEGIN and LYRICS200
-        AND a scan for metatag to see if any are present
-        AND check the size of the found tag, matches the size metatag.
+        b) For v2: LYRICS200 and the size field in front of it,
+        AND LYRICSBEGIN exactly where that size puts the start of the tag
+        AND a walk of the field headers to see if any metatag is present.
 
         Returns None as a graceful exit if tag block not found
         """
         assert self.foot_string is not None
         id3v1_size = 128
-        max_tag_size = 1048576  # This is on paper the max a Lyrics3 tag could be (v1 in theory has no limit)
-        combined_size = (max_tag_size + id3v1_size) if id3v1 else max_tag_size
-
-        if self.foot_size < combined_size:  # LYRICS OR LYRICS + ID3v1
-            combined_size = self.foot_size
+        lyricsend_size = 9  # This is for LYRICSEND or LYRICS200
+        size_tag_size = 6
+        max_v1_size = 5100 + 11  # Lyrics plus LYRICSBEGIN
+        lyric3_tags = (b"IND", b"LYR", b"INF", b"AUT", b"EAL", b"EAR", b"ETT", b"IMG", b"GRE")
 
         try:
-            # Scan only calculated tag area, try to avoid false positives
-            # This just checks for LYRICSEND or LYRICS200 marker immediately
-            # before EOF or TAG
-            lyricsend_size = 9  # This is for LYRICSEND or LYRICS200
+            # This just checks for LYRICSEND or LYRICS200 marker immediately before EOF or TAG
             end_size = (lyricsend_size + id3v1_size) if id3v1 else lyricsend_size
+            if self.foot_size < end_size + size_tag_size:
+                return None  # Too small to contain Lyrics3
             end_tag_start = self.foot_size - end_size
-            end_tag_end = end_tag_start + lyricsend_size
-            found_lyric = None
-            for lyric_end in (b"LYRICSEND", b"LYRICS200"):
-                find_tag_end = self.foot_string.rfind(lyric_end, end_tag_start, end_tag_end)
-                if find_tag_end != -1:
-                    found_lyric = lyric_end
-            if found_lyric is None:
-                return None  # No end marker found
-
-            # Now we can scan for the start marker,
-            # as we cannot overly target a scan we go for a broad
-            # search of the last 1MB (or smaller) of the file.
-            max_allowed_search_size = min(self.foot_size, self.file_size)
-            tag_start_start = max_allowed_search_size - combined_size
-            tag_start_end = tag_start_start + max_tag_size
-            find_tag_start = self.foot_string.rfind(b"LYRICSBEGIN", tag_start_start, tag_start_end)
-            if find_tag_start == -1:
-                return None  # Tag start not found
-
-            # Now we have the tag size and can scan inside the tag
-            lyric3_tags = [b"IND", b"LYR", b"INF", b"AUT", b"EAL", b"EAR", b"ETT", b"IMG", b"GRE"]
-            tag_block = self.foot_string[find_tag_start:end_tag_end]
+            found_lyric = self.foot_string[end_tag_start : end_tag_start + lyricsend_size]
+            marker_offset = self.file_size - end_size
 
             if found_lyric == b"LYRICSEND":  # v1
-                if any(tag in tag_block for tag in lyric3_tags):  # This is the best we can do for v1
+                # No size field, look for the start marker within the largest v1 tag
+                search_start = max(0, marker_offset - max_v1_size)
+                tag_data = self._read_at(search_start, marker_offset - search_start)
+                find_tag_start = tag_data.rfind(b"LYRICSBEGIN")
+                if find_tag_start == -1:
+                    return None  # Tag start not found
+                if any(tag in tag_data[find_tag_start:] for tag in lyric3_tags):  # This is the best we can do for v1
                     self.tags.append("Lyricsv1")
 
             if found_lyric == b"LYRICS200":  # v2
-                # Get the v2 size data
-                tag_size = len(tag_block)  # This matches Hex editors so length is correct
-                size_tag_size = 6
-                v2_tag_data = self.foot_string[end_tag_start - size_tag_size : end_tag_end - lyricsend_size]
-                v2_tag_size_calc = int(v2_tag_data) + size_tag_size + lyricsend_size
-                if any(tag in tag_block for tag in lyric3_tags) and tag_size == v2_tag_size_calc:
-                    self.tags.append("Lyricsv2")
+                # The size covers LYRICSBEGIN and the fields, up to the size field itself
+                size_field = self.foot_string[end_tag_start - size_tag_size : end_tag_start]
+                if not size_field.isdigit():
+                    return None  # Not a tag size
+                tag_size = int(size_field)
+                fields_end = marker_offset - size_tag_size
+                tag_start = fields_end - tag_size
+                if self._read_at(tag_start, 11) != b"LYRICSBEGIN":
+                    return None  # Tag start not where the size says
+                # Each field is a 3 letter id and a 5 digit size, hop from one field header to the next
+                position = tag_start + 11
+                for _ in range(MAX_LYRICS3_FIELDS):
+                    if position + 8 > fields_end:
+                        break
+                    field = self._read_at(position, 8)
+                    if field[:3] in lyric3_tags:
+                        self.tags.append("Lyricsv2")
+                        break
+                    if not field[3:].isdigit():
+                        return None  # Not a field size, signs included
+                    position += 8 + int(field[3:])
 
             return None  # Could not find a valid tag block
 
@@ -429,91 +713,52 @@ class EndOfFileTags:
         AND decode the tag for size and fixed marker checks.
         b) For v2: finding the APETAGEX header and footer
         AND decode the tag for size and fixed marker checks.
+        Only the footer, the header and the first key are read, the size in the footer says where.
 
         Returns None as a graceful exit if tag block not found
         """
         assert self.foot_string is not None
-        common_ape_keys = (
-            b"Title",
-            b"Artist",
-            b"Album",
-            b"Track",
-            b"Year",
-            b"Genre",
-            b"Comment",
-            b"Album Artist",
-            b"Composer",
-            b"Copyright",
-            b"Disc",
-            b"Grouping",
-            b"Lyrics",
-            b"Publisher",
-            b"Subtitle",
-            b"Performer",
-            b"Conductor",
-            b"Rating",
-            b"File",
-            b"URL",
-            b"Cover Art (Front)",  # front Titled to match search
-            b"Cover Art (Back)",  # back Titled to match search
-            b"Media",
-            b"Language",
-            b"ReplayGain Track Gain",
-            b"ReplayGain Track Peak",
-            b"ReplayGain Album Gain",
-            b"ReplayGain Album Peak",
-            b"ISRC",
-            b"MCN",
-        )
         id3v1_size = 128
-        max_tag_size = 1048576  # This is a practical scan range of 1MB, Ape v2 in theory can be 4GB
-        combined_size = (max_tag_size + id3v1_size) if id3v1 else max_tag_size
-
-        if self.foot_size < combined_size:  # APE OR APE + ID3v1
-            combined_size = self.foot_size
+        longest_key = 32  # Enough for the longest of COMMON_APE_KEYS
 
         try:
-            # Scan only calculated tag area, try to avoid false positives
             # This just checks for APETAGEX marker immediately before EOF or ID3v1 TAG
             apextag_size = 32  # This is for APETAGEX and data bytes
             end_size = (apextag_size + id3v1_size) if id3v1 else apextag_size
+            if self.foot_size < end_size:
+                return None  # Too small to contain APE
             end_tag_start = self.foot_size - end_size
-            end_tag_end = end_tag_start + apextag_size
-
-            find_tag_end = self.foot_string.rfind(b"APETAGEX", end_tag_start, end_tag_end)
-            if find_tag_end == -1:
+            footer = self.foot_string[end_tag_start : end_tag_start + apextag_size]
+            if b"APETAGEX" not in footer:
                 return None  # Tag not found
 
             # Footer tag
             # Check Version (bytes 8-11, Little-Endian)
-            f_version = struct.unpack("<I", self.foot_string[end_tag_start + 8 : end_tag_start + 12])[0]
+            # Check Size (bytes 13-16, Little-Endian), it covers the items and footer but not the header
+            f_version, f_size = struct.unpack_from("<II", footer, 8)
             if f_version not in (1000, 2000):
                 return None  # Unsupported/Invalid tag version
-            # Check Size (bytes 13-16, Little-Endian)
-            f_size = struct.unpack("<I", self.foot_string[end_tag_start + 12 : end_tag_start + 16])[0]
+            items_start = self.file_size - end_size + apextag_size - f_size
+            # Reach first key in tag, in APE the tag key name is preceded by 8 bytes associated with it.
+            # APE does not care about case for tag keys, but Title and UPPER are commonly accepted as standard
+            first_key = self._read_at(items_start + 8, longest_key)
 
             if f_version == 1000:  # v1
-                # Reach first key in tag, in APE the tag key name is preceded by 8 bytes associated with it.
-                first_key = combined_size - ((end_size + f_size) - apextag_size) + 8
-                # APE does not care about case for tag keys, but Title and UPPER are commonly accepted as standard
-                if not self.foot_string[first_key:].title().startswith(common_ape_keys):
+                if not first_key.title().startswith(COMMON_APE_KEYS):
                     return None  # Tag may start with a unknown or invalid key
                 self.tags.append("APEv1")
 
             if f_version == 2000:  # v2
                 # Get the APEXTAG header
-                tag_header = combined_size - ((end_size + f_size) - apextag_size) - apextag_size
-                tag_block = self.foot_string[tag_header:end_tag_end]
-                h_version = struct.unpack("<I", self.foot_string[tag_header + 8 : tag_header + 12])[0]
-                h_size = struct.unpack("<I", self.foot_string[tag_header + 12 : tag_header + 16])[0]
-                first_key = combined_size - ((end_size + f_size) - apextag_size) + 8
+                tag_header = self._read_at(items_start - apextag_size, apextag_size)
+                if not tag_header.startswith(b"APETAGEX"):
+                    return None  # No header where the size says
+                h_version, h_size = struct.unpack_from("<II", tag_header, 8)
                 if h_version != f_version:
                     return None  # Tag versions do not match
                 if h_size != f_size:
                     return None  # Tag size bytes do not match
-                if len(tag_block) != h_size + apextag_size:  # APE size does not include the 32 header bytes
-                    return None  # Tag size bytes and real size do not match
-                if not self.foot_string[first_key:].title().startswith(common_ape_keys):
+                if not first_key.title().startswith(COMMON_APE_KEYS):
                     return None  # Tag may start with a unknown or invalid key
                 self.tags.append("APEv2")
 
@@ -522,12 +767,15 @@ class EndOfFileTags:
         except Exception:
             return None  # Other unexpected issues
 
-    def find_tags(self, file: IO[bytes]) -> None:
-        """Read last 1.5MB of file and look for tags."""
-        file.seek(max(0, self.file_size - self.foot_size))
-        self.foot_string = file.read()
-        self.foot_size = len(self.foot_string) if len(self.foot_string) < self.foot_size else self.foot_size
-        file.seek(0)
+    def find_tags(self, file: BufferedIOBase) -> None:
+        """Read the last 512 bytes of file and look for tags, reading further back only to follow their sizes."""
+        self.file = file
+        self.foot_size = min(self.foot_size, self.file_size)
+        foot_offset = self.file_size - self.foot_size
+        file.seek(foot_offset)
+        self.foot_string = file.read(self.foot_size)
+        record_read("mpeg_audio_scanner", foot_offset, len(self.foot_string))
+        self.foot_size = len(self.foot_string)
         id3v1 = self._id3v1()
         if id3v1:  # These two require an ID3v1 TAG to be present
             self._tag_plus()
@@ -535,6 +783,7 @@ class EndOfFileTags:
         self._3di(id3v1)
         self._lyrics3(id3v1)
         self._ape(id3v1)
+        file.seek(0)
 
 
 class MpegAudioDecoder:
@@ -551,50 +800,15 @@ class MpegAudioDecoder:
         self.header_results = {}
         self.first_frame_offset = 0
 
+        # Set when known, a head holding the whole file then serves every read
+        self.file_size = None
+
         # VBR
         self.vbr_info = None  # Stores detected VBR tag string ("Xing", "VBRI", etc.)
-        self.VBRI_OFFSET = 36  # Constant for VBRI tag offset
+        # Share of the frames after the first found where expected, used as the match confidence
+        self.consistency = 0.0
 
-        # --- LOOKUP TABLES ---
-        self.sample_rate_table = {
-            3: [44100, 48000, 32000, 0],  # MPEG 1
-            2: [22050, 24000, 16000, 0],  # MPEG 2
-            0: [11025, 12000, 8000, 0],  # MPEG 2.5
-        }
-        self.bitrate_table = {
-            # MPEG 1
-            3: {
-                3: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448, 0],  # Layer I
-                2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 0],  # Layer II
-                1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],  # Layer III
-            },
-            # MPEG 2/2.5
-            2: {
-                3: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256, 0],  # Layer I
-                2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],  # Layer II
-                1: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],  # Layer III
-            },
-            0: {
-                3: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256, 0],  # Layer I
-                2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],  # Layer II
-                1: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],  # Layer III
-            },
-        }
-        self.mpeg_version_map = {3: "MPEG 1", 2: "MPEG 2", 0: "MPEG 2.5", 1: "Reserved"}
-        self.mpeg_version_reverse = {"MPEG 1": 3, "MPEG 2": 2, "MPEG 2.5": 0}
-        self.layer_map = {3: "Layer I (MP1)", 2: "Layer II (MP2)", 1: "Layer III (MP3)", 0: "Reserved"}
-        self.channel_mode_map = {3: "Mono", 2: "Dual-Channel", 1: "Joint-Stereo", 0: "Stereo"}
-        self.vbr_offsets = {
-            # (MPEG_VERSION_INDEX, IS_MONO) -> Offset from byte 0
-            (3, False): 36,  # MPEG 1, Stereo/Joint Stereo
-            (3, True): 21,  # MPEG 1, Mono
-            (2, False): 21,  # MPEG 2/2.5, Stereo/Joint Stereo
-            (2, True): 13,  # MPEG 2/2.5, Mono
-            (0, False): 21,  # MPEG 2.5, Stereo
-            (0, True): 13,  # MPEG 2.5, Mono
-        }
-
-    def _parse_vbr_header(self, frame_bytes: bytes, header_results: Dict[str, Any]) -> Optional[str]:
+    def _parse_vbr_header(self, frame_bytes: bytes, header_results: dict) -> str | None:
         """
         Checks the first frame for Xing/Info (LAME) and VBRI (Fraunhofer) VBR tags.
 
@@ -613,12 +827,8 @@ class MpegAudioDecoder:
             return None
 
         # 2. Determine Offsets using validated results
-        mpeg_version_str = header_results.get("mpeg_version")
-        if mpeg_version_str is None:
-            return None
-        mpeg_version_index = self.mpeg_version_reverse.get(mpeg_version_str)
-
-        if mpeg_version_index is None:
+        vbr_offsets = VBR_OFFSETS[header_results.get("mpeg_version_index", 1)]
+        if vbr_offsets is None:
             return None
 
         channel_mode_str = header_results.get("chanel_mode", "Stereo")
@@ -626,10 +836,9 @@ class MpegAudioDecoder:
         found_tag = None
 
         # --- 3. Check Xing/Info Tag ---
-        key = (mpeg_version_index, is_mono)
-        xing_vbr_offset = self.vbr_offsets.get(key)
+        xing_vbr_offset = vbr_offsets[is_mono]
 
-        if xing_vbr_offset is not None and len(frame_bytes) >= xing_vbr_offset + 4:
+        if len(frame_bytes) >= xing_vbr_offset + 4:
             identifier_bytes = frame_bytes[xing_vbr_offset : xing_vbr_offset + 4]
             identifier = identifier_bytes.decode("ascii", errors="ignore")
 
@@ -637,7 +846,7 @@ class MpegAudioDecoder:
                 found_tag = identifier
 
         # --- 4. Check VBRI Tag ---
-        vbri_vbr_offset = self.VBRI_OFFSET
+        vbri_vbr_offset = VBRI_OFFSET
 
         # Only check VBRI if Xing/Info was not found
         if found_tag is None and len(frame_bytes) >= vbri_vbr_offset + 4:
@@ -674,130 +883,90 @@ class MpegAudioDecoder:
         if bit_rate_index == 0 or bit_rate_index == 15 or sample_rate_index == 3:
             raise ValueError("Reserved bit rate, index 0, or sample rate index used.")
         # --- 2. Lookup Values ---
-        sr_list = self.sample_rate_table.get(mpeg_version_index)
-        if not sr_list:
-            raise ValueError("MPEG version not supported for Sample Rate lookup.")
-        sample_rate_hz = sr_list[sample_rate_index]
-
-        br_version_table = self.bitrate_table.get(mpeg_version_index)
-        if not br_version_table:
-            raise ValueError("MPEG version not supported for Bit Rate lookup.")
-
-        br_layer_list = br_version_table.get(layer_index)
-        if not br_layer_list:
-            raise ValueError("Layer not supported for Bit Rate lookup.")
-
-        bit_rate_kbps = br_layer_list[bit_rate_index]
-
-        if bit_rate_kbps == 0 or sample_rate_hz == 0:
-            raise ValueError("Calculated bit rate or sample rate is zero.")
-
-        # --- 3. Frame Size Calculation ---
-        if layer_index == 3:  # Layer I
-            slot_size = 12
-        elif layer_index == 2 or layer_index == 1:  # Layer II or Layer III
-            # MPEG 1 uses 144, MPEG 2/2.5 use 72
-            if mpeg_version_index == 3:  # MPEG 1
-                slot_size = 144
-            else:  # MPEG 2/2.5
-                slot_size = 72
+        bit_rate_kbps = BIT_RATES[mpeg_version_index][layer_index][bit_rate_index]
+        sample_rate_hz = SAMPLE_RATES[mpeg_version_index][sample_rate_index]
 
-        # Frame Size Formula:
-        frame_size_val = int((slot_size * bit_rate_kbps * 1000) / sample_rate_hz + padding_bit)
-
-        if layer_index == 3:  # Layer I requires multiplication by 4
-            frame_size_val *= 4
-
-        if frame_size_val < 4 or frame_size_val > 5000:
+        # --- 3. Frame Size, precomputed for every version, layer, rate and padding combination ---
+        frame_size_val = FRAME_SIZES[(header_int >> 9) & 0xFFF]
+        if frame_size_val == 0:
             raise ValueError("Calculated frame size is out of expected bounds.")
 
         # Compile the results dictionary
         self.header_results = {
             "sync_word": True,
-            "mpeg_version": self.mpeg_version_map.get(mpeg_version_index),
-            "layer": self.layer_map.get(layer_index),
+            "mpeg_version": MPEG_VERSIONS[mpeg_version_index],
+            "layer": LAYERS[layer_index],
             "bit_rate": f"{bit_rate_kbps}k",
             "sample_rate": f"{sample_rate_hz / 1000:.1f}Khz",
             "padding": padding_bit,
-            "chanel_mode": self.channel_mode_map.get(channel_mode_index, "Reserved"),
+            "chanel_mode": CHANNEL_MODES[channel_mode_index],
             "frame_size": f"{frame_size_val} bytes",
             "raw_frame_size": frame_size_val,  # CRUCIAL for seeking
             "bit_rate_index": bit_rate_index,
             "mpeg_version_index": mpeg_version_index,
         }
 
-    def _check_stream_consistency(
-        self, file_handle, frame1_bit_rate_index, frame2_start_abs_offset, frame1_size
-    ) -> str | None:
+    def _check_stream_consistency(self, window: bytes, frame1_header: int, frame2_offset: int) -> tuple[str, float]:
         """
-        Checks the bit rate index of the next few frames (up to 3 total) against
-        the first frame to determine stream consistency, using a small search
-        window to overcome frame 'wobble' found in some Layer II encodings.
+        Walks up to FRAMES_TO_CHECK frames after the first one through window, bytes read
+        once from the first frame on. Each frame is expected where the size of the one before
+        it ends, using a small search window to overcome frame 'wobble' found in some Layer II
+        encodings. A frame counts when its header is valid and shares the first frame's
+        version, layer, sample rate and stereo or single channel mode.
+
+        The walk stops at the first frame not found or at the end of the file.
+        Returns "VBR" if any frame found has another bit rate than the first, otherwise "CBR",
+        and the share of the frames looked for that were found.
         """
-        frames_to_check = 2
-        current_offset = frame2_start_abs_offset
-        step_size = frame1_size
-
-        # Loop for Frame 2 and Frame 3
-        for i in range(1, frames_to_check + 1):
-            found_match = False
-
+        current_offset = frame2_offset
+        frame1_bit_rate_index = (frame1_header >> 12) & 0b1111
+        stream_bits = frame1_header & STREAM_HEADER_MASK
+        stream_type = "CBR"
+        found = 0
+
+        for _ in range(FRAMES_TO_CHECK):
+            frame_size = 0
             # Search window of 4 bytes (0, 1, 2, 3 bytes ahead)
             for search_offset in range(4):
-                seek_pos = current_offset + search_offset
-
-                try:
-                    file_handle.seek(seek_pos, os.SEEK_SET)
-                    frame_header_bytes = file_handle.read(4)
-
-                    if len(frame_header_bytes) < 4:
-                        # End of file reached before full consistency check.
-                        # Assume CBR based on checks passed so far.
-                        return "CBR"
-
-                    frame_bit_rate_index = self.extract_bit_rate_index(frame_header_bytes)
-
-                    # Check 1: Must be a valid header (not -1) AND
-                    # Check 2: Must have the same bit rate index as Frame 1 (frame1_bit_rate_index)
-                    if frame_bit_rate_index != -1 and frame_bit_rate_index == frame1_bit_rate_index:
-                        # Found the next frame at the expected bit rate (CBR).
-                        # Break the inner search loop and prepare for the next frame check.
-
-                        # Update the current offset to the *actual* start of the found frame
-                        # plus the expected frame size, for the next check.
-                        current_offset = seek_pos + step_size
-                        found_match = True
+                position = current_offset + search_offset
+                if position + 4 > len(window):
+                    # End of file reached, judge on the frames checked so far. A lone frame can not be
+                    # checked against anything, one cut short by the end of the file is not a frame at all.
+                    if found:
+                        return stream_type, 1.0
+                    return stream_type, 0.5 if frame2_offset <= len(window) else 0.0
+                header_int = int.from_bytes(window[position : position + 4], "big")
+                if header_int & STREAM_HEADER_MASK == stream_bits:
+                    frame_size = FRAME_SIZES[(header_int >> 9) & 0xFFF]
+                    if frame_size:
                         break
 
-                except Exception:
-                    continue  # Try the next search_offset
-
-            # If we failed to find a consistent frame nearby after checking the window:
-            if not found_match:
-                # The bit rate index is inconsistent over a small range.
-                return "VBR"
+            if not frame_size:
+                # Not a frame where one should be, the stream is inconsistent from here on
+                return stream_type, found / (found + 1)
 
-        # If the loop completed (F1, F2, and F3 were consistent or found nearby)
-        return "CBR"
+            found += 1
+            if (header_int >> 12) & 0b1111 != frame1_bit_rate_index:
+                stream_type = "VBR"
+            current_offset = position + frame_size
 
-    def extract_bit_rate_index(self, header_bytes):
-        """Utility to quickly get the bit rate index for stream consistency check."""
-        if len(header_bytes) < 4:
-            return -1
-        # Check for sync word (FF Ex) before extracting
-        if header_bytes[0] != 0xFF or (header_bytes[1] & 0xE0) != 0xE0:
-            return -1
+        # If the loop completed every frame was found where expected
+        return stream_type, 1.0
 
-        header_int = struct.unpack(">I", header_bytes)[0]
-        return (header_int >> 12) & 0b1111
+    def _read(self, head: bytes, file: BufferedIOBase, offset: int, length: int) -> bytes:
+        """Read length bytes at offset, straight from the head when it covers them"""
+        if offset + length <= len(head) or len(head) == self.file_size:
+            return head[offset : offset + length]
+        file.seek(offset, os.SEEK_SET)
+        data = file.read(length)
+        record_read("mpeg_audio_scanner", offset, len(data))
+        return data
 
-    def decoder(self, head: bytes, file: IO[bytes]):
+    def decoder(self, head: bytes, file: BufferedIOBase):
         """Decodes the MPEG Audios Stream."""
 
-        # Seek to start (start of file or after ID3v2)
-        file.seek(self.first_frame_offset, os.SEEK_SET)
-        # Decode the first frame header (H1)
-        header_bytes_frame1 = file.read(4)
+        # Decode the first frame header (H1), at the start of file or after ID3v2
+        header_bytes_frame1 = self._read(head, file, self.first_frame_offset, 4)
         if len(header_bytes_frame1) < 4:
             return None
 
@@ -810,34 +979,25 @@ class MpegAudioDecoder:
         raw_frame_size = self.header_results["raw_frame_size"]
         assert isinstance(raw_frame_size, int)
 
-        # Read the area for VBR check
-        read_size_for_vbr_check = min(raw_frame_size - 4, 150)
-        frame_body_for_vbr = file.read(read_size_for_vbr_check)
-
-        # Combine header and body bytes for easy slicing in the VBR parser
-        frame_bytes_for_vbr = header_bytes_frame1 + frame_body_for_vbr
+        # One read covers the first frame and the frames after it the consistency check walks, at the
+        # largest frame size this version, layer and sample rate allow plus up to 3 bytes of wobble each
+        frame1_header = struct.unpack(">I", header_bytes_frame1)[0]
+        max_frame_size = MAX_FRAME_SIZES[(frame1_header >> 9) & 0xF86]
+        window = self._read(
+            head, file, self.first_frame_offset, raw_frame_size + FRAMES_TO_CHECK * (max_frame_size + 3) + 4
+        )
 
-        # Check for VBR Header (Xing/Info/VBRI)
+        # Check for VBR Header (Xing/Info/VBRI) in the start of the first frame
         # This is only an informative check, we do not determine VBR/CBR from this.
         # These headers are for Layer III only, Layers I and II do not have them.
+        frame_bytes_for_vbr = window[: 4 + min(raw_frame_size - 4, 150)]
         self.vbr_info = self._parse_vbr_header(frame_bytes_for_vbr, self.header_results)
 
-        frame_step_size = raw_frame_size
-
-        # Check Stream Consistency by seeking to Frame 2 and 3
+        # Check Stream Consistency of the frames that follow
         # This determines VBR/CBR for all MPEG versions and Layers.
-        if raw_frame_size > 0:
-            frame2_start_abs_offset = self.first_frame_offset + frame_step_size
-            frame1_bit_rate_index = self.header_results["bit_rate_index"]
-
-            stream_type_deduction = self._check_stream_consistency(
-                file,
-                frame1_bit_rate_index,
-                frame2_start_abs_offset,
-                frame_step_size,
-            )
-        else:
-            stream_type_deduction = None
+        stream_type_deduction, self.consistency = self._check_stream_consistency(window, frame1_header, raw_frame_size)
+        if self.consistency == 0:
+            return None  # Nothing that looks like a frame follows the first one
 
         # Final Result Compilation
         if stream_type_deduction is not None and self.header_results.get("sync_word"):
@@ -862,171 +1022,7 @@ class ID3v2Decoder:
         self.file_size = file_size
         self.id3_tag_size = None  # Total tag size (10-byte header + content)
 
-        self.tagsv22 = [  # Tag list for ID3v2.2
-            b"AEN",
-            b"BUF",
-            b"CNT",
-            b"COM",
-            b"CRA",
-            b"CRM",
-            b"ETC",
-            b"EQU",
-            b"GEO",
-            b"LNK",
-            b"MCI",
-            b"MLL",
-            b"PIC",
-            b"POP",
-            b"REV",
-            b"RVA",
-            b"SLT",
-            b"STC",
-            b"TAL",
-            b"TBP",
-            b"TCM",
-            b"TCO",
-            b"TCR",
-            b"TDA",
-            b"TDY",
-            b"TEN",
-            b"TFT",
-            b"TIM",
-            b"TKE",
-            b"TLA",
-            b"TLE",
-            b"TMT",
-            b"TOA",
-            b"TOF",
-            b"TOL",
-            b"TOR",
-            b"TOT",
-            b"TP1",
-            b"TP2",
-            b"TP3",
-            b"TP4",
-            b"TPA",
-            b"TPB",
-            b"TRC",
-            b"TRD",
-            b"TRK",
-            b"TSS",
-            b"TT1",
-            b"TT2",
-            b"TT3",
-            b"TXT",
-            b"TXX",
-            b"TYE",
-            b"UFI",
-            b"ULT",
-            b"WAF",
-            b"WAR",
-            b"WAS",
-            b"WCM",
-            b"WCP",
-            b"WPB",
-            b"WXX",
-            b"WIR",
-            b"UIN",
-        ]
-        # Tag list for ID3v2.3 and 2.4, there are some uniques to both, but not enough
-        # to make repeating the list beneficial to speed or validity.
-        self.tagsv23 = [
-            b"AENC",
-            b"APIC",
-            b"ASPI",
-            b"COMM",
-            b"COMR",
-            b"ENCR",
-            b"EQU2",
-            b"ETCO",
-            b"GEOB",
-            b"GRID",
-            b"LINK",
-            b"MCDI",
-            b"MLLT",
-            b"OWNE",
-            b"PRIV",
-            b"PCNT",
-            b"POPM",
-            b"POSS",
-            b"RBUF",
-            b"RVA2",
-            b"RVRB",
-            b"SEEK",
-            b"SIGN",
-            b"SYLT",
-            b"SYTC",
-            b"UFID",
-            b"USER",
-            b"USLT",
-            b"WCOM",
-            b"WCOP",
-            b"WOAF",
-            b"WOAR",
-            b"WOAS",
-            b"WORS",
-            b"WPAY",
-            b"WPUB",
-            b"WXXX",
-            b"TYER",
-            b"TDAT",
-            b"TIME",
-            b"TORY",
-            b"TALB",
-            b"TBPM",
-            b"TCOM",
-            b"TCON",
-            b"TCOP",
-            b"TDEN",
-            b"TDLY",
-            b"TDOR",
-            b"TDRC",
-            b"TDRL",
-            b"TDTG",
-            b"TENC",
-            b"TEXT",
-            b"TFLT",
-            b"TIPL",
-            b"TIT1",
-            b"TIT2",
-            b"TIT3",
-            b"TKEY",
-            b"TLAN",
-            b"TLEN",
-            b"TMCL",
-            b"TMED",
-            b"TMOO",
-            b"TOAL",
-            b"TOFN",
-            b"TOLY",
-            b"TOPE",
-            b"TOWN",
-            b"TPE1",
-            b"TPE2",
-            b"TPE3",
-            b"TPE4",
-            b"TPOS",
-            b"TPRO",
-            b"TPUB",
-            b"TRCK",
-            b"TRSN",
-            b"TRSO",
-            b"TSOA",
-            b"TSOC",
-            b"TSOP",
-            b"TSOT",
-            b"TSRC",
-            b"TSSE",
-            b"TSST",
-            b"TXXX",
-        ]
-        self.tagsv23_3letter = [  # Super niche 3 letter tags used in ID3v2.3 only
-            b"WAF",
-            b"WIR",
-            b"WYY",
-        ]
-
-    def _check_id3v2_tag(self, head: bytes) -> Optional[int]:
+    def _check_id3v2_tag(self, head: bytes) -> int | None:
         """
         Checks for ID3v2 tags. Calculates the size of the ID3v2 tag from the
         synchsafe size field (bytes 6-9).
@@ -1046,7 +1042,7 @@ class ID3v2Decoder:
 
         # ID3v2.2
         if head[0:5] == b"ID3\x02\x00":
-            if head[10:13] not in self.tagsv22:
+            if head[10:13] not in ID3V22_FRAMES:
                 return None
             # ID3v2.2 uses a standard 4-byte big-endian integer for size
             tag_content_size = (size_field[0] << 24) | (size_field[1] << 16) | (size_field[2] << 8) | size_field[3]
@@ -1055,9 +1051,9 @@ class ID3v2Decoder:
         # ID3v2.3 or ID3v2.4
         elif head[0:5] == b"ID3\x03\x00" or head[0:5] == b"ID3\x04\x00":
             # Quick tag scan for v2.3/v2.4 (4-letter frames)
-            if head[10:14] not in self.tagsv23:
+            if head[10:14] not in ID3V23_FRAMES:
                 # Check for niche 3-letter v2.3 frames
-                if head[10:13] not in self.tagsv23_3letter:
+                if head[10:13] not in ID3V23_3LETTER_FRAMES:
                     return None
             # ID3v2.3 and ID3v2.4 use the Synchsafe Integer for size
             tag_content_size = (size_field[0] << 21) | (size_field[1] << 14) | (size_field[2] << 7) | size_field[3]
@@ -1086,7 +1082,7 @@ class ID3v2Decoder:
         return audio_start_offset if audio_start_offset is not None else 0
 
 
-def build_name(mpega, id3v2_tags: str | None, eof_tags: List) -> tuple[str, str] | tuple[None, None]:
+def build_name(mpega, id3v2_tags: str | None, eof_tags: list) -> tuple[str, str] | tuple[None, None]:
     """
     Build an return the full name string and extension.
 
@@ -1142,7 +1138,7 @@ def build_name(mpega, id3v2_tags: str | None, eof_tags: List) -> tuple[str, str]
     return full_name, ext
 
 
-def test_mpega(file_path: os.PathLike | str, head: bytes) -> Optional[Match]:
+def test_mpega(file_path: os.PathLike | str, head: bytes) -> Match | None:
     """Main workflow"""
     if DataCache.is_cached() and DataCache.get_file_path() == file_path:
         if DataCache.is_matched():
@@ -1153,6 +1149,7 @@ def test_mpega(file_path: os.PathLike | str, head: bytes) -> Optional[Match]:
         DataCache.set_file_path(file_path)
         eof = EndOfFileTags(os.path.getsize(file_path))
         mpega = MpegAudioDecoder()
+        mpega.file_size = os.path.getsize(file_path)
         id3v2 = ID3v2Decoder(os.path.getsize(file_path), mpega)
         try:
             with open(file_path, "rb") as file:
@@ -1160,7 +1157,8 @@ def test_mpega(file_path: os.PathLike | str, head: bytes) -> Optional[Match]:
                 # If ID3v2 present, test and then adjust frame offset
                 if b"ID3" == head[0:3]:
                     mpega.first_frame_offset = id3v2.decode_id3v2(head)
-                mpega.decoder(head, file)
+                if mpega.decoder(head, file) is None:
+                    return None  # Not a consistent MPEG audio stream
         except Exception:
             return None  # If the decode process fails for any unknown reason
 
@@ -1169,10 +1167,10 @@ def test_mpega(file_path: os.PathLike | str, head: bytes) -> Optional[Match]:
             return None  # Name building failed for some reason
 
         # Store the result for future calls, then return
-        result = Match(extension=ext, name=full_name, mime_type="audio/mpeg", confidence=1.0)
+        result = Match(extension=ext, name=full_name, mime_type="audio/mpeg", confidence=mpega.consistency)
         DataCache.set_result(result)
         return result
 
 
-def main(file_path: os.PathLike | str, head: bytes, _) -> Optional[Match]:
+def main(file_path: os.PathLike | str, head: bytes, _) -> Match | None:
     return test_mpega(file_path, head)
@@ -1,58 +1,160 @@
-import ast
+import io
 import os
+from typing import TYPE_CHECKING
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
-# AST node types that are strong indicators of real Python code
-_PYTHON_NODE_TYPES = (
-    ast.Import,
-    ast.ImportFrom,
-    ast.FunctionDef,
-    ast.AsyncFunctionDef,
-    ast.ClassDef,
-    ast.For,
-    ast.AsyncFor,
-    ast.While,
-    ast.With,
-    ast.AsyncWith,
-    ast.Try,
-    ast.Raise,
-    ast.Assert,
+MAX_FILE_SIZE = 1_000_000
+# Bytes tokenized by the fast path before deciding whether a full parse is needed
+FAST_PATH_BYTES = 32 * 1024
+# Well formed statements (imports, definitions, block headers) that settle it without a parse
+FAST_PATH_EVIDENCE = 8
+# Parse at most this many bytes, cut back to the last top level line, None parses whole
+# files up to MAX_FILE_SIZE. Lowers the cost of inconclusive files at some accuracy.
+MAX_PARSE_BYTES: int | None = None
+
+# Every node counted by _has_python_constructs starts with one of these keywords,
+# so fewer of them than the threshold in a whole file means too few constructs.
+_CONSTRUCT_KEYWORDS = frozenset(("import", "def", "class", "for", "while", "with", "try", "raise", "assert"))
+_BLOCK_KEYWORDS = frozenset(("if", "elif", "else", "for", "while", "with", "try", "except", "finally", "async"))
+
+if TYPE_CHECKING:
+    import ast
+
+# AST node types that are strong indicators of real Python code.
+# Kept as names so ast is only imported once a file is actually parsed.
+_PYTHON_NODE_NAMES = (
+    "Import",
+    "ImportFrom",
+    "FunctionDef",
+    "AsyncFunctionDef",
+    "ClassDef",
+    "For",
+    "AsyncFor",
+    "While",
+    "With",
+    "AsyncWith",
+    "Try",
+    "Raise",
+    "Assert",
 )
 
 
-def _has_python_constructs(tree: ast.Module, threshold: int = 4) -> bool:
+def _has_python_constructs(tree: "ast.Module", threshold: int = 4) -> bool:
     """Walk the AST and check for node types that indicate real Python code.
 
     Simple expressions (tuples, names, constants) can appear in CSV, config files,
     and other non-Python text that happens to parse. Real Python code will contain
     imports, function/class definitions, control flow, etc.
     """
+    import ast  # noqa: PLC0415
+
+    node_types = tuple(getattr(ast, name) for name in _PYTHON_NODE_NAMES)
     count = 0
     for node in ast.walk(tree):
-        if isinstance(node, _PYTHON_NODE_TYPES):
+        if isinstance(node, node_types):
             count += 1
             if count >= threshold:
                 return True
     return False
 
 
+def is_python_shebang(head: bytes) -> bool:
+    first_line = head[: head.find(b"\n")] if b"\n" in head else head
+    return first_line.startswith(b"#!") and (b"python" in first_line or b"pypy" in first_line)
+
+
+def scan_tokens(text: str, complete: bool, threshold: int = 4) -> bool | None:
+    """Tokenize the start of a file and count evidence of Python code.
+
+    :param text: decoded start of the file, ending on a complete line
+    :param complete: text is the whole file
+    :param threshold: constructs a file without a .py extension needs
+    :return: True or False when settled, None when a full parse is needed
+    """
+    import tokenize  # noqa: PLC0415
+
+    skipped = (tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT)
+    evidence = keywords = 0
+    line: list = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if token.type == tokenize.ERRORTOKEN and not token.string.isspace():
+                return False
+            if token.type in skipped:
+                continue
+            if token.type != tokenize.NEWLINE:
+                if token.type == tokenize.NAME and token.string in _CONSTRUCT_KEYWORDS:
+                    keywords += 1
+                line.append(token)
+                continue
+            if len(line) < 2:
+                line = []
+                continue
+            first = line[0].string
+            if (
+                (first == "import" and line[1].type == tokenize.NAME)
+                or (first == "from" and any(part.string == "import" for part in line))
+                or (first in ("def", "class") and line[1].type == tokenize.NAME and line[-1].string == ":")
+                or (first == "@" and line[1].type == tokenize.NAME)
+                or (first in _BLOCK_KEYWORDS and line[-1].string == ":")
+            ):
+                evidence += 1
+                if evidence >= FAST_PATH_EVIDENCE:
+                    return True
+            line = []
+    except (tokenize.TokenError, SyntaxError):
+        if complete:
+            return False
+        # Otherwise cut by the end of the sample, likely inside a string or brackets
+    if complete and threshold and keywords < threshold:
+        return False
+    return None
+
+
+def read_for_parse(file, file_size: int) -> str | None:
+    if MAX_PARSE_BYTES is None or file_size <= MAX_PARSE_BYTES:
+        return file.read() if file_size <= MAX_FILE_SIZE else None
+    content = file.read(MAX_PARSE_BYTES)
+    # Stop before the last statement starting at column zero, it may be cut
+    for index in range(len(content) - 1, 0, -1):
+        if content[index - 1] == "\n" and not content[index].isspace() and content[index] != "#":
+            return content[: index - 1]
+    return None
+
+
 def main(file_path: os.PathLike | str, _, __) -> Match | None:
     file_size = os.path.getsize(file_path)
-    if file_size > 1_000_000:
-        return None
-    if not str(file_path).endswith(".py") and file_size < 100:
+    is_py = str(file_path).endswith(".py")
+    if not is_py and file_size < 100:
         return None
 
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-
-        tree = ast.parse(content)
+        with open(file_path, "rb") as file:
+            head = file.read(FAST_PATH_BYTES)
+            record_read("python_scanner", 0, len(head))
+            if is_python_shebang(head):
+                return Match(".py", "Python Script", "text/x-python", confidence=1.0)
 
-        if not str(file_path).endswith(".py"):
-            if not _has_python_constructs(tree):
+            complete = len(head) == file_size
+            if not complete:
+                head = head[: head.rfind(b"\n") + 1]
+            verdict = scan_tokens(head.decode("utf-8"), complete, threshold=0 if is_py else 4)
+            if verdict is False:
                 return None
+            if verdict is None:
+                file.seek(0)
+                content = read_for_parse(io.TextIOWrapper(file, encoding="utf-8"), file_size)
+                if content is None:
+                    return None
+                record_read("python_scanner", 0, len(content))
+
+                import ast  # noqa: PLC0415
+
+                tree = ast.parse(content)
+                if not is_py and not _has_python_constructs(tree):
+                    return None
 
     except (SyntaxError, UnicodeDecodeError, PermissionError, OSError):
         return None
@@ -0,0 +1,220 @@
+"""
+Walks the chunks of RIFF (WAV, AVI, WebP, ANI) and IFF (AIFF) files.
+
+The form type is read once and the chunk headers are walked through the
+head already read, descending into LIST chunks, with every size checked
+against the form and the form against the file length. Format details
+come from the small header chunks (fmt, avih, VP8, anih, COMM), chunk
+payloads past them are never read.
+"""
+
+import os
+import struct
+
+from puremagic.scanners.helpers import Match
+
+riff_match_bytes = b"RIFF"
+rifx_match_bytes = b"RIFX"
+rf64_match_bytes = b"RF64"
+form_match_bytes = b"FORM"
+form_ids = (riff_match_bytes, rifx_match_bytes, rf64_match_bytes, form_match_bytes)
+
+# Chunk headers walked at most, nested ones included
+MAX_CHUNKS = 64
+# Chunk ids are four printable ASCII characters
+PRINTABLE = bytes(range(0x20, 0x7F))
+
+WAVE_FORMATS = {
+    0x0001: "PCM",
+    0x0002: "MS ADPCM",
+    0x0003: "IEEE float",
+    0x0006: "A-law",
+    0x0007: "mu-law",
+    0x0011: "IMA ADPCM",
+    0x0031: "GSM 6.10",
+    0x0050: "MPEG",
+    0x0055: "MP3",
+    0x0161: "WMA",
+    0x2000: "AC-3",
+    0xF1AC: "FLAC",
+}
+
+# BITMAPINFOHEADER compression values below the FourCC codes
+BITMAP_COMPRESSIONS = {0: "RGB", 1: "RLE8", 2: "RLE4", 3: "BITFIELDS"}
+
+# Extensions used interchangeably, the file's own extension is kept within a family
+EXTENSION_FAMILIES = (
+    frozenset((".wav", ".wave")),
+    frozenset((".aif", ".aiff", ".aifc")),
+)
+
+
+def sample_details(bits: int, rate: float, channels: int) -> list[str]:
+    """Sample size, rate and channels in the style of the MPEG audio scanner, '16 bit 44.1Khz Stereo'"""
+    details = [f"{bits} bit"] if bits else []
+    details.append(f"{rate / 1000:g}Khz")
+    details.append({1: "Mono", 2: "Stereo"}.get(channels, f"{channels} channels"))
+    return details
+
+
+def wave_details(head: bytes, chunks: dict) -> list[str]:
+    data, size = chunks.get(b"fmt ", (0, 0))
+    if size < 16 or data + 16 > len(head):
+        return []
+    format_tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", head[data : data + 16])
+    if format_tag == 0xFFFE and size >= 40 and data + 26 <= len(head):
+        # WAVE_FORMAT_EXTENSIBLE, the sub format GUID starts with the real format tag
+        format_tag = struct.unpack("<H", head[data + 24 : data + 26])[0]
+    codec = WAVE_FORMATS.get(format_tag, f"format 0x{format_tag:04X}")
+    return [codec, *sample_details(bits, rate, channels)]
+
+
+def avi_details(head: bytes, chunks: dict) -> list[str]:
+    details = []
+    data, size = chunks.get(b"strf", (0, 0))
+    stream_type = head[chunks[b"strh"][0] : chunks[b"strh"][0] + 4] if b"strh" in chunks else b""
+    # The first stream's format, a BITMAPINFOHEADER for video, its compression is the codec
+    if stream_type == b"vids" and size >= 20 and data + 20 <= len(head):
+        codec = head[data + 16 : data + 20]
+        compression = struct.unpack("<I", codec)[0]
+        if compression in BITMAP_COMPRESSIONS:
+            details.append(BITMAP_COMPRESSIONS[compression])
+        elif codec.isalnum():
+            details.append(codec.decode("ascii"))
+    data, size = chunks.get(b"avih", (0, 0))
+    if size >= 40 and data + 40 <= len(head):
+        micro_seconds, *_, width, height = struct.unpack("<10I", head[data : data + 40])
+        details.append(f"{width}x{height}")
+        if micro_seconds:
+            details.append(f"{round(1_000_000 / micro_seconds, 2):g}fps")
+    return details
+
+
+def webp_details(head: bytes, chunks: dict) -> list[str]:
+    data = chunks.get(b"VP8 ", (0, 0))[0]
+    if data and head[data + 3 : data + 6] == b"\x9d\x01\x2a" and data + 10 <= len(head):
+        width, height = struct.unpack("<HH", head[data + 6 : data + 10])
+        return ["VP8 lossy", f"{width & 0x3FFF}x{height & 0x3FFF}"]
+    data = chunks.get(b"VP8L", (0, 0))[0]
+    if data and head[data : data + 1] == b"\x2f" and data + 5 <= len(head):
+        bits = struct.unpack("<I", head[data + 1 : data + 5])[0]
+        return ["VP8L lossless", f"{(bits & 0x3FFF) + 1}x{((bits >> 14) & 0x3FFF) + 1}"]
+    data = chunks.get(b"VP8X", (0, 0))[0]
+    if data and data + 10 <= len(head):
+        flags = head[data]
+        width = int.from_bytes(head[data + 4 : data + 7], "little") + 1
+        height = int.from_bytes(head[data + 7 : data + 10], "little") + 1
+        details = ["VP8X extended", f"{width}x{height}"]
+        if flags & 0x02:
+            details.append("animated")
+        if flags & 0x10:
+            details.append("alpha")
+        return details
+    return []
+
+
+def ani_details(head: bytes, chunks: dict) -> list[str]:
+    data, size = chunks.get(b"anih", (0, 0))
+    if size < 36 or data + 36 > len(head):
+        return []
+    return [f"{struct.unpack('<I', head[data + 4 : data + 8])[0]} frames"]
+
+
+def aiff_details(head: bytes, chunks: dict) -> list[str]:
+    data, size = chunks.get(b"COMM", (0, 0))
+    if size < 18 or data + 18 > len(head):
+        return []
+    channels, _, bits, exponent, mantissa = struct.unpack(">hIhHQ", head[data : data + 18])
+    # 80 bit extended float sample rate
+    rate = mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+    details = sample_details(bits, rate, channels)
+    if size >= 22 and data + 22 <= len(head):
+        # AIFC compression type, NONE for plain samples
+        compression = head[data + 18 : data + 22]
+        if compression != b"NONE" and compression.isascii():
+            details.insert(0, compression.decode("ascii").strip())
+    return details
+
+
+# form type: (extension, name, mime type, details)
+RIFF_FORMS = {
+    b"WAVE": (".wav", "Waveform Audio File Format", "audio/wav", wave_details),
+    b"AVI ": (".avi", "Audio Video Interleave", "video/avi", avi_details),
+    b"WEBP": (".webp", "WebP graphics file format", "image/webp", webp_details),
+    b"ACON": (".ani", "Windows animated cursor", "application/x-navi-animation", ani_details),
+}
+IFF_FORMS = {
+    b"AIFF": (".aiff", "Audio Interchange File Format", "audio/x-aiff", aiff_details),
+    b"AIFC": (".aifc", "Audio Interchange File Format (Compressed)", "audio/x-aiff", aiff_details),
+}
+
+
+def walk_chunks(
+    head: bytes, form_end: int, big_endian: bool, large_sizes: dict[bytes, int] | None = None
+) -> tuple[dict[bytes, tuple[int, int]], bool]:
+    """Walk the chunk headers after the form type as far as head reaches, descending into LIST chunks.
+
+    :param large_sizes: 64-bit sizes from an RF64 ds64 chunk, for the chunks whose size field is all ones
+    :return: ({chunk id: (data offset, size)} for the first chunk of each id, every chunk header was valid)
+    """
+    chunks = {}
+    size_format = ">I" if big_endian else "<I"
+    # (offset, end of the enclosing form or LIST), the top is walked first
+    stack = [(12, form_end)]
+    walked = 0
+    while stack and walked < MAX_CHUNKS:
+        offset, end = stack.pop()
+        if offset + 8 > min(end, len(head)):
+            continue
+        chunk_id = head[offset : offset + 4]
+        size = struct.unpack(size_format, head[offset + 4 : offset + 8])[0]
+        if size == 0xFFFFFFFF and large_sizes and chunk_id in large_sizes:
+            size = large_sizes[chunk_id]
+        data = offset + 8
+        if chunk_id.translate(None, PRINTABLE) or data + size > end:
+            return chunks, False
+        walked += 1
+        chunks.setdefault(chunk_id, (data, size))
+        # Chunks are padded to an even length
+        stack.append((data + size + (size & 1), end))
+        if chunk_id == b"LIST" and size >= 4:
+            stack.append((data + 4, data + size))
+    return chunks, True
+
+
+def main(file_path: os.PathLike | str, head: bytes, _) -> Match | None:
+    if len(head) < 12:
+        return None
+    form_id, form_type = head[:4], head[8:12]
+    forms = IFF_FORMS if form_id == form_match_bytes else RIFF_FORMS
+    if form_type not in forms or form_id not in form_ids:
+        return None
+    extension, name, mime_type, details_of = forms[form_type]
+    big_endian = form_id in (rifx_match_bytes, form_match_bytes)
+
+    file_size = os.path.getsize(file_path)
+    form_size = struct.unpack(">I" if big_endian else "<I", head[4:8])[0]
+    form_end, large_sizes = form_size + 8, None
+    if form_id == rf64_match_bytes:
+        # RF64 keeps the real RIFF and data sizes in the ds64 chunk leading the form, their fields are all ones
+        if head[12:16] != b"ds64" or len(head) < 36:
+            return Match(extension, name, mime_type, confidence=0.7)
+        riff_size, data_size = struct.unpack("<QQ", head[20:36])
+        form_end, large_sizes = riff_size + 8, {b"data": data_size}
+    chunks, valid = walk_chunks(head, form_end, big_endian, large_sizes)
+
+    details = details_of(head, chunks) if valid else []
+    if form_end > file_size:
+        details.append("truncated")
+    if details:
+        name = f"{name} [{' '.join(details)}]"
+
+    own_extension = os.path.splitext(str(file_path))[1].lower()
+    if any(extension in family and own_extension in family for family in EXTENSION_FAMILIES):
+        extension = own_extension
+    confidence = 1.0
+    if not valid:
+        confidence = 0.7
+    elif form_end > file_size:
+        confidence = 0.8
+    return Match(extension, name, mime_type, confidence=confidence)
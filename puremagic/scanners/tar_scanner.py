@@ -0,0 +1,158 @@
+"""
+Walks the headers of a TAR archive without extracting it.
+
+Not part of the regular deep scan, call ``members(path)`` to inventory an
+archive. Only the 512 byte headers are read, seeking from one to the next,
+member data is only touched when ``identify=True`` and then just its start
+and end for the signature tables.
+"""
+
+import os
+from collections import namedtuple
+
+from puremagic.stats import record_read
+
+BLOCK_SIZE = 512
+ZERO_BLOCK = bytes(BLOCK_SIZE)
+# GNU long names and pax headers larger than this are treated as corrupt
+MAX_EXTENDED_HEADER = 1024 * 1024
+
+# Bytes at or above 0x80, for the signed checksum some old tar implementations wrote
+HIGH_BYTES = bytes(range(0x80, 0x100))
+
+MEMBER_TYPES = {
+    b"0": "file",
+    b"\x00": "file",
+    b"7": "file",
+    b"1": "hard link",
+    b"2": "symbolic link",
+    b"3": "character device",
+    b"4": "block device",
+    b"5": "directory",
+    b"6": "fifo",
+    b"S": "sparse file",
+}
+
+TarMember = namedtuple("TarMember", ("name", "type", "size", "offset", "matches"))
+
+
+def number(field: bytes) -> int:
+    """Numeric header field, octal or GNU base-256 for values that do not fit"""
+    if field[:1] and field[0] & 0x80:
+        return int.from_bytes(field[1:], "big")
+    return int(field.strip(b" \x00") or b"0", 8)
+
+
+def checksum_ok(block: bytes) -> bool:
+    """The header checksum, summed over the block with its own field taken as spaces"""
+    try:
+        stored = number(block[148:156])
+    except ValueError:
+        return False
+    unsigned = sum(block) - sum(block[148:156]) + 8 * ord(" ")
+    if stored == unsigned:
+        return True
+    # Signed bytes, each byte of 0x80 and above counts 256 less
+    high = len(block) - len(block.translate(None, HIGH_BYTES))
+    high -= 8 - len(block[148:156].translate(None, HIGH_BYTES))
+    return stored == unsigned - 256 * high
+
+
+def pax_headers(data: bytes) -> dict[str, str]:
+    """Parse '<length> <key>=<value>\\n' pax extended header records"""
+    headers = {}
+    position = 0
+    while position < len(data):
+        space = data.find(b" ", position)
+        if space < 0:
+            break
+        try:
+            length = int(data[position:space])
+        except ValueError:
+            break
+        if length <= space - position:
+            break
+        key, _, value = data[space + 1 : position + length - 1].partition(b"=")
+        headers[key.decode("utf-8", "replace")] = value.decode("utf-8", "replace")
+        position += length
+    return headers
+
+
+def identify_data(file, offset: int, size: int, name: str) -> list:
+    """Run the signature tables over the start and end of a member's data"""
+    from puremagic.main import ext_from_filename, identify_all, max_foot, max_head  # noqa: PLC0415
+
+    file.seek(offset)
+    head = file.read(min(size, max_head))
+    record_read("tar_scanner", offset, len(head))
+    foot_size = min(size, max_foot)
+    if size <= len(head):
+        foot = head[-foot_size:]
+    else:
+        file.seek(offset + size - foot_size)
+        foot = file.read(foot_size)
+        record_read("tar_scanner", offset + size - foot_size, len(foot))
+    return identify_all(head, foot, ext_from_filename(name)) if head else []
+
+
+def members(file_path: os.PathLike | str, identify: bool = False):
+    """Lazily yield a TarMember for each member of the archive.
+
+    offset is where the member's data starts, matches holds the identify_all
+    results for that data or None when it was not identified.
+    Raises ValueError on the first header with a bad checksum, which for the
+    first header means the file is not a TAR archive.
+
+    :param file_path: path to the archive
+    :param identify: also identify each regular file from its first and last bytes
+    """
+    with open(file_path, "rb") as file:
+        offset = 0
+        # Set by GNU long name (L) and pax (x) headers for the member that follows
+        long_name: str | None = None
+        extended: dict[str, str] = {}
+        while True:
+            file.seek(offset)
+            block = file.read(BLOCK_SIZE)
+            record_read("tar_scanner", offset, len(block))
+            if len(block) < BLOCK_SIZE or block == ZERO_BLOCK:
+                return
+            if not checksum_ok(block):
+                raise ValueError(f"Bad TAR header checksum at offset {offset}")
+            size = number(block[124:136])
+            member_type = block[156:157]
+            data_offset = offset + BLOCK_SIZE
+
+            if member_type in (b"L", b"K", b"x", b"g"):
+                if size > MAX_EXTENDED_HEADER:
+                    raise ValueError(f"TAR extended header at offset {offset} is too large")
+                data = file.read(size)
+                record_read("tar_scanner", data_offset, len(data))
+                if member_type == b"L":
+                    long_name = data.rstrip(b"\x00").decode("utf-8", "replace")
+                elif member_type == b"x":
+                    extended = pax_headers(data)
+                # Long link names (K) and global pax headers (g) change nothing reported here
+                offset = data_offset + -(-size // BLOCK_SIZE) * BLOCK_SIZE
+                continue
+
+            if "size" in extended:
+                size = int(extended["size"])
+            name = extended.get("path") or long_name
+            if name is None:
+                name = block[:100].split(b"\x00", 1)[0].decode("utf-8", "replace")
+                prefix = block[345:500].split(b"\x00", 1)[0]
+                # POSIX ustar only, GNU tar keeps access and change times there
+                if block[257:263] == b"ustar\x00" and prefix:
+                    name = f"{prefix.decode('utf-8', 'replace')}/{name}"
+            long_name, extended = None, {}
+            kind = MEMBER_TYPES.get(member_type, "other")
+
+            matches = None
+            if identify and kind == "file" and size:
+                matches = identify_data(file, data_offset, size, name)
+            yield TarMember(name=name, type=kind, size=size, offset=data_offset, matches=matches)
+            # Links, devices, fifos and directories carry no data whatever their size field says
+            if member_type in (b"1", b"2", b"3", b"4", b"5", b"6"):
+                size = 0
+            offset = data_offset + -(-size // BLOCK_SIZE) * BLOCK_SIZE
@@ -1,12 +1,25 @@
+import codecs
 import csv
 import re
 import os
+from collections import Counter
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
-crlf_pattern = re.compile(r"\r\n")
-lf_pattern = re.compile(r"(?<!\r)\n")
-cr_pattern = re.compile(r"\r(?!\n)")
+# Classification only looks at the start of the text, so a million tiny lines cost no more
+# than a few thousand. csv.Sniffer is quadratic on long lines and gets a smaller sample still.
+TEXT_SAMPLE_SIZE = 64 * 1024
+CSV_SNIFF_SIZE = 2048
+
+# Bytes that do not appear in text: C0 controls other than BEL, BS, whitespace and ESC, plus DEL.
+# Data is binary when it holds a NUL or more than MAX_BINARY_RATIO of these.
+BINARY_BYTES = bytes((*range(0x00, 0x07), *range(0x0E, 0x1B), *range(0x1C, 0x20), 0x7F))
+BINARY_CHARS = dict.fromkeys(BINARY_BYTES)
+MAX_BINARY_RATIO = 0.01
+
+CSV_DELIMITERS = (",", ";", "\t", "|", ":")
+DELIMITER_NAMES = {",": "comma", ";": "semicolon", "\t": "tab", "|": "pipe", ":": "colon"}
 
 # Common RFC 2822 / MIME email headers (bytes pattern for use on raw head)
 EMAIL_HEADERS = re.compile(
@@ -41,62 +54,127 @@ def decode_any(unicode: bytes) -> tuple[str, str]:
     raise TypeError("No encoding found")
 
 
-def csv_check(file_path, text) -> Match | None:
+def cut_to_character(data: bytes) -> bytes:
+    """Drop a character split by the end of a sample, so it still decodes"""
+    if data[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        data = data[: len(data) & ~1]
+        # A high surrogate is the first half of a pair
+        unit = int.from_bytes(data[-2:], "little" if data[:2] == b"\xff\xfe" else "big")
+        return data[:-2] if 0xD800 <= unit < 0xDC00 else data
+    # Step back over UTF-8 continuation bytes to the lead byte of the last sequence
+    lead = len(data) - 1
+    while lead > len(data) - 4 and 0x80 <= data[lead] < 0xC0:
+        lead -= 1
+    if lead >= 0 and data[lead] >= 0xC0:
+        length = 2 if data[lead] < 0xE0 else 3 if data[lead] < 0xF0 else 4
+        if lead + length > len(data):
+            return data[:lead]
+    return data
+
+
+def is_text(data: bytes | bytearray, sample_size: int = TEXT_SAMPLE_SIZE) -> bool:
+    """Cheap byte class histogram over the start of data, False when it is clearly binary.
+
+    UTF-16 with a byte order mark is judged on its decoded characters. Passing is not
+    a guarantee the data decodes, only that it is worth trying.
+    """
+    sample = bytes(data[:sample_size])
+    if sample[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        decoder = codecs.getincrementaldecoder("utf-16-le" if sample[:2] == b"\xff\xfe" else "utf-16-be")()
+        try:
+            text = decoder.decode(sample[2:])
+        except UnicodeDecodeError:
+            return False
+        return len(text) - len(text.translate(BINARY_CHARS)) <= len(text) * MAX_BINARY_RATIO
+    if b"\x00" in sample:
+        return False
+    return len(sample) - len(sample.translate(None, BINARY_BYTES)) <= len(sample) * MAX_BINARY_RATIO
+
+
+class TextSample:
+    """Bounded start of the text, split into lines once and shared by every check.
+
+    Line terminators are counted with str.count and delimiter columns are only
+    built for delimiters actually present, keeping the per line Python work small.
+    """
+
+    __slots__ = ("text", "line_count", "lines", "crlf", "lf", "cr", "_columns")
+
+    def __init__(self, text: str, size: int = TEXT_SAMPLE_SIZE, truncated: bool = False):
+        self.text = text[:size]
+        lines = self.text.splitlines()
+        if (truncated or len(text) > size) and len(lines) > 1:
+            lines.pop()  # Remove the line cut by the sample
+        self.line_count = len(lines)
+        self.lines = [line for line in lines if line.strip()]
+        # Lone LF and CR are whatever is not part of a CRLF pair
+        self.crlf = self.text.count("\r\n")
+        self.lf = self.text.count("\n") - self.crlf
+        self.cr = self.text.count("\r") - self.crlf
+        self._columns: dict[str, list[int]] = {}
+
+    def delimiter_counts(self, delimiter: str) -> list[int]:
+        """How often delimiter appears on each non blank line"""
+        if delimiter not in self._columns:
+            if delimiter in self.text:
+                self._columns[delimiter] = [line.count(delimiter) for line in self.lines]
+            else:
+                self._columns[delimiter] = [0] * len(self.lines)
+        return self._columns[delimiter]
+
+
+def csv_check(file_path, text, sample: TextSample | None = None) -> Match | None:
     """
     Validate if content appears to be CSV format.
     """
-    if not text or len(text.strip()) == 0:
+    if not text or text.isspace():
         return None
 
-    # Split the text into lines
-    lines = text.splitlines()
-    if len(lines) < 2:  # Need at least 2 lines to detect a pattern
+    sample = sample or TextSample(text)
+    if sample.line_count < 2:  # Need at least 2 lines to detect a pattern
         # If filename ends with .csv, give it the benefit of the doubt
         if str(file_path).lower().endswith(".csv"):
             return Match(".csv", "Comma-separated values (single line)", "text/csv", confidence=0.7)
         return None
 
-    # Remove any blank lines
-    lines = [line for line in lines if line.strip()]
+    lines = sample.lines
     if len(lines) < 2:
         return None
-    if len(lines) > 100:
-        lines = lines[:-1]  # Remove last line in case it's been truncated
+    # Ignore the last line in case it's been truncated
+    line_total = len(lines) - 1 if len(lines) > 100 else len(lines)
 
     # Try to determine the delimiter by checking common ones
-    potential_delimiters = [",", ";", "\t", "|", ":"]
     delimiter_scores = {}
-
-    for delimiter in potential_delimiters:
+    for delimiter in CSV_DELIMITERS:
         # Skip if delimiter isn't in the text
-        if delimiter not in text:
+        if delimiter not in sample.text:
             continue
 
-        # Count fields in each line using this delimiter
-        field_counts = [len(line.split(delimiter)) for line in lines]
+        # Check if most lines have the same number of fields, ties go to the fewest fields
+        occurrences = Counter(sample.delimiter_counts(delimiter)[:line_total])
+        most_common = max(sorted(occurrences), key=occurrences.__getitem__)
+        consistency = occurrences[most_common] / line_total
 
-        # Calculate consistency score (higher is better)
-        if len(field_counts) >= 2:
-            # Check if most lines have the same number of fields
-            most_common_count = max(set(field_counts), key=field_counts.count)
-            matching_lines = sum(1 for count in field_counts if count == most_common_count)
-            consistency = matching_lines / len(field_counts)
-
-            # More than one field required
-            if most_common_count > 1:
-                # Score based on consistency and number of fields
-                delimiter_scores[delimiter] = (consistency, most_common_count)
+        # More than one field required
+        if most_common > 0:
+            # Score based on consistency and number of fields
+            delimiter_scores[delimiter] = (consistency, most_common + 1)
 
     # Try using csv module's Sniffer as a fallback
     csv_sniffer_result = None
-    try:
-        dialect = csv.Sniffer().sniff(text, delimiters="".join(potential_delimiters))
-        csv_sniffer_result = dialect.delimiter
-    except Exception:
-        pass
+    sniff_sample = sample.text[:CSV_SNIFF_SIZE]
+    if len(text) > CSV_SNIFF_SIZE and (last_line := sniff_sample.rfind("\n")) > 0:
+        sniff_sample = sniff_sample[:last_line]
+    # Sniffer can only succeed when one of the delimiters is in its sample
+    if any(delimiter in sniff_sample for delimiter in CSV_DELIMITERS):
+        try:
+            dialect = csv.Sniffer().sniff(sniff_sample, delimiters="".join(CSV_DELIMITERS))
+            csv_sniffer_result = dialect.delimiter
+        except Exception:
+            pass
 
     # If csv.Sniffer found a delimiter, give it priority
-    if csv_sniffer_result and csv_sniffer_result in potential_delimiters:
+    if csv_sniffer_result and csv_sniffer_result in CSV_DELIMITERS:
         best_delimiter = csv_sniffer_result
         confidence = 0.95
     elif delimiter_scores:
@@ -110,12 +188,9 @@ def csv_check(file_path, text) -> Match | None:
         # No clear delimiter pattern found
         return None
 
-    delimiter_counts = []
-    for line in lines:
-        delim_count = line.count(best_delimiter)
-        if delim_count == 0:
-            return None
-        delimiter_counts.append(delim_count)
+    delimiter_counts = sample.delimiter_counts(best_delimiter)[:line_total]
+    if 0 in delimiter_counts:
+        return None
 
     average = sum(delimiter_counts) / len(delimiter_counts)
 
@@ -131,10 +206,7 @@ def csv_check(file_path, text) -> Match | None:
         confidence = min(1.0, confidence + 0.1)
 
     # Return match with appropriate confidence
-    delimiter_name = {",": "comma", ";": "semicolon", "\t": "tab", "|": "pipe", ":": "colon"}.get(
-        best_delimiter, best_delimiter
-    )
-
+    delimiter_name = DELIMITER_NAMES.get(best_delimiter, best_delimiter)
     return Match(".csv", f"{delimiter_name}-separated values", "text/csv", confidence=confidence)
 
 
@@ -152,68 +224,98 @@ def eml_check(head: bytes) -> Match | None:
     return Match(".eml", "RFC 2822 Email Message", "message/rfc822", confidence=1.0)
 
 
-def dynamic_checks(text, file_path) -> Match | None:
-    text = text.strip()
-    if text.startswith("$MeshFormat"):
-        return file_ending_match(".msh", "Gmsh mesh format", "text/plain", file_path)
-    if "GenePix ArrayList" in text[:256]:
-        return file_ending_match(".gal", "Gal GenePix ArrayList", "text/plain", file_path)
-    if text.startswith("##gff-version"):
-        return file_ending_match(".gff", "GFF3", "text/plain", file_path)
-    if "GenePix Results" in text[:256]:
-        return file_ending_match(".gpr", "GenePix Results", "text/plain", file_path)
-    if "mzTab-version" in text[:256]:
-        if "mzTab-version	2" in text[:256]:
-            return file_ending_match(".mztab2", "mzTab version 2", "text/plain", file_path)
-        return file_ending_match(".mztab", "mzTab", "text/plain", file_path)
-    if text.startswith("***tesr"):
-        return file_ending_match(".tesr", "Neper tesr format", "text/plain", file_path)
-    if text.startswith("***tess"):
-        return file_ending_match(".tess", "Neper tess format", "text/plain", file_path)
-    if text.startswith("# PEFF "):
-        # consider adding r"# PEFF \d+.\d+"
-        return file_ending_match(".peff", "PSI Extended FASTA Format", "text/plain", file_path)
-    if text.startswith("ply") and "format ascii" in text[:128]:
-        return file_ending_match(".plyascii", "PLY mesh format", "text/plain", file_path)
-    if text.startswith("RBT_PARAMETER_FILE_V"):
-        return file_ending_match(".prm", "prm", "text/plain", file_path)
-    if "# vtk DataFile" in text[:256]:
-        return file_ending_match(".vtkascii", "vtk", "text/plain", file_path)
-    if "<VTKFile " in text[:256]:
-        return file_ending_match(".vtpascii", "vtpascii", "text/plain", file_path)
-    if text.startswith("# CMAP File "):
-        return file_ending_match(".cmap", "cmap", "text/plain", file_path)
-    if text.startswith("##fileformat=VCF"):
-        return file_ending_match(".vcf", "Variant Call Format", "text/x-vcard", file_path)
-    if text.startswith("@HD\t") or text.startswith("@SQ\t"):
-        return file_ending_match(".sam", "Sequence Alignment Map", "text/x-sam", file_path)
-    if text.startswith("IQ-TREE"):
-        return file_ending_match(".iqtree", "IQ-TREE phylogenetic analysis", "text/plain", file_path)
+# Formats recognised by how the (stripped) text starts or what is near its start.
+# Rules are (order, marker, extension, name, mime type), the lowest order matching wins,
+# prefix rules are keyed by their first two characters so only a couple are ever compared.
+PREFIX_RULES: dict[str, tuple[tuple[int, str, str, str, str], ...]] = {}
+for _rule in (
+    (0, "$MeshFormat", ".msh", "Gmsh mesh format", "text/plain"),
+    (2, "##gff-version", ".gff", "GFF3", "text/plain"),
+    (5, "***tesr", ".tesr", "Neper tesr format", "text/plain"),
+    (6, "***tess", ".tess", "Neper tess format", "text/plain"),
+    # consider adding r"# PEFF \d+.\d+"
+    (7, "# PEFF ", ".peff", "PSI Extended FASTA Format", "text/plain"),
+    (8, "ply", ".plyascii", "PLY mesh format", "text/plain"),
+    (9, "RBT_PARAMETER_FILE_V", ".prm", "prm", "text/plain"),
+    (12, "# CMAP File ", ".cmap", "cmap", "text/plain"),
+    (13, "##fileformat=VCF", ".vcf", "Variant Call Format", "text/x-vcard"),
+    (14, "@HD\t", ".sam", "Sequence Alignment Map", "text/x-sam"),
+    (14, "@SQ\t", ".sam", "Sequence Alignment Map", "text/x-sam"),
+    (15, "IQ-TREE", ".iqtree", "IQ-TREE phylogenetic analysis", "text/plain"),
+):
+    PREFIX_RULES[_rule[1][:2]] = PREFIX_RULES.get(_rule[1][:2], ()) + (_rule,)
+del _rule
+
+# Searched for within the first 256 characters, in order
+CONTAINS_RULES = (
+    (1, "GenePix ArrayList", ".gal", "Gal GenePix ArrayList", "text/plain"),
+    (3, "GenePix Results", ".gpr", "GenePix Results", "text/plain"),
+    (4, "mzTab-version\t2", ".mztab2", "mzTab version 2", "text/plain"),
+    (4, "mzTab-version", ".mztab", "mzTab", "text/plain"),
+    (10, "# vtk DataFile", ".vtkascii", "vtk", "text/plain"),
+    (11, "<VTKFile ", ".vtpascii", "vtpascii", "text/plain"),
+)
 
+first_visible = re.compile(r"\S")
+
+
+def dynamic_checks(text, file_path) -> Match | None:
+    # Only the start of the stripped text is ever looked at, avoid copying the rest
+    if not (visible := first_visible.search(text)):
+        return None
+    start = visible.start()
+    head = text[start : start + 512]
+    if not first_visible.search(text, start + 512):
+        head = head.rstrip()
+
+    rule = None
+    for candidate in PREFIX_RULES.get(head[:2], ()):
+        if head.startswith(candidate[1]) and (candidate[1] != "ply" or "format ascii" in head[:128]):
+            rule = candidate
+            break
+    near_start = head[:256]
+    for candidate in CONTAINS_RULES:
+        if rule and candidate[0] > rule[0]:
+            break
+        if candidate[1] in near_start:
+            rule = candidate
+            break
+    if rule:
+        return file_ending_match(rule[2], rule[3], rule[4], file_path)
     return None
 
 
-def main(file_path: os.PathLike | str, _, __) -> Match | None:
+def main(file_path: os.PathLike | str, head: bytes | None, _) -> Match | None:
+    # Binary blobs are turned away on the head already read, before the sample is read and decoded
+    if head is not None and len(head) >= 8 and not is_text(head):
+        return Match("", "data", "application/octet-stream", confidence=0.5)
+
+    # Only the sample is classified, one byte more tells whether the file goes on past it
     with open(file_path, "rb") as file:
-        head = file.read(1_000_000)
+        data = file.read(TEXT_SAMPLE_SIZE + 1)
+    record_read("text_scanner", 0, len(data))
+    truncated = len(data) > TEXT_SAMPLE_SIZE
+    if truncated:
+        data = cut_to_character(data[:TEXT_SAMPLE_SIZE])
 
-    if len(head) < 8:
+    if len(data) < 8:
         return Match("", "very short file", "application/octet-stream", confidence=0.5)
+    if head is None and not is_text(data):
+        return Match("", "data", "application/octet-stream", confidence=0.5)
 
     try:
-        text, encoding = decode_any(head)
+        text, encoding = decode_any(data)
     except TypeError:
         return Match("", "data", "application/octet-stream", confidence=0.5)
 
-    if csv_match := csv_check(file_path, text):
+    sample = TextSample(text, truncated=truncated)
+    if csv_match := csv_check(file_path, text, sample):
         return csv_match
 
     if obscure_match := dynamic_checks(text, file_path):
         return obscure_match
 
-    crlf = len(crlf_pattern.findall(text))
-    lf = len(lf_pattern.findall(text))
-    cr = len(cr_pattern.findall(text))
+    crlf, lf, cr = sample.crlf, sample.lf, sample.cr
     if crlf + lf + cr == 0:
         return Match(".txt", f"{encoding} text", "text/plain", confidence=0.9)
 
@@ -0,0 +1,122 @@
+"""
+Identifies XML formats (SVG, RSS/Atom, XHTML, plist, KML, GPX, draw.io, ...) by their root element.
+
+The head already read is fed to an ``xml.parsers.expat`` parser in small chunks
+until the first start element, whose name and namespace are looked up in a
+table. The rest of the file is never read or parsed. Entity declarations are
+limited in number and length and may not refer to other entities, so nested
+entity expansion ("billion laughs") is refused, and external entities are
+never fetched.
+"""
+
+from xml.parsers import expat
+
+from puremagic.scanners.helpers import Match
+
+UTF8_BOM = b"\xef\xbb\xbf"
+UTF16_BOMS = (b"\xff\xfe", b"\xfe\xff")
+
+# Bytes handed to the parser per call, it stops at the first chunk holding the root element
+CHUNK_SIZE = 4096
+# Entity declarations accepted before the root element, and the longest replacement text
+MAX_ENTITIES = 64
+MAX_ENTITY_LENGTH = 1024
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+RSS1_NAMESPACE = "http://purl.org/rss/1.0/"
+RDF_NAMESPACE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+_SVG = (".svg", "Scalable Vector Graphics Image", "image/svg+xml")
+_KML = (".kml", "Keyhole Markup Language", "application/vnd.google-earth.kml+xml")
+_GPX = (".gpx", "GPS Exchange Format", "application/gpx+xml")
+_RSS = (".rss", "RSS feed", "application/rss+xml")
+
+# (namespace, root element): (extension, name, mime type)
+ROOT_ELEMENTS = {
+    (SVG_NAMESPACE, "svg"): _SVG,
+    ("http://www.w3.org/1999/xhtml", "html"): (".xhtml", "XHTML document", "application/xhtml+xml"),
+    ("http://www.w3.org/2005/Atom", "feed"): (".atom", "Atom feed", "application/atom+xml"),
+    ("http://www.opengis.net/kml/2.2", "kml"): _KML,
+    ("http://earth.google.com/kml/2.0", "kml"): _KML,
+    ("http://earth.google.com/kml/2.1", "kml"): _KML,
+    ("http://earth.google.com/kml/2.2", "kml"): _KML,
+    ("http://www.topografix.com/GPX/1/0", "gpx"): _GPX,
+    ("http://www.topografix.com/GPX/1/1", "gpx"): _GPX,
+    ("http://www.gribuser.ru/xml/fictionbook/2.0", "FictionBook"): (
+        ".fb2",
+        "FictionBook 2.0 eBook file",
+        "application/x-fictionbook+xml",
+    ),
+}
+# Root elements recognised in any namespace (or none), at a lower confidence
+LOCAL_ROOT_ELEMENTS = {
+    "svg": _SVG,
+    "rss": _RSS,
+    "plist": (".plist", "Apple property list", "application/x-plist"),
+    "kml": _KML,
+    "gpx": _GPX,
+    "mxfile": (".drawio", "draw.io diagram", "application/vnd.jgraph.mxfile"),
+}
+
+
+class _RootFound(Exception):
+    """Raised from the start element handler to stop the parser at the root element"""
+
+
+class _EntityRefused(Exception):
+    """Raised for entity declarations that could expand out of proportion"""
+
+
+def root_element(head: bytes) -> tuple[str, str, set[str]] | None:
+    """The namespace and name of the root element and the namespaces declared on it.
+
+    :return: (namespace, name, namespace URIs declared on the root), None if the head
+        is not well formed up to the root element or does not reach it
+    """
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_NEVER)
+    declared = set()
+    entities = 0
+
+    def entity_declaration(_name, _is_parameter, value, *_):
+        nonlocal entities
+        entities += 1
+        if entities > MAX_ENTITIES or (value is not None and (len(value) > MAX_ENTITY_LENGTH or "&" in value)):
+            raise _EntityRefused
+
+    def start_namespace(_prefix, uri):
+        declared.add(uri)
+
+    def start_element(name, _attributes):
+        raise _RootFound(name)
+
+    parser.EntityDeclHandler = entity_declaration
+    parser.StartNamespaceDeclHandler = start_namespace
+    parser.StartElementHandler = start_element
+    try:
+        for offset in range(0, len(head), CHUNK_SIZE):
+            parser.Parse(head[offset : offset + CHUNK_SIZE], False)
+    except _RootFound as found:
+        namespace, _, name = found.args[0].rpartition(" ")
+        return namespace, name, declared
+    except (expat.ExpatError, _EntityRefused, ValueError):
+        return None
+    return None
+
+
+def main(_, head: bytes, __) -> Match | None:
+    start = head[3:] if head.startswith(UTF8_BOM) else head
+    # Anything but markup is turned away before a parser is created
+    if head[:2] not in UTF16_BOMS and start.lstrip()[:1] != b"<":
+        return None
+    if not (found := root_element(head)):
+        return None
+    namespace, name, declared = found
+
+    if (namespace, name) in ROOT_ELEMENTS:
+        return Match(*ROOT_ELEMENTS[(namespace, name)], confidence=1.0)
+    if namespace == RDF_NAMESPACE and name == "RDF" and RSS1_NAMESPACE in declared:
+        return Match(*_RSS, confidence=1.0)
+    if name in LOCAL_ROOT_ELEMENTS:
+        return Match(*LOCAL_ROOT_ELEMENTS[name], confidence=0.9)
+    return None
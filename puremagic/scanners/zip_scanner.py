@@ -1,16 +1,282 @@
-import re
+import io
 import os
-from zipfile import ZipFile
+import re
+import struct
+import zlib
+from collections import namedtuple
+from collections.abc import Collection
 
 from puremagic.scanners.helpers import Match
+from puremagic.stats import record_read
 
 match_bytes = b"PK\x03\x04"
 office_macro_enable_match = b"macroEnabled"
 
 application_re = re.compile(b"<Application>(.*)</Application>")
 
-
-def open_office_check(internal_files: list[str], zip_file: ZipFile, extension: str | None = None) -> Match | None:
+# Member name patterns only recognisable by scanning every name, matched in a single pass
+member_markers = re.compile(
+    r"(?P<wheel>[^/]+\.dist-info/WHEEL)"
+    r"|(?P<nuspec>[^/]+\.nuspec)"
+    r"|(?P<ios_app>Payload/[^/]+\.app/.*)"
+    r"|(?P<fixed_document_sequence>.*\.fdseq)"
+    r"|(?P<kml>[^/]+\.kml)"
+)
+
+# Containers told apart by their members alone, the first whose requirements are all met wins.
+# Requirements are member_markers group names or exact member names.
+CONTAINER_TYPES = (
+    (("wheel",), ".whl", "Python Wheel Package", "application/x-wheel+zip"),
+    (("nuspec", "[Content_Types].xml"), ".nupkg", "NuGet Package", "application/x-nupkg"),
+    (("extension.vsixmanifest", "[Content_Types].xml"), ".vsix", "Visual Studio Extension", "application/vsix"),
+    (("ios_app",), ".ipa", "iOS Application Archive", "application/x-ios-app"),
+    (("kml",), ".kmz", "Keyhole Markup Language Zip", "application/vnd.google-earth.kmz"),
+)
+
+# Members are decompressed at most this far, enough for every content check
+MAX_MEMBER_READ = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+END_RECORD = struct.Struct("<4s8x2IH")
+ZIP64_LOCATOR = struct.Struct("<4s4xQ4x")
+ZIP64_END_RECORD = struct.Struct("<4s36x2Q")
+CENTRAL_ENTRY = struct.Struct("<4s4x2H8x2I3H8xI")
+LOCAL_HEADER = struct.Struct("<4s22x2H")
+
+END_RECORD_SIGNATURE = b"PK\x05\x06"
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_END_RECORD_SIGNATURE = b"PK\x06\x06"
+CENTRAL_ENTRY_SIGNATURE = b"PK\x01\x02"
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+ZipMember = namedtuple("ZipMember", ("name", "size", "depth", "matches"))
+
+
+class CentralDirectory:
+    """Member names of a ZIP archive, read straight from its central directory.
+
+    Only the names and the entry fields needed to find their data are kept,
+    members are decompressed on demand by ``read``. Handles Zip64 and archives
+    with data prepended to them, such as self extracting archives.
+    """
+
+    __slots__ = ("file", "names", "start", "prefix")
+
+    def __init__(self, file, foot: bytes = b""):
+        self.file = file
+        # Member name to (flags, compression method, compressed size, size, local header offset)
+        self.names: dict[str, tuple[int, int, int, int, int]] = {}
+        self.start = self.prefix = 0
+        self._read_names(self._locate(foot))
+
+    def _locate(self, foot: bytes) -> int:
+        """Find the central directory from the end record, returns its size"""
+        file = self.file
+        file_size = file.seek(0, os.SEEK_END)
+        position = foot.rfind(END_RECORD_SIGNATURE, 0, len(foot) - END_RECORD.size + 4)
+        if position < 0 or len(foot) - position != END_RECORD.size + END_RECORD.unpack_from(foot, position)[3]:
+            # Not at the end of the foot, there is an archive comment of up to 64 KiB after it
+            tail_size = min(file_size, END_RECORD.size + 0xFFFF)
+            file.seek(file_size - tail_size)
+            foot = file.read(tail_size)
+            record_read("zip_scanner", file_size - tail_size, tail_size)
+            position = foot.rfind(END_RECORD_SIGNATURE, 0, len(foot) - END_RECORD.size + 4)
+            if position < 0:
+                raise ValueError("ZIP end of central directory record not found")
+        foot_offset = file_size - len(foot)
+        end_offset = foot_offset + position
+        _, size, start, _ = END_RECORD.unpack_from(foot, position)
+
+        # Zip64 archives have a locator just before the end record, pointing to the Zip64 end record
+        # holding the real values. An extensible data sector may sit between that record and the locator.
+        locator_offset = end_offset - ZIP64_LOCATOR.size
+        if locator_offset >= 0:
+            signature, record_offset = ZIP64_LOCATOR.unpack(
+                self._read_at(foot, foot_offset, locator_offset, ZIP64_LOCATOR.size)
+            )
+            if signature == ZIP64_LOCATOR_SIGNATURE:
+                # Recorded without data prepended to the archive, with some the record ends at the locator
+                last_offset = locator_offset - ZIP64_END_RECORD.size
+                for candidate in (record_offset, last_offset):
+                    if 0 <= candidate <= last_offset:
+                        record = self._read_at(foot, foot_offset, candidate, ZIP64_END_RECORD.size)
+                        if record[:4] == ZIP64_END_RECORD_SIGNATURE:
+                            break
+                else:
+                    raise ValueError("ZIP64 end of central directory record not found")
+                _, size, start = ZIP64_END_RECORD.unpack(record)
+                end_offset = candidate
+        # Anything before the archive shifts every recorded offset
+        self.prefix = end_offset - size - start
+        if self.prefix < 0:
+            raise ValueError("ZIP central directory runs past its end record")
+        self.start = start + self.prefix
+        return size
+
+    def _read_at(self, foot: bytes, foot_offset: int, offset: int, length: int) -> bytes:
+        """Bytes at a file offset, from the foot when it holds them"""
+        if foot_offset <= offset and offset + length <= foot_offset + len(foot):
+            return foot[offset - foot_offset : offset - foot_offset + length]
+        self.file.seek(offset)
+        data = self.file.read(length)
+        record_read("zip_scanner", offset, len(data))
+        return data
+
+    def _read_names(self, size: int) -> None:
+        file, names = self.file, self.names
+        file.seek(self.start)
+        # buffer holds the unparsed rest of the directory read so far, position is the next entry in it
+        buffer, position, remaining = b"", 0, size
+        while True:
+            end = position + CENTRAL_ENTRY.size
+            if end <= len(buffer):
+                (
+                    signature,
+                    flags,
+                    method,
+                    compressed_size,
+                    member_size,
+                    name_length,
+                    extra_length,
+                    comment_length,
+                    offset,
+                ) = CENTRAL_ENTRY.unpack_from(buffer, position)
+                if signature != CENTRAL_ENTRY_SIGNATURE:
+                    raise ValueError("Bad ZIP central directory entry")
+                end += name_length + extra_length + comment_length
+            if end > len(buffer):
+                chunk = file.read(min(max(CHUNK_SIZE, end - len(buffer)), remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            name_end = position + CENTRAL_ENTRY.size + name_length
+            name = buffer[position + CENTRAL_ENTRY.size : name_end]
+            if 0xFFFFFFFF in (compressed_size, member_size, offset):
+                member_size, compressed_size, offset = zip64_sizes(
+                    buffer[name_end : name_end + extra_length], member_size, compressed_size, offset
+                )
+            # Bit 11 marks UTF-8 names, otherwise they are code page 437
+            names[name.decode("utf-8" if flags & 0x800 else "cp437")] = (
+                flags,
+                method,
+                compressed_size,
+                member_size,
+                offset,
+            )
+            position = end
+        record_read("zip_scanner", self.start, size - remaining)
+
+    def entry(self, name: str) -> tuple[int, int, int, int, int]:
+        """(flags, compression method, compressed size, size, local header offset) of a member"""
+        return self.names[name]
+
+    def read(self, name: str, limit: int = MAX_MEMBER_READ) -> bytes:
+        """Decompress the start of a member, at most limit bytes of it"""
+        file = self.file
+        flags, method, compressed_size, _, offset = self.entry(name)
+        if flags & 0x1:
+            raise ValueError(f"ZIP member {name!r} is encrypted")
+        if method not in (0, 8):
+            # bzip2, LZMA and friends are rare enough to leave to zipfile
+            from zipfile import ZipFile  # noqa: PLC0415
+
+            with ZipFile(file) as archive, archive.open(name) as member:
+                return member.read(limit)
+
+        file.seek(offset + self.prefix)
+        header = file.read(LOCAL_HEADER.size)
+        if len(header) < LOCAL_HEADER.size or header[:4] != LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"Bad ZIP local header for {name!r}")
+        data_offset = offset + self.prefix + LOCAL_HEADER.size + sum(LOCAL_HEADER.unpack(header)[1:])
+        file.seek(data_offset)
+        if method == 0:
+            data = file.read(min(compressed_size, limit))
+            record_read("zip_scanner", data_offset, len(data))
+            return data
+
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        out, remaining = [], compressed_size
+        length = 0
+        while remaining and length < limit and not decompressor.eof:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            data = decompressor.decompress(chunk, limit - length)
+            out.append(data)
+            length += len(data)
+        record_read("zip_scanner", data_offset, compressed_size - remaining)
+        return b"".join(out)
+
+
+def zip64_sizes(extra: bytes, size: int, compressed_size: int, offset: int) -> tuple[int, int, int]:
+    """Fill in the sizes and header offset held in an entry's Zip64 extra field"""
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_length = struct.unpack_from("<2H", extra, position)
+        if field_id == 0x0001:
+            # Only the values saturated in the entry are present, in this order
+            values = iter(struct.unpack_from(f"<{field_length // 8}Q", extra, position + 4))
+            if size == 0xFFFFFFFF:
+                size = next(values, size)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = next(values, compressed_size)
+            if offset == 0xFFFFFFFF:
+                offset = next(values, offset)
+            break
+        position += 4 + field_length
+    return size, compressed_size, offset
+
+
+def walk_members(directory: CentralDirectory, container: str, depth: int, max_depth: int, budget: list[int]):
+    """Lazily yield a ZipMember for every member, descending into nested ZIP archives.
+
+    Members are identified from at most max_head decompressed bytes. budget is
+    [members left, decompressed bytes left], shared with the nested archives.
+    Once the bytes run out members are still listed, with matches of None.
+    """
+    from puremagic.main import ext_from_filename, identify_all, max_foot, max_head  # noqa: PLC0415
+
+    for name in directory.names:
+        if budget[0] <= 0:
+            return
+        budget[0] -= 1
+        path = f"{container}/{name}" if container else name
+        flags, _, _, size, _ = directory.entry(name)
+        prefix, matches = b"", None
+        if size and budget[1] > 0 and not flags & 0x1 and not name.endswith("/"):
+            try:
+                prefix = directory.read(name, min(max_head, budget[1]))
+            except Exception:
+                # Corrupt or in a compression method this Python lacks, left unidentified
+                prefix = b""
+            budget[1] -= len(prefix)
+            if prefix:
+                foot = prefix[-max_foot:] if len(prefix) >= size else b""
+                matches = identify_all(prefix, foot, ext_from_filename(name))
+        yield ZipMember(name=path, size=size, depth=depth, matches=matches)
+
+        if prefix[:4] == match_bytes and depth < max_depth and size <= budget[1]:
+            # Nested archives have to be decompressed whole to reach their central directory
+            try:
+                data = directory.read(name, size)
+            except Exception:
+                # Corrupt past the prefix already read, its members stay unlisted
+                continue
+            budget[1] -= len(data)
+            try:
+                nested = CentralDirectory(io.BytesIO(data))
+            except ValueError:
+                continue
+            yield from walk_members(nested, path, depth + 1, max_depth, budget)
+
+
+def open_office_check(
+    internal_files: Collection[str], zip_file: CentralDirectory, extension: str | None = None
+) -> Match | None:
     if "content.xml" not in internal_files:
         return None
     if "mimetype" not in internal_files:
@@ -32,7 +298,9 @@ def open_office_check(internal_files: list[str], zip_file: ZipFile, extension: s
     return None
 
 
-def office_check(internal_files: list[str], zip_file: ZipFile, extension: str | None = None) -> Match | None:
+def office_check(
+    internal_files: Collection[str], zip_file: CentralDirectory, extension: str | None = None
+) -> Match | None:
     if "[Content_Types].xml" not in internal_files:
         return None
     if "docProps/app.xml" not in internal_files:
@@ -104,7 +372,7 @@ def office_check(internal_files: list[str], zip_file: ZipFile, extension: str |
     return None
 
 
-def jar_check(internal_files: list[str], zip_file: ZipFile) -> Match | None:
+def jar_check(internal_files: Collection[str], zip_file: CentralDirectory) -> Match | None:
     if "META-INF/MANIFEST.MF" not in internal_files:
         return None
     if "version.json" not in internal_files:
@@ -115,7 +383,7 @@ def jar_check(internal_files: list[str], zip_file: ZipFile) -> Match | None:
     return None
 
 
-def apk_check(internal_files: list[str]) -> Match | None:
+def apk_check(internal_files: Collection[str]) -> Match | None:
     if "META-INF/MANIFEST.MF" not in internal_files:
         return None
     if "AndroidManifest.xml" in internal_files:
@@ -123,18 +391,17 @@ def apk_check(internal_files: list[str]) -> Match | None:
     return None
 
 
-def xpi_check(internal_files: list[str], zip_file: ZipFile) -> Match | None:
+def xpi_check(internal_files: Collection[str], zip_file: CentralDirectory) -> Match | None:
     if "install.rdf" in internal_files and b"mozilla:install-manifest" in zip_file.read("install.rdf"):
         return Match(".xpi", "Mozilla Firefox Add-on", "application/x-xpinstall")
     return None
 
 
-def fb2_check(internal_files: list[str], zip_file: ZipFile, file_path: os.PathLike) -> Match | None:
-    if (
-        len(internal_files) == 1
-        and internal_files[0].endswith(".fb2")
-        and b"<FictionBook" in zip_file.read(internal_files[0])
-    ):
+def fb2_check(internal_files: Collection[str], zip_file: CentralDirectory, file_path: os.PathLike) -> Match | None:
+    if len(internal_files) != 1:
+        return None
+    name = next(iter(internal_files))
+    if name.endswith(".fb2") and b"<FictionBook" in zip_file.read(name):
         if str(file_path).endswith("fb2.zip"):
             return Match(".fb2.zip", "FictionBook", "application/x-fictionbook+xml")
         if str(file_path).endswith("fbz"):
@@ -144,7 +411,7 @@ def fb2_check(internal_files: list[str], zip_file: ZipFile, file_path: os.PathLi
     return None
 
 
-def cbz_check(internal_files: list[str], extension: str) -> Match | None:
+def cbz_check(internal_files: Collection[str], extension: str) -> Match | None:
     if extension != "cbz":
         return None
     image_extensions = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif")
@@ -154,39 +421,87 @@ def cbz_check(internal_files: list[str], extension: str) -> Match | None:
     return Match(".cbz", "Comic Book Archive", "application/vnd.comicbook+zip")
 
 
-def main(file_path: os.PathLike, _, __) -> Match | None:
+def epub_check(internal_files: Collection[str], zip_file: CentralDirectory) -> Match | None:
+    # The mimetype member has to come first, OpenDocument files share the layout with a different type
+    if next(iter(internal_files), None) != "mimetype":
+        return None
+    if zip_file.read("mimetype", 64).strip() == b"application/epub+zip":
+        return Match(".epub", "EPUB Electronic Publication", "application/epub+zip")
+    return None
+
+
+def xps_check(internal_files: Collection[str], zip_file: CentralDirectory, markers: set[str]) -> Match | None:
+    if "fixed_document_sequence" not in markers or "_rels/.rels" not in internal_files:
+        return None
+    # XPS and OpenXPS share their layout, only the namespaces in the package relationships differ
+    relationships = zip_file.read("_rels/.rels")
+    if b"schemas.openxps.org" in relationships:
+        return Match(".oxps", "OpenXPS Document", "application/oxps")
+    if b"schemas.microsoft.com/xps/2005" in relationships:
+        return Match(".xps", "XML Paper Specification Document", "application/vnd.ms-xpsdocument")
+    return None
+
+
+def container_check(internal_files: Collection[str], markers: set[str]) -> Match | None:
+    for requirements, extension, name, mime_type in CONTAINER_TYPES:
+        if all(item in markers or item in internal_files for item in requirements):
+            return Match(extension, name, mime_type)
+    return None
+
+
+def find_markers(internal_files: Collection[str]) -> set[str]:
+    """Every member_markers group matched by any member name"""
+    match = member_markers.fullmatch
+    return {found.lastgroup for name in internal_files if (found := match(name))}
+
+
+def main(file_path: os.PathLike, _, foot: bytes) -> Match | None:
     extension = str(file_path).split(".")[-1].lower()
-    if extension == "zip" and not str(file_path).endswith(".fb2.zip"):
-        return Match(".zip", "ZIP archive", "application/zip")
 
-    with ZipFile(file_path) as myzip:
-        internal_files = myzip.namelist()
-        office_result = office_check(internal_files, myzip, extension)
+    with open(file_path, "rb") as file:
+        directory = CentralDirectory(file, foot)
+        names = directory.names
+        office_result = office_check(names, directory, extension)
         if office_result:
             return office_result
 
-        open_office_result = open_office_check(internal_files, myzip)
+        open_office_result = open_office_check(names, directory)
         if open_office_result:
             return open_office_result
 
-        jar_result = jar_check(internal_files, myzip)
+        jar_result = jar_check(names, directory)
         if jar_result:
             return jar_result
 
-        apk_result = apk_check(internal_files)
+        apk_result = apk_check(names)
         if apk_result:
             return apk_result
 
-        xpi_result = xpi_check(internal_files, myzip)
+        xpi_result = xpi_check(names, directory)
         if xpi_result:
             return xpi_result
 
-        fb_result = fb2_check(internal_files, myzip, file_path)
+        fb_result = fb2_check(names, directory, file_path)
         if fb_result:
             return fb_result
 
-        cbz_result = cbz_check(internal_files, extension)
+        cbz_result = cbz_check(names, extension)
         if cbz_result:
             return cbz_result
 
-        return None
+        epub_result = epub_check(names, directory)
+        if epub_result:
+            return epub_result
+
+        markers = find_markers(names)
+        xps_result = xps_check(names, directory, markers)
+        if xps_result:
+            return xps_result
+
+        container_result = container_check(names, markers)
+        if container_result:
+            return container_result
+
+    if extension == "zip":
+        return Match(".zip", "ZIP archive", "application/zip")
+    return None
@@ -0,0 +1,117 @@
+"""
+Lightweight counters and tracing describing the work puremagic has performed.
+
+Counter collection is always on and limited to integer increments, so it is cheap
+enough to leave running in production. Use ``puremagic.get_stats()`` to take a
+snapshot and ``puremagic.reset_stats()`` to start counting again.
+
+Tracing is opt-in per call (``magic_file(path, trace=True)``) and records every
+signature row tested, every byte range read and every deep scan decision.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Stats:
+    """Aggregate counters for identifications, signature hits, deep scans and bytes read"""
+
+    __slots__ = (
+        "identifications",
+        "signature_hits",
+        "scanner_invocations",
+        "scanner_successes",
+        "swallowed_exceptions",
+        "bytes_read",
+        "bytes_read_by",
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter"""
+        self.identifications = 0
+        self.signature_hits: Counter = Counter()
+        self.scanner_invocations: Counter = Counter()
+        self.scanner_successes: Counter = Counter()
+        self.swallowed_exceptions: Counter = Counter()
+        self.bytes_read = 0
+        self.bytes_read_by: Counter = Counter()
+
+    def as_dict(self) -> dict:
+        """Snapshot of the counters using only JSON serializable types"""
+        return {
+            "identifications": self.identifications,
+            "signature_hits": {
+                f"{row.name} ({row.extension}) {row.byte_match.hex()}@{row.offset}": count
+                for row, count in self.signature_hits.most_common()
+            },
+            "scanner_invocations": dict(self.scanner_invocations.most_common()),
+            "scanner_successes": dict(self.scanner_successes.most_common()),
+            "swallowed_exceptions": dict(self.swallowed_exceptions.most_common()),
+            "bytes_read": self.bytes_read,
+            "bytes_read_by": dict(self.bytes_read_by.most_common()),
+        }
+
+
+class Trace:
+    """Record of a single identification: signature rows tested and matched, reads and deep scan decisions"""
+
+    __slots__ = ("tested", "matched", "reads", "decisions")
+
+    def __init__(self):
+        # (table, row) pairs, table being "header", "footer" or "multi-part"
+        self.tested: list[tuple[str, tuple]] = []
+        self.matched: list[tuple[str, tuple]] = []
+        # (reader, offset, length)
+        self.reads: list[tuple[str, int, int]] = []
+        self.decisions: list[str] = []
+
+    def as_dict(self) -> dict:
+        """Trace using only JSON serializable types"""
+        return {
+            "tested": dict(Counter(table for table, _ in self.tested)),
+            "matched": [
+                {
+                    "table": table,
+                    "byte_match": row.byte_match.hex(),
+                    "offset": row.offset,
+                    "extension": row.extension,
+                    "name": row.name,
+                }
+                for table, row in self.matched
+            ],
+            "reads": [{"reader": reader, "offset": offset, "length": length} for reader, offset, length in self.reads],
+            "decisions": list(self.decisions),
+        }
+
+
+stats = Stats()
+active_trace: ContextVar[Trace | None] = ContextVar("puremagic_trace", default=None)
+
+
+@contextmanager
+def tracing():
+    """Collect a Trace of everything identified, read and decided within the block"""
+    trace = Trace()
+    token = active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        active_trace.reset(token)
+
+
+def trace_decision(message: str) -> None:
+    """Note why a deep scan result was kept or replaced, only when tracing"""
+    if (trace := active_trace.get()) is not None:
+        trace.decisions.append(message)
+
+
+def record_read(scanner: str, offset: int, length: int) -> None:
+    """Account for bytes pulled from a file by the core or a deep scanner"""
+    stats.bytes_read += length
+    stats.bytes_read_by[scanner] += length
+    if (trace := active_trace.get()) is not None:
+        trace.reads.append((scanner, offset, length))
@@ -291,3 +291,104 @@ def test_cfbf_msg():
     assert ext == ".msg"
     mime = puremagic.from_file(os.path.join(OFFICE_DIR, "test.msg"), mime=True)
     assert mime == "application/vnd.ms-outlook"
+
+
+def test_cfbf_directory_chain(tmp_path):
+    """CFBF scanner follows the directory past its first sector, through the FAT"""
+    import struct
+
+    def entry(name, obj_type=2):
+        encoded = (name + "\x00").encode("utf-16-le")
+        return struct.pack("<64sHB", encoded, len(encoded), obj_type).ljust(128, b"\x00")
+
+    # Directory in sectors 1 -> 100 -> 50, the key stream listed last and beyond the head
+    fat = [0xFFFFFFFF] * 128
+    fat[0], fat[1], fat[100], fat[50] = 0xFFFFFFFD, 100, 50, 0xFFFFFFFE
+    header = struct.pack("<8s22xH12xII", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", 9, 1, 1)
+    header = (
+        header.ljust(68, b"\x00") + struct.pack("<II", 0xFFFFFFFE, 0) + struct.pack("<109I", 0, *[0xFFFFFFFF] * 108)
+    )
+    sectors = [bytes(512)] * 101
+    sectors[0] = struct.pack("<128I", *fat)
+    sectors[1] = entry("Root Entry", 5) + b"".join(entry(f"Filler {i}") for i in range(3))
+    sectors[100] = b"".join(entry(f"Filler {i}") for i in range(3, 7))
+    sectors[50] = entry("Workbook") + bytes(384)
+    path = tmp_path / "chained"
+    path.write_bytes(header + b"".join(sectors))
+
+    results = puremagic.magic_file(path)
+    assert results[0].extension == ".xls"
+    assert results[0].mime_type == "application/vnd.ms-excel"
+
+
+def test_stats():
+    """Counters track identifications, signature hits, scanners and bytes read"""
+    puremagic.reset_stats()
+    puremagic.from_file(TGA_FILE)
+    puremagic.magic_file(os.path.join(SYSTEM_DIR, "test.json"))
+    stats = puremagic.get_stats()
+    assert stats["identifications"] == 2
+    assert any(key.startswith("Truevision Targa Graphic file (.tga)") for key in stats["signature_hits"])
+    assert stats["scanner_invocations"]["json_scanner"] >= 1
+    assert stats["scanner_successes"]["json_scanner"] == 1
+    assert stats["bytes_read"] >= os.path.getsize(TGA_FILE)
+    assert stats["bytes_read_by"]["json_scanner"] == os.path.getsize(os.path.join(SYSTEM_DIR, "test.json"))
+
+    puremagic.reset_stats()
+    stats = puremagic.get_stats()
+    assert stats["identifications"] == 0
+    assert stats["signature_hits"] == {}
+    assert stats["bytes_read"] == 0
+
+
+def test_cmd_stats_option(capsys):
+    """Test CLI --stats option"""
+    from puremagic.main import command_line_entry  # noqa: PLC0415
+
+    puremagic.reset_stats()
+    command_line_entry(TGA_FILE, "--stats")
+    output = capsys.readouterr().out
+    assert "Statistics" in output
+    assert "Identifications: 1" in output
+
+
+def test_magic_file_trace():
+    """Trace records tested and matched signature rows, reads and deep scan decisions"""
+    json_file = os.path.join(SYSTEM_DIR, "test.json")
+    results, trace = puremagic.magic_file(json_file, trace=True)
+    assert results == puremagic.magic_file(json_file)
+    assert results[0].extension == ".json"
+    assert any(table == "header" for table, _ in trace.tested)
+    assert any(table == "footer" for table, _ in trace.tested)
+    assert ("header", b"{") in [(table, row.byte_match) for table, row in trace.matched]
+    assert ("header", 0, os.path.getsize(json_file)) in trace.reads
+    assert any(reader == "json_scanner" for reader, _, _ in trace.reads)
+    assert any("overrides magic match" in decision for decision in trace.decisions)
+    assert trace.as_dict()["tested"]["footer"] == len(puremagic.main.magic_footer_array)
+
+    _, trace = puremagic.magic_file(os.path.join(OFFICE_DIR, "text_lf.txt"), trace=True)
+    assert any("catch-all text scanner" in decision for decision in trace.decisions)
+
+    _, trace = puremagic.magic_file(os.path.join(RESOURCE_DIR, "fake_file"), trace=True)
+    assert trace.reads
+
+
+def test_cmd_trace_option(capsys):
+    """Test CLI --trace option"""
+    from puremagic.main import command_line_entry  # noqa: PLC0415
+
+    command_line_entry(os.path.join(SYSTEM_DIR, "test.json"), "--trace")
+    output = capsys.readouterr().out
+    assert "Signatures Tested:" in output
+    assert "json_scanner" in output
+
+
+def test_cmd_trace_identifies_once(capsys):
+    """Test CLI --trace reuses the identification it prints"""
+    from puremagic.main import command_line_entry  # noqa: PLC0415
+
+    puremagic.reset_stats()
+    command_line_entry(TGA_FILE, "--trace", "--stats")
+    output = capsys.readouterr().out
+    assert "Signatures Tested:" in output
+    assert "Identifications: 1" in output
@@ -0,0 +1,12 @@
+import pytest
+
+from benchmarks import bench_memory
+from benchmarks.corpus import SIZES
+
+
+@pytest.mark.slow
+def test_memory_budgets(tmp_path):
+    measurements = bench_memory.run(tmp_path, SIZES["large"])
+    assert set(bench_memory.BUDGETS) <= set(measurements)
+    exceeded = bench_memory.over_budget(measurements)
+    assert not exceeded, {key: f"{peak} B peak over {budget} B budget" for key, (peak, budget) in exceeded.items()}
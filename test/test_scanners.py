@@ -1,6 +1,32 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+import random
+import struct
+import tarfile
+import zipfile
+
+import pytest
+
 import puremagic
 from test.common import IMAGE_DIR, OFFICE_DIR, SYSTEM_DIR, AUDIO_DIR
-from puremagic.scanners import python_scanner, json_scanner, sndhdr_scanner
+from puremagic.scanners import (
+    compressed_scanner,
+    executable_scanner,
+    hdf5_scanner,
+    isobmff_scanner,
+    mpeg_audio_scanner,
+    json_scanner,
+    python_scanner,
+    riff_scanner,
+    sndhdr_scanner,
+    tar_scanner,
+    text_scanner,
+    xml_scanner,
+    zip_scanner,
+)
 
 sample_text = b"""Lorem ipsum dolor sit amet, consectetur adipiscing elit,{ending}
 sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.{ending}
@@ -57,6 +83,52 @@ def test_utf16_le_csv_deep_scan():
     assert results[0].confidence >= 0.9
 
 
+def test_text_scanner_large_inputs(tmp_path):
+    # Only the start of the text is used for CSV detection, the rest must not change the answer
+    csv_file = tmp_path / "large.csv"
+    csv_file.write_bytes(b"id,name,value\n" + b"".join(b"%d,item,%d\n" % (i, i * 2) for i in range(100_000)))
+    result = text_scanner.main(csv_file, None, None)
+    assert result.extension == ".csv"
+    assert result.name == "comma-separated values"
+
+    lines_file = tmp_path / "lines.txt"
+    lines_file.write_bytes(b"a\n" * 500_000)
+    assert text_scanner.main(lines_file, None, None).name == "ascii text, with LF line terminators"
+
+    mixed_file = tmp_path / "mixed.txt"
+    mixed_file.write_bytes(b"one\r\ntwo\r\nthree\rfour\n")
+    assert text_scanner.main(mixed_file, None, None).name == "ascii text, with CRLF line terminators"
+
+    # Only the sample is read, cut back to whole characters so a pair split by its end still decodes
+    split_file = tmp_path / "split.txt"
+    split_text = "a" * (text_scanner.TEXT_SAMPLE_SIZE // 2 - 2) + "\U0001f600" + "b\n" * 100_000
+    split_file.write_bytes(split_text.encode("utf-16"))
+    puremagic.reset_stats()
+    assert text_scanner.main(split_file, None, None).name == "utf-16-le text"
+    assert puremagic.get_stats()["bytes_read_by"]["text_scanner"] == text_scanner.TEXT_SAMPLE_SIZE + 1
+
+
+def test_is_text():
+    assert puremagic.is_text(sample_text)
+    assert puremagic.is_text("plain str")
+    assert puremagic.is_text("caf\u00e9 na\u00efve".encode("cp1252"))
+    assert puremagic.is_text("\ufeffutf-16 text\r\n".encode("utf-16-le"))
+    assert not puremagic.is_text(b"text with a \x00 byte")
+    assert not puremagic.is_text(bytes(range(1, 256)) * 4)
+    assert not puremagic.is_text((IMAGE_DIR / "test.png").read_bytes())
+
+
+def test_text_scanner_binary_head(tmp_path):
+    # cp1252 decodes almost anything, binary must be turned away before that
+    blob = tmp_path / "blob"
+    blob.write_bytes(bytes(range(0x80, 0x100)) + bytes(range(1, 0x80)) * 64)
+    puremagic.reset_stats()
+    result = text_scanner.main(blob, blob.read_bytes()[:4096], b"")
+    assert result.name == "data"
+    assert result.mime_type == "application/octet-stream"
+    assert puremagic.get_stats()["bytes_read_by"].get("text_scanner") is None
+
+
 def test_from_string_nonexistent_filename():
     # GH #137: passing filename for extension hint should not raise FileNotFoundError
     # Use PDF-like bytes so identify_all finds a match via magic numbers,
@@ -83,6 +155,33 @@ def test_python_scanner():
     assert result.confidence == 1.0
 
 
+def test_python_scanner_fast_path(tmp_path, monkeypatch):
+    body = "".join(f"import mod{i}\n\n\ndef func{i}(value):\n    return value * {i}\n" for i in range(10))
+
+    script = tmp_path / "script"
+    script.write_text("#!/usr/bin/env python3\n" + body)
+    assert python_scanner.main(script, None, None).extension == ".py"
+
+    # Enough statements in the tokenized head settle it without a parse
+    plain = tmp_path / "plain.txt"
+    plain.write_text(body)
+    assert python_scanner.scan_tokens(body, complete=True) is True
+    assert python_scanner.main(plain, None, None).extension == ".py"
+
+    prose = "It's only a note, with a few words about import and class in it.\n" * 5
+    assert python_scanner.scan_tokens(prose, complete=True) is False
+    assert python_scanner.scan_tokens("value = 1\nother = 2\n", complete=True) is False
+
+    # Inconclusive heads fall back to a parse, which can be capped
+    short = "import os\nimport sys\n\nfor name in os.listdir():\n    print(name)\nassert sys\n"
+    assert python_scanner.scan_tokens(short, complete=True) is None
+    capped = tmp_path / "capped.txt"
+    capped.write_text(short + "x = 1\n" * 200_000)
+    assert python_scanner.main(capped, None, None) is None
+    monkeypatch.setattr(python_scanner, "MAX_PARSE_BYTES", len(short) + 10)
+    assert python_scanner.main(capped, None, None).extension == ".py"
+
+
 def test_json_scanner():
     json_file = SYSTEM_DIR / "test.json"
     result = json_scanner.main(json_file, b"{", b"}")
@@ -95,6 +194,529 @@ def test_json_scanner():
     assert result.confidence == 1.0
 
 
+def test_json_scanner_streaming(tmp_path, monkeypatch):
+    json_loads_size = json_scanner.JSON_LOADS_SIZE
+    monkeypatch.setattr(json_scanner, "CHUNK_SIZE", 7)
+    monkeypatch.setattr(json_scanner, "JSON_LOADS_SIZE", 0)
+    records = [{"id": i, "name": f"item {i}", "tags": ["a", "b"], "score": i / 3, "ok": i % 2 == 0} for i in range(500)]
+    big_json = tmp_path / "big.json"
+    big_json.write_text(json.dumps(records))
+    head, foot = big_json.read_bytes()[:8], big_json.read_bytes()[-8:]
+    assert json_scanner.main(big_json, head, foot).confidence == 1.0
+
+    # Still well formed when the limit is reached, but not proven to be
+    monkeypatch.setattr(json_scanner, "MAX_VALIDATE_BYTES", 1024)
+    result = json_scanner.main(big_json, head, foot)
+    assert result.extension == ".json"
+    assert result.confidence == json_scanner.PARTIAL_CONFIDENCE
+
+    monkeypatch.setattr(json_scanner, "MAX_VALIDATE_BYTES", None)
+    too_deep = "[" * 2 * json_scanner.MAX_DEPTH + "]" * 2 * json_scanner.MAX_DEPTH
+    broken_cases = ("[1, 2,]", '{"a": 1 "b": 2}', "[1.5e]", '{"a": tru}', "[[1, 2]", '["a\x01"]', "[1] [2]", too_deep)
+    # Only strings are keys, whatever the length of the token in their place
+    keys = ("{1:2}", "{12: 1}", "{true: 1}", "{null: null}", "{[1,2]: 3}", '{"a": 1, 23: 4}', '{{"a": 1}: 2}')
+    # Through the validator, then through json.loads for files up to JSON_LOADS_SIZE
+    for loads_size in (0, json_loads_size):
+        monkeypatch.setattr(json_scanner, "JSON_LOADS_SIZE", loads_size)
+        for broken in broken_cases + keys:
+            broken_json = tmp_path / "broken.json"
+            broken_json.write_text(broken)
+            assert json_scanner.main(broken_json, broken.encode(), broken.encode()) is None, (loads_size, broken)
+
+
+def test_jsonl_scanner(tmp_path):
+    small = tmp_path / "events.jsonl"
+    small.write_bytes(b'{"event": "start"}\n{"event": "stop", "tags": ["a"]}\n')
+    results = puremagic.magic_file(small)
+    assert results[0].extension == ".jsonl"
+    assert results[0].mime_type == "application/jsonl"
+    assert results[0].confidence == 1.0
+
+    # Only the head and foot are sampled, the middle is never read
+    large = tmp_path / "events.ndjson"
+    large.write_bytes(b"".join(b'{"id": %d, "name": "event %d"}\n' % (i, i) for i in range(20_000)))
+    head, foot = puremagic.main.file_details(large)
+    result = json_scanner.main(large, head, foot)
+    assert result.extension == ".ndjson"
+    assert result.mime_type == "application/x-ndjson"
+    assert result.confidence == 0.9
+
+    broken = tmp_path / "broken.jsonl"
+    broken.write_bytes(b'{"id": 1}\n{"id": 2\n')
+    assert json_scanner.jsonl_check(broken, broken.read_bytes(), broken.read_bytes()) is None
+    assert puremagic.from_extension("jsonl") == "application/jsonl"
+
+
+def test_zip_central_directory(tmp_path, monkeypatch):
+    def build(path, prefix=b"", comment=b""):
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("[Content_Types].xml", b"<Types/>")
+            archive.writestr("docProps/app.xml", b"<Properties><Application>Microsoft Excel</Application></Properties>")
+            for index in range(20):
+                archive.writestr(f"xl/worksheets/sheet{index}.xml", b"<worksheet/>")
+            archive.comment = comment
+        path.write_bytes(prefix + path.read_bytes())
+
+    plain, prefixed, zip64 = tmp_path / "plain.xlsx", tmp_path / "prefixed.xlsx", tmp_path / "zip64.xlsx"
+    build(plain)
+    build(prefixed, prefix=b"MZ" * 4096, comment=b"c" * 1000)
+    # Force Zip64 end records and extra fields on a small archive
+    monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", 1)
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 1)
+    build(zip64)
+    monkeypatch.undo()
+    # An extensible data sector after the Zip64 end record, found by the offset in the locator
+    data = zip64.read_bytes()
+    locator = data.rindex(b"PK\x06\x07")
+    record = locator - 56
+    extended = tmp_path / "extended.xlsx"
+    extended.write_bytes(
+        data[:record]
+        + data[record : record + 4]
+        + struct.pack("<Q", 44 + 16)
+        + data[record + 12 : locator]
+        + b"\x01\x00\x0c\x00"
+        + bytes(12)
+        + data[locator:]
+    )
+    prefixed_zip64 = tmp_path / "prefixed_zip64.xlsx"
+    prefixed_zip64.write_bytes(b"MZ" * 4096 + data)
+
+    for path in (plain, prefixed, zip64, extended, prefixed_zip64):
+        head, foot = puremagic.main.file_details(path)
+        with open(path, "rb") as file:
+            directory = zip_scanner.CentralDirectory(file, foot)
+            assert list(directory.names) == zipfile.ZipFile(plain).namelist()
+            assert b"Microsoft Excel" in directory.read("docProps/app.xml")
+        # Entries are kept from the directory read, the file is not needed for them
+        assert directory.entry("[Content_Types].xml")[3] == len(b"<Types/>")
+        result = zip_scanner.main(path, head, foot)
+        assert result.extension == ".xlsx"
+        assert result.name == "Microsoft Excel"
+
+
+def test_zip_containers(tmp_path):
+    xps_rels = b'<Relationship Type="http://schemas.microsoft.com/xps/2005/06/fixedrepresentation"/>'
+    oxps_rels = b'<Relationship Type="http://schemas.openxps.org/oxps/v1.0/fixedrepresentation"/>'
+    containers = {
+        ".epub": {"mimetype": b"application/epub+zip", "META-INF/container.xml": b"<container/>"},
+        ".whl": {"pkg/__init__.py": b"", "pkg-1.0.dist-info/WHEEL": b"Wheel-Version: 1.0"},
+        ".nupkg": {"[Content_Types].xml": b"<Types/>", "Package.nuspec": b"<package/>"},
+        ".vsix": {"[Content_Types].xml": b"<Types/>", "extension.vsixmanifest": b"<PackageManifest/>"},
+        ".xps": {"_rels/.rels": xps_rels, "FixedDocumentSequence.fdseq": b"<FixedDocumentSequence/>"},
+        ".oxps": {"_rels/.rels": oxps_rels, "FixedDocumentSequence.fdseq": b"<FixedDocumentSequence/>"},
+        ".ipa": {"Payload/Example.app/Info.plist": b"<plist/>"},
+        ".kmz": {"doc.kml": b"<kml/>", "files/icon.png": b""},
+        ".zip": {"readme.txt": b"hello", "data/values.csv": b"a,b"},
+    }
+    for extension, members in containers.items():
+        # Named .zip, the members alone have to decide
+        path = tmp_path / f"{extension[1:]}.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        head, foot = puremagic.main.file_details(path)
+        assert zip_scanner.main(path, head, foot).extension == extension
+
+
+def test_magic_archive_members(tmp_path):
+    def zip_bytes(members):
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, member in members.items():
+                archive.writestr(name, member)
+        return data.getvalue()
+
+    png, gif = (IMAGE_DIR / "test.png").read_bytes(), (IMAGE_DIR / "test.gif").read_bytes()
+    inner = zip_bytes({"inner.gif": gif, "deeper.zip": zip_bytes({"deep.gif": gif})})
+    path = tmp_path / "outer.zip"
+    path.write_bytes(zip_bytes({"image.png": png, "zeros.bin": bytes(16 * 1024 * 1024), "inner.zip": inner}))
+
+    def listing(**budgets):
+        return [
+            (member.name, member.depth, member.matches[0].extension if member.matches else None)
+            for member in puremagic.magic_archive_members(path, **budgets)
+        ]
+
+    found = listing()
+    assert ("image.png", 0, ".png") in found
+    assert ("inner.zip/inner.gif", 1, ".gif") in found
+    assert ("inner.zip/deeper.zip/deep.gif", 2, ".gif") in found
+    assert "inner.zip/deeper.zip/deep.gif" not in [name for name, _, _ in listing(max_depth=1)]
+    assert len(listing(max_members=2)) == 2
+    # Only the start of the 16 MiB member is decompressed, leaving enough of 64 KiB for everything else
+    assert listing(max_bytes=64 * 1024) == found
+    assert [extension for _, _, extension in listing(max_bytes=len(png))] == [".png", None, None]
+
+    with pytest.raises(puremagic.PureError):
+        next(puremagic.magic_archive_members(IMAGE_DIR / "test.png"))
+
+    # A nested archive corrupt past its prefix is listed but not descended into, its siblings still are
+    noise = zip_bytes({"noise.bin": random.Random(1).randbytes(200_000)})
+    corrupt = bytearray(zip_bytes({"inner.zip": noise, "z.txt": b"sibling"}))
+    # Incompressible data is deflated into stored blocks, zeroed block headers fail their length check
+    data_start = 30 + len("inner.zip")
+    corrupt[data_start + 40_000 : data_start + 120_000] = bytes(80_000)
+    path.write_bytes(corrupt)
+    assert [name for name, _, _ in listing()] == ["inner.zip", "z.txt"]
+
+
+def test_compressed_scanner(tmp_path):
+    tar_data = io.BytesIO()
+    with tarfile.open(fileobj=tar_data, mode="w") as archive:
+        member = tarfile.TarInfo("hello.txt")
+        member.size = 5
+        archive.addfile(member, io.BytesIO(b"hello"))
+    json_data = json.dumps([{"id": index, "name": f"item {index}"} for index in range(5000)]).encode()
+    csv_data = b"".join(b"%d,name %d,%d.5\n" % (index, index, index) for index in range(5000))
+
+    samples = {
+        "backup.tar.gz": (gzip.compress(tar_data.getvalue()), ".tar.gz"),
+        "records.json.gz": (gzip.compress(json_data), ".json.gz"),
+        "table.csv.bz2": (bz2.compress(csv_data), ".csv.bz2"),
+        "notes.xz": (lzma.compress(b"Plain words and nothing more\n" * 100), ".txt.xz"),
+    }
+    for name, (data, extension) in samples.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        result = puremagic.magic_file(path)[0]
+        assert result.extension == extension, name
+        assert result.mime_type == compressed_scanner.COMPRESSORS[data[: len(result.byte_match)]][2]
+
+    # A gzip bomb only ever gets MAX_DECOMPRESSED bytes out of it
+    bomb = tmp_path / "bomb.gz"
+    bomb.write_bytes(gzip.compress(b"\x00" * (64 * 1024 * 1024)))
+    head, _ = puremagic.main.file_details(bomb)
+    data, complete = compressed_scanner.peek(bomb, head, compressed_scanner.gzip_match_bytes)
+    assert len(data) == compressed_scanner.MAX_DECOMPRESSED
+    assert not complete
+
+    not_bzip2 = tmp_path / "not.bz2"
+    not_bzip2.write_bytes(b"BZh is not always bzip2")
+    assert compressed_scanner.main(not_bzip2, not_bzip2.read_bytes(), b"") is None
+
+
+def test_tar_members(tmp_path):
+    png = (IMAGE_DIR / "test.png").read_bytes()
+    for tar_format in (tarfile.USTAR_FORMAT, tarfile.GNU_FORMAT, tarfile.PAX_FORMAT):
+        path = tmp_path / f"archive_{tar_format}.tar"
+        with tarfile.open(path, "w", format=tar_format) as archive:
+            archive.add(IMAGE_DIR, arcname="images")
+            member = tarfile.TarInfo(f"{'nested/' * 20}image.png")
+            member.size = len(png)
+            archive.addfile(member, io.BytesIO(png))
+        with tarfile.open(path) as archive:
+            expected = [(member.name, member.size, member.offset_data) for member in archive]
+        found = list(tar_scanner.members(path, identify=True))
+        assert [(member.name.rstrip("/"), member.size, member.offset) for member in found] == expected
+        assert found[0].type == "directory"
+        assert found[0].matches is None
+        assert found[-1].matches[0].extension == ".png"
+
+    corrupt = tmp_path / "corrupt.tar"
+    corrupt.write_bytes(path.read_bytes()[:148] + b"0000000\x00" + path.read_bytes()[156:])
+    with pytest.raises(ValueError):
+        next(tar_scanner.members(corrupt))
+
+
+def test_hdf5_root_group(tmp_path):
+    undefined = b"\xff" * 8
+
+    # Superblock version 0, the root group's symbol table cached in its entry, and its B-tree,
+    # symbol table node and local heap past the first 64 KiB, where the names used to be missed
+    far = 70_000
+    heap_data = b"\x00obs\x00var\x00X\x00"
+    btree = b"TREE\x00\x00\x01\x00" + undefined * 2 + struct.pack("<3Q", 0, far + 64, 6)
+    snod = b"SNOD\x01\x00\x03\x00" + b"".join(struct.pack("<2Q24x", offset, 0) for offset in (1, 5, 9))
+    heap = b"HEAP\x00\x00\x00\x00" + struct.pack("<Q", len(heap_data)) + undefined + struct.pack("<Q", far + 256)
+    superblock = hdf5_scanner.HDF5_MAGIC + bytes([0, 0, 0, 0, 0, 8, 8, 0]) + struct.pack("<2HI", 4, 16, 0)
+    superblock += struct.pack("<Q", 0) + undefined + struct.pack("<Q", far + 512) + undefined
+    superblock += struct.pack("<2QI4x2Q", 0, 96, 1, far, far + 192)
+    # Version 1 object header holding just the symbol table message
+    root = struct.pack("<BBHII4x", 1, 0, 1, 1, 24) + struct.pack("<HHB3x2Q", 0x11, 16, 0, far, far + 192)
+    data = bytearray((superblock + root).ljust(far, b"\x00") + bytes(512))
+    data[far : far + len(btree)] = btree
+    data[far + 64 : far + 64 + len(snod)] = snod
+    data[far + 192 : far + 192 + len(heap)] = heap
+    data[far + 256 : far + 256 + len(heap_data)] = heap_data
+    path = tmp_path / "old_style.h5"
+    path.write_bytes(data)
+    head, _ = puremagic.main.file_details(path)
+    with open(path, "rb") as file:
+        assert hdf5_scanner.root_entries(file, head) == [b"/obs", b"/var", b"/X"]
+    assert puremagic.magic_file(path)[0].extension == ".h5ad"
+
+    # Superblock version 2 and a version 2 object header with compact link messages
+    links = b"".join(
+        struct.pack("<BHB", 0x06, 11 + len(name), 0) + bytes([1, 0, len(name)]) + name + struct.pack("<Q", 0)
+        for name in (b"matrix", b"row_attrs", b"col_attrs")
+    )
+    superblock = hdf5_scanner.HDF5_MAGIC + bytes([2, 8, 8, 0]) + struct.pack("<Q", 0) + undefined
+    superblock += struct.pack("<2Q4x", 0, 48)
+    path = tmp_path / "new_style.h5"
+    path.write_bytes(superblock + b"OHDR\x02\x00" + bytes([len(links)]) + links + bytes(4))
+    assert puremagic.magic_file(path)[0].extension == ".loom"
+
+
+def test_isobmff_scanner(tmp_path):
+    def box(box_type: bytes, body: bytes = b"") -> bytes:
+        return struct.pack(">I", 8 + len(body)) + box_type + body
+
+    def ftyp(major: bytes, *compatible: bytes, box_type: bytes = b"ftyp") -> bytes:
+        return box(box_type, major + bytes(4) + b"".join(compatible))
+
+    cases = [
+        # A specific compatible brand wins over a generic major brand
+        ("image.heic", ftyp(b"mif1", b"mif1", b"heic") + box(b"meta", bytes(24)), ".heic", "image/heic"),
+        ("audio.m4a", ftyp(b"mp42", b"isom", b"M4A ") + box(b"moov"), ".m4a", "audio/mp4"),
+        ("movie.mov", ftyp(b"qt  ", b"qt  ") + box(b"wide") + box(b"mdat"), ".mov", "video/quicktime"),
+        # Only 3GPP brands, the 3GPP2 extension is kept as both share them
+        ("phone.3g2", ftyp(b"3gp5", b"isom", b"3gp5"), ".3g2", "video/3gpp2"),
+        ("phone", ftyp(b"3gp5", b"isom", b"3gp5"), ".3gp", "video/3gpp"),
+        ("segment.m4s", ftyp(b"msdh", b"msdh", b"msix", box_type=b"styp") + box(b"sidx"), ".m4s", "video/iso.segment"),
+    ]
+    for name, data, extension, mime_type in cases:
+        path = tmp_path / name
+        path.write_bytes(data)
+        result = isobmff_scanner.main(path, data, b"")
+        assert (result.extension, result.mime_type, result.confidence) == (extension, mime_type, 1.0), name
+
+    fragmented = ftyp(b"iso6", b"iso6", b"dash") + box(b"moov", bytes(32)) + box(b"moof") + box(b"mdat")
+    path = tmp_path / "stream.mp4"
+    path.write_bytes(fragmented)
+    result = puremagic.magic_file(path)[0]
+    assert (result.extension, result.name) == (".mp4", "MPEG-4 video, fragmented")
+
+    # A broken box after the ftyp box lowers the confidence, unknown brands and bad ftyp sizes are not matched
+    assert isobmff_scanner.main(path, ftyp(b"isom") + b"\x00\x00\x00\x04\x00\x01\x02\x03", b"").confidence == 0.8
+    assert isobmff_scanner.main(path, ftyp(b"zzzz", b"yyyy"), b"") is None
+    assert isobmff_scanner.main(path, b"\x00\x00\x00\x11ftypisom" + bytes(16), b"") is None
+
+
+def test_mpeg_audio_scanner():
+    # MPEG 1 Layer III 128k 44.1Khz, without and with padding
+    assert mpeg_audio_scanner.FRAME_SIZES[(0xFFFB9060 >> 9) & 0xFFF] == 417
+    assert mpeg_audio_scanner.FRAME_SIZES[(0xFFFB9260 >> 9) & 0xFFF] == 418
+    expected = {
+        "test.mp3": "MPEG-1 Audio Layer III (MP3) file [128k 44.1Khz Joint-Stereo CBR ID3v2.3 ID3v1]",
+        "test_mp3_vbr_info_128k_notags.mp3": "MPEG-1 Audio Layer III (MP3) file [64k 44.1Khz Stereo VBR LAME(Info)]",
+        "test_mpeg2_mp3_VBR_128k_id3v2_24.mp3": (
+            "MPEG-2 Audio Layer III (MP3) file [128k 22.1Khz Stereo VBR LAME(Xing) ID3v2.4]"
+        ),
+    }
+    for name, full_name in expected.items():
+        path = AUDIO_DIR / name
+        head, foot = puremagic.main.file_details(path)
+        assert mpeg_audio_scanner.main(path, head, foot).name == full_name
+
+
+def test_mpeg_audio_consistency(tmp_path, monkeypatch):
+    rng = random.Random(4)
+    # Four 128k 44.1Khz frames, then data that does not continue the stream
+    frames = b"".join(b"\xff\xfb\x90\x00" + rng.randbytes(413) for _ in range(4))
+    path = tmp_path / "short_stream.mp3"
+    path.write_bytes(frames + bytes(8192))
+    head, foot = puremagic.main.file_details(path)
+
+    for frames_to_check, confidence in ((2, 1.0), (3, 1.0), (8, 0.75)):
+        monkeypatch.setattr(mpeg_audio_scanner, "FRAMES_TO_CHECK", frames_to_check)
+        mpeg_audio_scanner.DataCache.set_file_path(None)
+        assert mpeg_audio_scanner.main(path, head, foot).confidence == confidence
+
+    # MPEG-2 Layer II frames carry 1152 samples like MPEG-1 ones, 417 bytes at 64k 22.05Khz
+    path = tmp_path / "stream.mp2"
+    path.write_bytes(b"".join(b"\xff\xf5\x80\x00" + rng.randbytes(413) for _ in range(8)))
+    head, foot = puremagic.main.file_details(path)
+    mpeg_audio_scanner.DataCache.set_file_path(None)
+    result = mpeg_audio_scanner.main(path, head, foot)
+    assert (result.extension, result.confidence) == (".mp2", 1.0)
+    assert result.name == "MPEG-2 Audio Layer II (MP2) file [64k 22.1Khz Stereo CBR]"
+
+    # Stereo and Joint-Stereo frames mix, a switch to Mono ends the stream
+    monkeypatch.setattr(mpeg_audio_scanner, "FRAMES_TO_CHECK", 4)
+    modes = (0x00, 0x40, 0xC0, 0xC0, 0xC0)
+    path = tmp_path / "mono_switch.mp3"
+    path.write_bytes(b"".join(b"\xff\xfb\x90" + bytes([mode]) + rng.randbytes(413) for mode in modes) + bytes(8192))
+    head, foot = puremagic.main.file_details(path)
+    mpeg_audio_scanner.DataCache.set_file_path(None)
+    assert mpeg_audio_scanner.main(path, head, foot).confidence == 0.5
+
+    # A frame header followed by noise is not an MPEG audio stream
+    noise = tmp_path / "noise.mp3"
+    noise.write_bytes(b"\xff\xfb\x90\x00" + rng.randbytes(8192))
+    head, foot = puremagic.main.file_details(noise)
+    assert mpeg_audio_scanner.main(noise, head, foot) is None
+
+
+def test_mpeg_audio_end_of_file_tags(tmp_path):
+    audio = (AUDIO_DIR / "test_mp3_vbr_xing_128k_notags.mp3").read_bytes()
+    id3v1 = b"TAG" + b"Title".ljust(30, b"\x00") + bytes(60) + b"2024" + bytes(31)
+    item = struct.pack("<II", 5, 0) + b"Title\x00Hello"
+    ape_size = len(item) + 32
+    ape = b"APETAGEX" + struct.pack("<4I8x", 2000, ape_size, 1, 0xA0000000) + item
+    ape += b"APETAGEX" + struct.pack("<4I8x", 2000, ape_size, 1, 0x80000000)
+    lyrics = b"LYRICSBEGIN[00:01]Sing along" + b"LYRICSEND"
+
+    # Tags well beyond the old 1.5 MB tail read, only their footers, headers and first keys are read.
+    # Lyrics3 v1 has no size field, the 5100 bytes it may span are searched for its start.
+    samples = {
+        "ape.mp3": (audio + bytes(2 * 1024 * 1024) + ape + id3v1, "ID3v1 APEv2]", 2048),
+        "lyrics.mp3": (audio + bytes(2 * 1024 * 1024) + lyrics, "LAME(Xing) Lyricsv1]", 8192),
+    }
+    for name, (data, tags, budget) in samples.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        head, foot = puremagic.main.file_details(path)
+        puremagic.reset_stats()
+        assert mpeg_audio_scanner.main(path, head, foot).name.endswith(tags), name
+        assert puremagic.get_stats()["bytes_read"] < budget, name
+
+    # A Lyrics3 v2 field with a signed size used to step by zero bytes forever
+    tag = b"LYRICSBEGIN" + b"XXX-0008" + b"IND00002" + b"11"
+    path = tmp_path / "negative.mp3"
+    path.write_bytes(audio + tag + b"%06d" % len(tag) + b"LYRICS200")
+    head, foot = puremagic.main.file_details(path)
+    assert "Lyricsv2" not in mpeg_audio_scanner.main(path, head, foot).name
+
+
+def test_executable_scanner(tmp_path):
+    result = puremagic.magic_file(SYSTEM_DIR / "test.exe")[0]
+    assert (result.extension, result.name) == (".exe", "Windows executable [x86 32-bit GUI]")
+    assert result.mime_type == "application/vnd.microsoft.portable-executable"
+
+    # A 64-bit .NET DLL with its PE header past the head, read with one small seek
+    optional = struct.pack("<H66xH", 0x20B, 3).ljust(112 + 16 * 8, b"\x00")
+    optional = optional[: 112 + 14 * 8] + struct.pack("<II", 0x2008, 72) + optional[112 + 15 * 8 :]
+    coff = struct.pack("<HHIIIHH", 0x8664, 0, 0, 0, 0, len(optional), 0x2022)
+    far = 50_000
+    data = (b"MZ" + bytes(58) + struct.pack("<I", far)).ljust(far, b"\x00") + b"PE\x00\x00" + coff + optional
+    path = tmp_path / "library.ocx"
+    path.write_bytes(data)
+    puremagic.reset_stats()
+    result = puremagic.magic_file(path)[0]
+    assert (result.extension, result.name) == (".ocx", "Windows DLL [x86-64 64-bit .NET]")
+    assert puremagic.get_stats()["bytes_read"] <= len(data) - far + puremagic.main.max_head + puremagic.main.max_foot
+
+    def elf_header(bits: int, order: str, elf_type: int, machine: int, segments: int = 1) -> bytes:
+        ident = b"\x7fELF" + bytes([bits // 32, 1 if order == "<" else 2, 1]).ljust(12, b"\x00")
+        if bits == 64:
+            return ident + struct.pack(
+                f"{order}HHIQQQIHHHHHH", elf_type, machine, 1, 0, 64, 0, 0, 64, 56, segments, 0, 0, 0
+            )
+        return ident + struct.pack(
+            f"{order}HHIIIIIHHHHHH", elf_type, machine, 1, 0, 52, 0, 0, 52, 32, segments, 0, 0, 0
+        )
+
+    def elf_dynamic(flags_1: int, bits: int = 64, order: str = "<", gap: int = 0) -> bytes:
+        """PT_INTERP and PT_DYNAMIC program headers and a dynamic section with DT_FLAGS_1 gap bytes after them"""
+        if bits == 64:
+            dynamic_offset = 64 + 2 * 56 + gap
+            segments = struct.pack(f"{order}II", 3, 0).ljust(56, b"\x00")
+            segments += struct.pack(f"{order}IIQ16xQ", 2, 0, dynamic_offset, 48).ljust(56 + gap, b"\x00")
+            return segments + struct.pack(f"{order}qQqQqQ", 1, 1, 0x6FFFFFFB, flags_1, 0, 0)
+        dynamic_offset = 52 + 2 * 32
+        segments = struct.pack(f"{order}II", 3, 0).ljust(32, b"\x00")
+        segments += struct.pack(f"{order}II8xI", 2, dynamic_offset, 24).ljust(32, b"\x00")
+        return segments + struct.pack(f"{order}iIiIiI", 1, 1, 0x6FFFFFFB, flags_1, 0, 0)
+
+    pie, library = 0x08000001, 0x00000801
+    cases = [
+        (
+            elf_header(64, "<", 3, 0xB7, 2) + elf_dynamic(pie),
+            "",
+            "ELF position independent executable [AArch64 64-bit LSB]",
+        ),
+        (
+            elf_header(32, ">", 3, 0x08, 2) + elf_dynamic(pie, 32, ">"),
+            "",
+            "ELF position independent executable [MIPS 32-bit MSB]",
+        ),
+        # Shared libraries such as libc ask for an interpreter as well, without the PIE flag
+        (elf_header(64, "<", 3, 0x3E, 2) + elf_dynamic(library), ".so", "ELF shared object [x86-64 64-bit LSB]"),
+        (elf_header(64, "<", 3, 0x3E) + bytes(56), ".so", "ELF shared object [x86-64 64-bit LSB]"),
+        (elf_header(32, ">", 1, 0x08) + bytes(32), ".o", "ELF relocatable object [MIPS 32-bit MSB]"),
+        (
+            b"\xcf\xfa\xed\xfe" + struct.pack("<III", 0x0100000C, 0, 6) + bytes(16),
+            ".dylib",
+            "Mach-O dynamic library [ARM64 64-bit]",
+        ),
+        (
+            b"\xca\xfe\xba\xbe"
+            + struct.pack(">I", 2)
+            + struct.pack(">5I", 0x01000007, 3, 0, 0, 0)
+            + struct.pack(">5I", 0x0100000C, 0, 0, 0, 0),
+            "",
+            "Mach-O universal binary [x86-64 ARM64]",
+        ),
+    ]
+    for data, extension, name in cases:
+        path = tmp_path / "binary"
+        path.write_bytes(data.ljust(128, b"\x00"))
+        result = executable_scanner.main(path, data.ljust(128, b"\x00"), b"")
+        assert (result.extension, result.name) == (extension, name)
+
+    # Program headers past the head come with the dynamic section in one read, one further away is not read
+    for gap, extension in ((0, ""), (20_000, ".so")):
+        data = elf_header(64, "<", 3, 0x3E, 2) + elf_dynamic(pie, gap=gap)
+        path = tmp_path / "far_headers"
+        path.write_bytes(data)
+        with puremagic.stats.tracing() as trace:
+            result = executable_scanner.main(path, data[:64], b"")
+        assert result.extension == extension
+        assert len(trace.reads) == 1
+
+    # Java class files share the universal binary magic
+    path = tmp_path / "Main.class"
+    path.write_bytes(b"\xca\xfe\xba\xbe\x00\x00\x00\x34" + bytes(64))
+    assert puremagic.from_file(path) == ".class"
+
+
+def test_xml_scanner(tmp_path):
+    cases = [
+        (b'<?xml version="1.0"?>\n<rss version="2.0"><channel/></rss>', ".rss"),
+        (b'<feed xmlns="http://www.w3.org/2005/Atom"><title>t</title></feed>', ".atom"),
+        (b'<?xml version="1.0"?><!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "x.dtd"><plist/>', ".plist"),
+        (b'<html xmlns="http://www.w3.org/1999/xhtml"><body/></html>', ".xhtml"),
+        (b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document/></kml>', ".kml"),
+        (b'<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1"/>', ".gpx"),
+        (b'<mxfile host="app.diagrams.net"><diagram/></mxfile>', ".drawio"),
+        (
+            b'<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/"/>',
+            ".rss",
+        ),
+        ('<svg xmlns="http://www.w3.org/2000/svg"/>'.encode("utf-16"), ".svg"),
+        # Entities that expand to plain text, as written by Illustrator
+        (
+            b'<!DOCTYPE svg [<!ENTITY ns_svg "http://www.w3.org/2000/svg">]><svg xmlns="&ns_svg;"/>',
+            ".svg",
+        ),
+    ]
+    for data, extension in cases:
+        assert xml_scanner.main(None, data, b"").extension == extension, data
+
+    # Only the head is parsed, leading and trailing comments no longer hide the signature rows' svg tags
+    path = tmp_path / "drawing"
+    body = (
+        b'<!-- exported -->\n<svg xmlns="http://www.w3.org/2000/svg">'
+        + b"<rect/>" * 200_000
+        + b"</svg>\n<!-- end -->\n\n"
+    )
+    path.write_bytes(body)
+    puremagic.reset_stats()
+    result = puremagic.magic_file(path)[0]
+    assert (result.extension, result.confidence) == (".svg", 1.0)
+    assert puremagic.get_stats()["bytes_read"] <= puremagic.main.max_head + puremagic.main.max_foot
+
+    # Nested entity expansion is refused before the root element is expanded
+    laughs = b'<!DOCTYPE svg [<!ENTITY lol "lol">'
+    laughs += b"".join(b'<!ENTITY lol%d "%s">' % (level, b"&lol;" * 10) for level in range(1, 10))
+    laughs += b']><svg a="&lol9;"/>'
+    assert xml_scanner.main(None, laughs, b"") is None
+    assert xml_scanner.main(None, b"<unknown/>", b"") is None
+    assert xml_scanner.main(None, b"<svg", b"") is None
+    assert xml_scanner.main(None, b"not markup", b"") is None
+
+
 def test_eml_scanner():
     eml_file = OFFICE_DIR / "test.eml"
     results = puremagic.magic_file(eml_file)
@@ -123,6 +745,69 @@ def test_jpg_without_extension():
         no_ext_file.unlink()
 
 
+def test_riff_scanner(tmp_path):
+    wav = (AUDIO_DIR / "test.wav").read_bytes()
+    result = puremagic.magic_file(AUDIO_DIR / "test.wav")[0]
+    assert (result.name, result.confidence) == ("Waveform Audio File Format [MS ADPCM 4 bit 8Khz Stereo]", 1.0)
+    # The AIFF form keeps the file's own extension among .aif, .aiff and .aifc
+    assert puremagic.magic_file(AUDIO_DIR / "test.aif")[0].name == "Audio Interchange File Format [16 bit 48Khz Stereo]"
+    assert puremagic.from_file(AUDIO_DIR / "test.aif") == ".aif"
+
+    # Mislabeled and truncated files are named by their form type
+    path = tmp_path / "clip.avi"
+    path.write_bytes(wav[: len(wav) // 2])
+    result = puremagic.magic_file(path)[0]
+    assert (result.extension, result.confidence) == (".wav", 0.8)
+    assert result.name.endswith(" truncated]")
+
+    # A chunk running past the end of the form
+    broken = bytearray(wav)
+    broken[16:20] = struct.pack("<I", len(wav))
+    path.write_bytes(broken)
+    assert riff_scanner.main(path, bytes(broken), b"").confidence == 0.7
+
+    vp8x = b"VP8X" + struct.pack("<I", 10) + bytes([0x12, 0, 0, 0]) + (639).to_bytes(3, "little")
+    vp8x += (479).to_bytes(3, "little")
+    webp = b"RIFF" + struct.pack("<I", 4 + len(vp8x)) + b"WEBP" + vp8x
+    path = tmp_path / "anim.webp"
+    path.write_bytes(webp)
+    assert riff_scanner.main(path, webp, b"").name == "WebP graphics file format [VP8X extended 640x480 animated alpha]"
+
+    comm = b"COMM" + struct.pack(">IhIhHQ", 22, 1, 0, 16, 0x400E, 0xAC44 << 48) + b"sowt"
+    aifc = b"FORM" + struct.pack(">I", 4 + len(comm)) + b"AIFC" + comm
+    path = tmp_path / "sound.aifc"
+    path.write_bytes(aifc)
+    assert (
+        riff_scanner.main(path, aifc, b"").name
+        == "Audio Interchange File Format (Compressed) [sowt 16 bit 44.1Khz Mono]"
+    )
+
+    # RF64 keeps the RIFF and data sizes in ds64, their 32-bit fields are all ones
+    samples = bytes(4000)
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 1, 2, 44100, 176400, 4, 16)
+    ds64_size = 4 + 8 + 28 + len(fmt) + 8 + len(samples)
+    ds64 = b"ds64" + struct.pack("<IQQQI", 28, ds64_size, len(samples), 1000, 0)
+    rf64 = b"RF64\xff\xff\xff\xffWAVE" + ds64 + fmt + b"data\xff\xff\xff\xff" + samples
+    path = tmp_path / "long.wav"
+    path.write_bytes(rf64)
+    result = riff_scanner.main(path, rf64, b"")
+    assert (result.name, result.confidence) == ("Waveform Audio File Format [PCM 16 bit 44.1Khz Stereo]", 1.0)
+
+    path = tmp_path / "sound.aifc"
+    path.write_bytes(b"RIFF" + struct.pack("<I", 4) + b"CDR9")
+    assert riff_scanner.main(path, path.read_bytes(), b"") is None
+
+    # Head keyed scanners run once per file and the other scanners still get a go when they find nothing
+    path = tmp_path / "unknown.riff"
+    path.write_bytes(b"RIFF" + struct.pack("<I", 1000) + b"XXXX" + bytes(1000))
+    puremagic.reset_stats()
+    puremagic.magic_file(path)
+    assert puremagic.get_stats()["scanner_invocations"]["riff_scanner"] == 1
+    path = tmp_path / "brand.json"
+    path.write_bytes(b'["abftyp", 1]')
+    assert puremagic.magic_file(path)[0].extension == ".json"
+
+
 def test_sndhdr_scanner():
     # Test the sndhdr scanner with sndr file
     sndr_file = AUDIO_DIR / "test.sndr"